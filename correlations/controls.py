@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from hmc import checks
+from hmc.lattice import Periodic_Lattice
+from .errors import uWerr
+
+__doc__ = """Zero-variance control variates following Assaraf & Caffarel,
+PRL 83 (1999) 4682 and Mira, Solgi & Imparato, Stat. Comput. 23 (2013) 653
+
+For a trial function P and the target exp(-S) the Stein identity gives
+    
+    < laplace(P) - grad(P).grad(S) > = 0
+
+so every P is a control variate h with zero mean built from the force
+grad(S) = duE that the samplers already evaluate. An observable f is
+replaced by f - np.dot(h, theta) with theta fitted by least squares over
+the chain. This has the same mean and, for a good family of P, a much
+smaller variance. For a free theory the full quadratic family makes the
+variance of x^2 exactly zero
+
+The trial functions here are the translation invariant polynomials
+    
+    degree 1: sum_i x_i
+    degree 2: sum_i x_i x_{i+r} for each shift r and (sum_i x_i)^2
+"""
+def chainForces(pot, samples, spacing=1.):
+    """The gradient of the action of every sample of a chain
+    
+    Required Inputs
+        pot     :: class :: the potential that was sampled
+        samples :: np.ndarray :: chain with the sample index first
+    
+    Optional Inputs
+        spacing :: float :: lattice spacing
+    """
+    return np.asarray([pot.duE(Periodic_Lattice(x, lattice_spacing=spacing))
+        for x in np.asarray(samples)])
+
+def polynomialControls(samples, forces, degree=2, separations=None):
+    """The control variates laplace(P) - grad(P).grad(S) of the
+    translation invariant polynomial trial functions
+    
+    Required Inputs
+        samples :: np.ndarray :: chain with the sample index first
+        forces  :: np.ndarray :: grad(S) of each sample - see chainForces()
+    
+    Optional Inputs
+        degree      :: int :: 1 or 2, the highest degree of the trial functions
+        separations :: list :: the lattice shifts r of the quadratic
+                        trial functions as tuples. 'all' is every shift.
+                        The default is no shift and a unit shift along each axis
+    
+    Returns an array of shape (n_samples, n_controls)
+    """
+    x = np.asarray(samples, dtype=np.float64)
+    g = np.asarray(forces, dtype=np.float64)
+    checks.tryAssertEqual(x.shape, g.shape,
+        ' one force per sample.\n> shapes: {}, {}'.format(x.shape, g.shape))
+    lattice = x.shape[1:]
+    axes = tuple(xrange(1, x.ndim))
+    n_sites = float(np.prod(lattice))
+    
+    sum_x, sum_g = x.sum(axis=axes), g.sum(axis=axes)
+    controls = [-sum_g]
+    if degree >= 2:
+        if separations is None:
+            separations = [(0,)*len(lattice)] + [tuple(np.eye(len(lattice), dtype=int)[i])
+                for i in xrange(len(lattice))]
+        elif separations == 'all':
+            separations = list(np.ndindex(*lattice))
+        for r in separations:
+            r = tuple(r)
+            grad = np.roll(x, [-s for s in r], axis=axes) + np.roll(x, r, axis=axes)
+            lap = 2*n_sites if not any(r) else 0.
+            controls.append(lap - (grad*g).sum(axis=axes))
+        controls.append(2*n_sites - 2*sum_x*sum_g)
+    return np.column_stack(controls)
+
+class Zero_Variance(object):
+    """Control variate estimators of lattice observables
+    
+    Required Inputs
+        samples :: np.ndarray :: chain with the sample index first
+        forces  :: np.ndarray :: grad(S) of each sample - see chainForces()
+    
+    Optional Inputs
+        degree      :: int  :: see polynomialControls()
+        separations :: list :: see polynomialControls()
+    
+    Notes
+        Observables are the value of each sample. Any trailing lattice
+        axes are averaged so theory.operators.x_sq(samples) can be
+        given directly. The corrected series from series() can be given
+        to any of the autocorrelation routines in place of the original
+    """
+    def __init__(self, samples, forces, degree=2, separations=None):
+        self.controls = polynomialControls(samples, forces, degree=degree,
+            separations=separations)
+        self.centred = self.controls - self.controls.mean(axis=0)
+        pass
+    
+    def _values(self, observable):
+        """An observable as one value per sample"""
+        f = np.asarray(observable, dtype=np.float64)
+        if f.ndim > 1: f = f.reshape(f.shape[0], -1).mean(axis=1)
+        checks.tryAssertEqual(f.shape[0], self.controls.shape[0],
+            ' one value per sample.\n> shape: {}'.format(f.shape))
+        return f
+    
+    def fit(self, observable):
+        """The least squares coefficients theta minimising the variance
+        of the observable minus np.dot(h, theta)
+        
+        Required Inputs
+            observable :: np.ndarray :: values of every sample
+        """
+        f = self._values(observable)
+        theta = np.linalg.lstsq(self.centred, f - f.mean(), rcond=None)[0]
+        return theta
+    
+    def series(self, observable):
+        """The variance reduced time series of the observable
+        
+        Required Inputs
+            observable :: np.ndarray :: values of every sample
+        """
+        f = self._values(observable)
+        return f - np.dot(self.controls, self.fit(f))
+    
+    def reduction(self, observable):
+        """The ratio of the variance of the observable to that of the
+        corrected series
+        
+        Required Inputs
+            observable :: np.ndarray :: values of every sample
+        """
+        f = self._values(observable)
+        return f.var()/self.series(f).var()
+    
+    def uWerr(self, observable, **kwargs):
+        """errors.uWerr() of the variance reduced series
+        
+        Required Inputs
+            observable :: np.ndarray :: values of every sample
+        
+        Optional Inputs
+            **kwargs :: passed to errors.uWerr()
+        
+        Notes
+            When the controls span the observable, as for the
+            magnetisation^2 of a free theory, the series is constant up
+            to rounding and the error is zero with no autocorrelations
+        """
+        f = self._values(observable)
+        series = self.series(f)
+        if series.var() <= 1e-20*f.var():
+            nans = np.empty(series.shape)
+            nans[:] = np.nan
+            return series.mean(), 0., 0., np.nan, np.nan, nans, nans
+        return uWerr(series, **kwargs)
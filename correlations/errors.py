@@ -188,7 +188,7 @@ def windowing(f_ret, f_aav, s_tau, n, fast):
         g_int = 0.
         for w in range(1, t_max + 1):
             v = fn(t=w)
-            acorr.append(v)
+            acorr.append(v*norm)
             g_int += v
             if gW(w, g_int, s_tau, n) < 0: return norm, np.asarray(acorr), w
         
@@ -196,13 +196,13 @@ def windowing(f_ret, f_aav, s_tau, n, fast):
         print 'Error: Windowing condition failed up to W = {}'.format(g_int.size)
         return None, None, None
     else:
-        acorr  = np.asarray([fn(t=t) for t in range(0, t_max)]) # t_max implicit n//2
+        acorr  = np.asarray([fn(t=t) for t in range(0, t_max)])*norm # t_max implicit n//2
         checks.tryAssertNotEqual(norm, 0,
             'Normalisation cannot be zero: No fluctuations.' \
             + '\nNormalisation: {}'.format(norm))
         
         # The automatic windowing proceedure
-        w = autoWindow(acorrn=acorr, s_tau=s_tau, n=n)
+        w = autoWindow(acorrn=acorr/norm, s_tau=s_tau, n=n)
         return norm, acorr, w
     checks.tryAssertNotEqual(False, False, "Shouldn't get here! wtf...?!")
     pass
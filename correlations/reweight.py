@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from hmc import checks
+from hmc.lattice import Periodic_Lattice
+
+__doc__ = """Multi-ensemble reweighting following Ferrenberg & Swendsen,
+PRL 63 (1989) 1195 and its per-sample form (MBAR) of Shirts & Chodera,
+J. Chem. Phys. 129 (2008) 124105
+
+Chains at K parameter values are pooled. When the action is linear in
+stored per-sample terms, S_k(x_n) = np.dot(c_k, t_n) as for
+Klein_Gordon.actionTerms(), the free energies f_k = -log Z_k solve
+    
+    f_k = -log sum_n exp(-S_k(x_n)) / sum_j N_j exp(f_j - S_j(x_n))
+
+and any other parameters c are then estimated from the same samples
+without a new run
+"""
+def logSumExp(a, axis=None):
+    """log(sum(exp(a))) along an axis without overflow
+    
+    Required Inputs
+        a :: np.ndarray :: the exponents. -np.inf entries contribute zero
+    
+    Optional Inputs
+        axis :: int :: axis to sum over. The default is all entries
+    """
+    a = np.asarray(a, dtype=np.float64)
+    a_max = np.max(a, axis=axis, keepdims=True)
+    a_max = np.where(np.isfinite(a_max), a_max, 0.)
+    out = np.log(np.sum(np.exp(a - a_max), axis=axis, keepdims=True)) + a_max
+    if axis is None: return out.ravel()[0]
+    return np.squeeze(out, axis=axis)
+
+def chainTerms(pot, samples, spacing=1.):
+    """The action terms of every sample of a chain
+    
+    Required Inputs
+        pot     :: class :: a potential with actionTerms() e.g. Klein_Gordon
+        samples :: np.ndarray :: chain with the sample index first
+    
+    Optional Inputs
+        spacing :: float :: lattice spacing
+    """
+    return np.asarray([pot.actionTerms(Periodic_Lattice(x, lattice_spacing=spacing))
+        for x in np.asarray(samples)])
+
+def chainCoefficients(pot, shape, spacing=1.):
+    """The action coefficients of a potential on a lattice
+    
+    Required Inputs
+        pot     :: class :: a potential with actionCoefficients() e.g. Klein_Gordon
+        shape   :: tuple :: lattice shape
+    
+    Optional Inputs
+        spacing :: float :: lattice spacing
+    """
+    return pot.actionCoefficients(Periodic_Lattice(np.zeros(shape), lattice_spacing=spacing))
+
+class Multi_Ensemble(object):
+    """Solves the multi-histogram equations for pooled chains and
+    reweights observables to any parameters
+    
+    Required Inputs
+        terms        :: list :: the (n_k, n_terms) action terms of each chain - see chainTerms()
+        coefficients :: np.ndarray :: (K, n_terms) action coefficients of each chain
+    
+    Optional Inputs
+        tol      :: float :: convergence of the free energies
+        max_iter :: int   :: self consistent iterations before giving up
+    
+    Notes
+        self.f are the free energies relative to the first chain.
+        Observables are given as a list of one array per chain, or as one
+        array over the pooled samples, with any trailing axes
+    """
+    def __init__(self, terms, coefficients, tol=1e-10, max_iter=10000):
+        self.tol = tol
+        self.max_iter = max_iter
+        
+        self.counts = np.array([len(t) for t in terms])
+        self.coefficients = np.atleast_2d(np.asarray(coefficients, dtype=np.float64))
+        checks.tryAssertEqual(len(self.counts), self.coefficients.shape[0],
+            ' one set of coefficients per chain.\n> chains: {}'.format(len(self.counts)))
+        self.terms = np.concatenate([np.asarray(t, dtype=np.float64) for t in terms])
+        self.chain = np.repeat(np.arange(len(self.counts)), self.counts)
+        
+        self.f, self.iterations = self._solve(np.ones(self.terms.shape[0], dtype=bool))
+        pass
+    
+    def _solve(self, mask, f=None):
+        """The free energies from the samples where mask is True
+        
+        Required Inputs
+            mask :: np.ndarray :: bool over the pooled samples
+        
+        Optional Inputs
+            f :: np.ndarray :: initial free energies
+        """
+        u = np.dot(self.coefficients, self.terms[mask].T) # (K, N) reduced actions
+        log_n = np.log(np.bincount(self.chain[mask], minlength=len(self.counts)))[:, None]
+        if f is None: f = np.zeros(len(self.counts))
+        
+        for i in xrange(1, self.max_iter + 1):
+            log_den = logSumExp(log_n + f[:, None] - u, axis=0)
+            f_new = -logSumExp(-u - log_den, axis=1)
+            f_new -= f_new[0]
+            if np.max(np.abs(f_new - f)) < self.tol: return f_new, i
+            f = f_new
+        raise ValueError("Error: The free energies did not converge in {} iterations!".format(
+            self.max_iter))
+    
+    def _logWeights(self, coefficients, mask, f):
+        """The normalised log weights of the masked samples at each target
+        
+        Required Inputs
+            coefficients :: np.ndarray :: (M, n_terms) targets
+            mask :: np.ndarray :: bool over the pooled samples
+            f :: np.ndarray :: the free energies of these samples
+        """
+        terms = self.terms[mask]
+        u = np.dot(self.coefficients, terms.T)
+        log_n = np.log(np.bincount(self.chain[mask], minlength=len(self.counts)))[:, None]
+        log_den = logSumExp(log_n + f[:, None] - u, axis=0)
+        log_w = -np.dot(coefficients, terms.T) - log_den
+        return log_w - logSumExp(log_w, axis=1)[:, None]
+    
+    def _pooled(self, observable):
+        """An observable as one array over the pooled samples"""
+        if isinstance(observable, (list, tuple)):
+            observable = np.concatenate([np.asarray(o, dtype=np.float64) for o in observable])
+        observable = np.asarray(observable, dtype=np.float64)
+        checks.tryAssertEqual(observable.shape[0], self.terms.shape[0],
+            ' one value per pooled sample.\n> shape: {}'.format(observable.shape))
+        return observable
+    
+    def weights(self, coefficients):
+        """The normalised weight of every pooled sample at each target
+        
+        Required Inputs
+            coefficients :: np.ndarray :: (M, n_terms) or (n_terms,) target coefficients
+        """
+        coefficients = np.atleast_2d(coefficients)
+        mask = np.ones(self.terms.shape[0], dtype=bool)
+        return np.exp(self._logWeights(coefficients, mask, self.f))
+    
+    def freeEnergies(self, coefficients):
+        """-log Z at each target relative to the first chain
+        
+        Required Inputs
+            coefficients :: np.ndarray :: (M, n_terms) or (n_terms,) target coefficients
+        """
+        coefficients = np.atleast_2d(coefficients)
+        u = np.dot(self.coefficients, self.terms.T)
+        log_den = logSumExp(np.log(self.counts)[:, None] + self.f[:, None] - u, axis=0)
+        return -logSumExp(-np.dot(coefficients, self.terms.T) - log_den, axis=1)
+    
+    def estimate(self, observable, coefficients):
+        """The expectation of an observable at each target
+        
+        Required Inputs
+            observable   :: np.ndarray / list :: values of every pooled sample
+            coefficients :: np.ndarray :: (M, n_terms) target coefficients
+        """
+        o = self._pooled(observable)
+        w = self.weights(coefficients)
+        return np.tensordot(w, o, axes=(1, 0))
+    
+    def errors(self, observable, coefficients, n_blocks=20):
+        """The expectation of an observable at each target with a blocked
+        jackknife error
+        
+        Each jackknife sample drops the same fraction of every chain, as
+        contiguous blocks to account for the autocorrelations, and solves
+        for the free energies again
+        
+        Required Inputs
+            observable   :: np.ndarray / list :: values of every pooled sample
+            coefficients :: np.ndarray :: (M, n_terms) target coefficients
+        
+        Optional Inputs
+            n_blocks :: int :: blocks per chain. Should be much longer
+                        than the integrated autocorrelation time
+        """
+        o = self._pooled(observable)
+        coefficients = np.atleast_2d(coefficients)
+        value = self.estimate(o, coefficients)
+        
+        # the block of each sample within its own chain
+        position = np.arange(self.terms.shape[0]) - np.repeat(np.cumsum(self.counts) - self.counts, self.counts)
+        block = position*n_blocks//np.repeat(self.counts, self.counts)
+        
+        jack = []
+        for b in xrange(n_blocks):
+            mask = block != b
+            f, _ = self._solve(mask, f=self.f)
+            w = np.exp(self._logWeights(coefficients, mask, f))
+            jack.append(np.tensordot(w, o[mask], axes=(1, 0)))
+        jack = np.asarray(jack)
+        error = np.sqrt((n_blocks - 1.)/n_blocks*((jack - jack.mean(axis=0))**2).sum(axis=0))
+        return value, error
@@ -4,6 +4,16 @@ from . import lattice
 from . import metropolis
 from . import potentials
 from . import checks
+from . import distributed
+from . import multilevel
+from . import heatbath
+from . import fourier
+from . import cluster
+from . import tempering
+from . import mass
+from . import riemannian
+from . import multiproposal
+from . import batched
 
 __all__ = [
     'dynamics',
@@ -11,5 +21,15 @@ __all__ = [
     'metropolis',
     'potentials',
     'hmc',
-    'checks'
+    'checks',
+    'distributed',
+    'multilevel',
+    'heatbath',
+    'fourier',
+    'cluster',
+    'tempering',
+    'mass',
+    'riemannian',
+    'multiproposal',
+    'batched'
     ]
\ No newline at end of file
@@ -0,0 +1,140 @@
+import numpy as np
+from tqdm import tqdm
+
+from common import Init
+from dynamics import Leap_Frog
+
+__all__ = [ 'Batched_HMC']
+
+class Batched_HMC(Init):
+    """Generalised HMC for a batch of independent chains in one run
+    
+    The chains are the leading axis of the positions, (B, *lattice), of
+    a potential such as :class:`potentials.Batched_Klein_Gordon` whose
+    energies have one value per chain. The step size and the mixing
+    angle may also have one value per chain so a whole grid of parameters
+    is sampled with one NumPy computation per leapfrog step. Every chain
+    has its own Metropolis test
+    
+    Parameters
+    ----------
+    x0         : array_like
+        Initial positions of shape (B, *lattice)
+    potential  : class
+        A batched potential
+    rng        : `np.random.RandomState`
+        random number state
+    step_size  : float / array_like, optional
+        Step size of the leapfrog for each chain
+    n_steps    : int, optional
+        Leapfrog steps of every trajectory
+    rand_steps : bool, optional
+        Geometrically distributed trajectory lengths as in
+        :class:`dynamics.Leap_Frog`, shared by the chains
+    
+    Attributes
+    ----------
+    accept_rates
+        The acceptance probability of each chain at each move
+    """
+    def __init__(self, x0, potential, rng, **kwargs):
+        super(Batched_HMC, self).__init__()
+        self.initArgs(locals())
+        self.defaults = {
+            'step_size':.1,
+            'n_steps':20,
+            'rand_steps':False
+            }
+        self.initDefaults(kwargs)
+        
+        self.x0 = np.asarray(self.x0, dtype=np.float64)
+        self.n_chains = self.x0.shape[0]
+        step_size = self._batch(self.step_size)
+        self.dynamics = Leap_Frog(duE=self.potential.duE, step_size=step_size,
+            n_steps=self.n_steps, rand_steps=self.rand_steps)
+        self.p0 = self.rng.normal(size=self.x0.shape)
+        self.accept_rates = []
+        pass
+    
+    def _batch(self, value):
+        """A scalar or one value per chain broadcast against the positions"""
+        value = np.asarray(value, dtype=np.float64)
+        if value.ndim: value = value.reshape((self.n_chains,) + (1,)*(self.x0.ndim - 1))
+        return value
+    
+    def move(self, p, x, mixing_angle=.5*np.pi):
+        """A generalised HMC move of every chain
+        
+        As :meth:`hmc.Hybrid_Monte_Carlo.move` with a momentum flip in the
+        refresh and after the trajectory
+        
+        Parameters
+        ----------
+        p            : np.ndarray
+            momenta of shape (B, *lattice)
+        x            : np.ndarray
+            positions of shape (B, *lattice)
+        mixing_angle : float / array_like, optional
+            `0` is no mixing, `np.pi/2.` is a total refreshment
+        """
+        theta = self._batch(mixing_angle)
+        noise = self.rng.normal(size=x.shape)
+        p = -np.cos(theta)*p - np.sin(theta)*noise
+        
+        p0, x0 = p.copy(), x.copy()
+        p, x = self.dynamics.integrate(p, x)
+        p = -p
+        
+        h_old = self.potential.hamiltonian(p0, x0)
+        h_new = self.potential.hamiltonian(p, x)
+        with np.errstate(over='ignore', invalid='ignore'):
+            accept_rate = np.nan_to_num(np.minimum(1., np.exp(h_old - h_new)))
+        accept = self.rng.uniform(size=self.n_chains) < accept_rate
+        self.accept_rates.append(accept_rate)
+        
+        accept = self._batch(accept) > 0
+        return np.where(accept, p, p0), np.where(accept, x, x0)
+    
+    def sample(self, n_samples, n_burn_in = 20, mixing_angle=.5*np.pi, verbose = False, verb_pos = 0):
+        """Runs every chain
+        
+        Parameters
+        ----------
+        n_samples       : integer
+            Number of samples (# moves after burn in)
+        n_burn_in       : int,  optional
+            Number of moves to discard at start
+        mixing_angle    : float / array_like, optional
+            The mixing angle of each chain
+        verbose         : bool, optional
+            A progress bar if True
+        verb_pos        : int,  optional
+            Offset for status bar
+        
+        Notes
+        ----------
+        Returns the interface of :meth:`hmc.Hybrid_Monte_Carlo.sample`
+        where each sample has the leading batch axis. accept_rates are
+        those of the samples only
+        """
+        p, x = self.p0.copy(), self.x0.copy()
+        
+        chains = []
+        for burn_in, n in [(True, n_burn_in), (False, n_samples)]:
+            self.accept_rates = []
+            chain_p, chain, traj = [p.copy()], [x.copy()], [0]
+            
+            iterator = xrange(n)
+            if verbose and not burn_in:
+                iterator = tqdm(iterator, position=verb_pos,
+                    desc='Sampling: {}'.format(verb_pos))
+            for step in iterator:
+                p, x = self.move(p, x, mixing_angle=mixing_angle)
+                chain_p.append(p.copy())
+                chain.append(x.copy())
+                traj.append(self.dynamics.n)
+            chains.append((chain_p, chain, traj))
+        
+        (self.burn_in_p, self.burn_in, self.burn_in_traj), \
+            (self.samples_p, self.samples, self.samples_traj) = chains
+        return (self.burn_in_p, self.samples_p), (self.burn_in, self.samples)
@@ -0,0 +1,221 @@
+"""Compiled kernels for the periodic lattice actions
+
+Build in place with
+
+    cd hmc; python setup.py build_ext --inplace
+
+potentials.py falls back to NumPy when this module is not built.
+
+The kernels share the general form of the Klein-Gordon and QHO actions
+
+    S = c_kin/2 sum_x sum_mu (x(n+mu) - x(n))^2
+        + c_pot sum_x [m2/2 x^2 + g3/3! x^3 + g4/4! x^4]
+
+so the caller supplies the lattice spacing factors. Every array
+is accessed through a flat C-contiguous view with the periodic
+neighbours found from the strides so any number of dimensions
+are handled without temporaries
+"""
+import cython
+cimport cython
+from cython cimport floating
+from libc.math cimport exp
+
+import numpy as np
+cimport numpy as np
+
+ctypedef np.intp_t ITYPE_t
+
+def _strides(x):
+    """The shape and C-order element strides of x as intp arrays"""
+    shape = np.asarray(x.shape, dtype=np.intp)
+    stride = np.ones(shape.size, dtype=np.intp)
+    if shape.size > 1: stride[:-1] = np.cumprod(shape[::-1])[::-1][1:]
+    return shape, stride
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+@cython.cdivision(True)
+cdef inline ITYPE_t _fwd(ITYPE_t i, ITYPE_t n, ITYPE_t s) nogil:
+    """flat index of the forward neighbour of i along an axis of length n, stride s"""
+    if (i // s) % n == n - 1: return i - (n - 1)*s
+    return i + s
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+@cython.cdivision(True)
+cdef inline ITYPE_t _bwd(ITYPE_t i, ITYPE_t n, ITYPE_t s) nogil:
+    """flat index of the backward neighbour of i along an axis of length n, stride s"""
+    if (i // s) % n == 0: return i + (n - 1)*s
+    return i - s
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+cdef void _force(floating[::1] x, floating[::1] out,
+    ITYPE_t[::1] shape, ITYPE_t[::1] stride,
+    double c_kin, double c_pot, double m2, double g3, double g4) nogil:
+    """writes the gradient of the action into out"""
+    cdef ITYPE_t i, ax, n = x.shape[0], d = shape.shape[0]
+    cdef double xi, lap
+    for i in range(n):
+        xi = x[i]
+        lap = 0.
+        for ax in range(d):
+            lap += x[_fwd(i, shape[ax], stride[ax])] \
+                + x[_bwd(i, shape[ax], stride[ax])] - 2.*xi
+        out[i] = -c_kin*lap + c_pot*xi*(m2 + xi*(g3/2. + xi*g4/6.))
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+cdef double _action(floating[::1] x, ITYPE_t[::1] shape, ITYPE_t[::1] stride,
+    double c_kin, double c_pot, double m2, double g3, double g4) nogil:
+    """the action accumulated in double precision"""
+    cdef ITYPE_t i, ax, n = x.shape[0], d = shape.shape[0]
+    cdef double xi, dx, kin = 0., pot = 0.
+    for i in range(n):
+        xi = x[i]
+        for ax in range(d):
+            dx = x[_fwd(i, shape[ax], stride[ax])] - xi
+            kin += dx*dx
+        pot += xi*xi*(m2/2. + xi*(g3/6. + xi*g4/24.))
+    return .5*c_kin*kin + c_pot*pot
+
+def action(floating[::1] x, ITYPE_t[::1] shape, ITYPE_t[::1] stride,
+    double c_kin, double c_pot, double m2, double g3, double g4):
+    """The fused action in a single pass accumulated in double precision
+    
+    Required Inputs
+        x       :: np.ndarray (1d) :: flat C-contiguous lattice
+        shape   :: np.ndarray :: lattice shape as intp
+        stride  :: np.ndarray :: element strides from _strides()
+        c_kin   :: float :: coefficient of the gradient term
+        c_pot   :: float :: coefficient of the potential terms
+        m2, g3, g4  :: float :: x^2, x^3 and x^4 couplings
+    """
+    cdef double s
+    with nogil:
+        s = _action(x, shape, stride, c_kin, c_pot, m2, g3, g4)
+    return s
+
+def force(floating[::1] x, floating[::1] out, ITYPE_t[::1] shape, ITYPE_t[::1] stride,
+    double c_kin, double c_pot, double m2, double g3, double g4):
+    """Writes the gradient of the action into out
+    
+    See action() for the inputs. out has the same size and dtype as x
+    """
+    with nogil:
+        _force(x, out, shape, stride, c_kin, c_pot, m2, g3, g4)
+    pass
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+cdef void _leapFrog(floating[::1] p, floating[::1] x, floating[::1] f,
+    ITYPE_t[::1] shape, ITYPE_t[::1] stride, double h, ITYPE_t n_steps,
+    double c_kin, double c_pot, double m2, double g3, double g4) nogil:
+    """a leapfrog trajectory in place with f as the force buffer"""
+    cdef ITYPE_t i, step, n = x.shape[0]
+    cdef double frac
+    _force(x, f, shape, stride, c_kin, c_pot, m2, g3, g4)
+    for i in range(n):
+        p[i] -= .5*h*f[i]
+    for step in range(n_steps):
+        for i in range(n):
+            x[i] += h*p[i]
+        _force(x, f, shape, stride, c_kin, c_pot, m2, g3, g4)
+        frac = .5 if step == n_steps - 1 else 1.
+        for i in range(n):
+            p[i] -= frac*h*f[i]
+    pass
+
+def leapFrog(floating[::1] p, floating[::1] x, ITYPE_t[::1] shape, ITYPE_t[::1] stride,
+    double step_size, int n_steps,
+    double c_kin, double c_pot, double m2, double g3, double g4):
+    """A full leapfrog trajectory updating p and x in place
+    
+    The step ordering is that of dynamics.Leap_Frog._integrateFast with
+    the full kicks of adjacent steps merged
+    
+    Required Inputs
+        p, x    :: np.ndarray (1d) :: flat C-contiguous momentum and lattice
+        step_size   :: float :: integration step size
+        n_steps     :: int   :: number of leapfrog steps
+    
+    See action() for the remaining inputs
+    """
+    f_arr = np.empty(x.shape[0], dtype=np.asarray(x).dtype)
+    cdef floating[::1] f = f_arr
+    with nogil:
+        _leapFrog(p, x, f, shape, stride, step_size, n_steps, c_kin, c_pot, m2, g3, g4)
+    pass
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+def ghmcMoves(floating[::1] p, floating[::1] x, ITYPE_t[::1] shape, ITYPE_t[::1] stride,
+    double step_size, ITYPE_t[::1] n_steps, double c, double s,
+    floating[:, ::1] noise, double[::1] uniforms,
+    floating[:, ::1] samples, floating[:, ::1] samples_p, double[::1] accept_rates,
+    double c_kin, double c_pot, double m2, double g3, double g4):
+    """Complete GHMC moves updating p and x in place
+    
+    Each move is that of hmc.Hybrid_Monte_Carlo.move with the random
+    numbers drawn beforehand:
+    
+        p -> -c p - s noise                 (refresh)
+        leapfrog and flip                   (proposal)
+        accept if exp(-dH) >= uniform       (Metropolis)
+    
+    and a rejection restores the refreshed momentum and old position
+    
+    Required Inputs
+        p, x        :: np.ndarray (1d) :: flat C-contiguous momentum and lattice
+        step_size   :: float :: integration step size
+        n_steps     :: np.ndarray :: leapfrog steps of each move as intp
+        c, s        :: float :: cosine and sine of the mixing angle
+        noise       :: np.ndarray :: unit gaussian noise, one row per move
+        uniforms    :: np.ndarray :: uniform numbers, one per move
+        samples     :: np.ndarray :: receives x after each move
+        samples_p   :: np.ndarray :: receives p after each move
+        accept_rates    :: np.ndarray :: receives min(1, exp(-dH)) of each move
+    
+    See action() for the remaining inputs. Returns the number of acceptances
+    """
+    cdef ITYPE_t i, k, n = x.shape[0], n_moves = uniforms.shape[0], accepted = 0
+    cdef double h_old, h_new, kin, delta_h
+    dtype = np.asarray(x).dtype
+    f_arr, p0_arr, x0_arr = np.empty(n, dtype=dtype), np.empty(n, dtype=dtype), np.empty(n, dtype=dtype)
+    cdef floating[::1] f = f_arr, p0 = p0_arr, x0 = x0_arr
+    with nogil:
+        for k in range(n_moves):
+            kin = 0.
+            for i in range(n):
+                p[i] = -c*p[i] - s*noise[k, i]
+                p0[i] = p[i]
+                x0[i] = x[i]
+                kin += p[i]*p[i]
+            h_old = .5*kin + _action(x, shape, stride, c_kin, c_pot, m2, g3, g4)
+            
+            _leapFrog(p, x, f, shape, stride, step_size, n_steps[k], c_kin, c_pot, m2, g3, g4)
+            kin = 0.
+            for i in range(n):
+                p[i] = -p[i]
+                kin += p[i]*p[i]
+            h_new = .5*kin + _action(x, shape, stride, c_kin, c_pot, m2, g3, g4)
+            
+            delta_h = h_new - h_old
+            accept_rates[k] = 1. if delta_h <= 0. else exp(-delta_h)
+            if exp(-delta_h) - uniforms[k] >= 0.:
+                accepted += 1
+            else:
+                for i in range(n):
+                    p[i] = p0[i]
+                    x[i] = x0[i]
+            for i in range(n):
+                samples[k, i] = x[i]
+                samples_p[k, i] = p[i]
+    return accepted
@@ -0,0 +1,115 @@
+# default pip imports
+import numpy as np
+
+# local imports
+from common import Init
+
+__docformat__ = "restructuredtext en"
+
+def clusterLabels(n_sites, src, dst):
+    """Labels the connected clusters of a set of bonds
+    
+    A vectorised union-find: every pass hooks the larger root of each
+    bond onto the smaller and then compresses the paths by pointer
+    jumping so that the number of passes grows as log(cluster size)
+    
+    Required Inputs
+        n_sites :: int :: number of (flat) lattice sites
+        src     :: np.ndarray :: flat index of one end of each active bond
+        dst     :: np.ndarray :: flat index of the other end
+    
+    Returns the smallest flat index in the cluster of each site
+    """
+    labels = np.arange(n_sites)
+    while True:
+        ls, ld = labels[src], labels[dst]
+        joined = ls != ld
+        if not joined.any(): break
+        ls, ld = ls[joined], ld[joined]
+        np.minimum.at(labels, np.maximum(ls, ld), np.minimum(ls, ld))
+        
+        # compress: every site points at its root
+        roots = labels[labels]
+        while (roots != labels).any():
+            labels = roots
+            roots = labels[labels]
+    return labels
+
+class Embedded_Wolff(Init):
+    """Embedded Ising (Brower-Tamayo) cluster updates of a scalar lattice field
+    
+    Writing phi_x = |phi_x| s_x the action of a Z2 symmetric field is an
+    Ising model in the signs s with couplings J_xy = K_xy |phi_x phi_y|
+    where -K_xy phi_x phi_y is the hopping term of each link. A bond is
+    placed with probability 1 - exp(-2 K_xy phi_x phi_y) when this is
+    positive and the signs of a cluster are flipped. The magnitudes are
+    unchanged so the move is always accepted
+    
+    Parameters
+    ----------
+    potential  : class
+        A lattice potential with a `bondCouplings(positions)` method
+        returning the forward neighbour table and K_xy as in
+        :class:`potentials.Klein_Gordon`
+    rng        : `np.random.RandomState`
+        random number state
+    single_cluster : bool, optional
+        Flip the cluster of a random site (Wolff) if True. Otherwise
+        every cluster is flipped with probability 1/2 (Swendsen-Wang)
+    
+    Attributes
+    ----------
+    cluster_sizes
+        The number of sites flipped by each move
+    
+    Notes
+    ----------
+    The momenta of HMC are independent of the field so the move can be
+    interleaved with trajectories through the `cluster_update` option of
+    :meth:`hmc.Hybrid_Monte_Carlo.sample`
+    """
+    def __init__(self, potential, rng, **kwargs):
+        super(Embedded_Wolff, self).__init__()
+        self.initArgs(locals())
+        self.defaults = {
+            'single_cluster':True
+            }
+        self.initDefaults(kwargs)
+        self.cluster_sizes = []
+        pass
+    
+    def bonds(self, x):
+        """Draws the active bonds for the field x
+        
+        Returns the flat sites (src, dst) at either end of each bond
+        
+        Required Inputs
+            x :: np.ndarray :: lattice
+        """
+        fwd, couplings = self.potential.bondCouplings(x)
+        phi = np.asarray(x, dtype=np.float64).ravel()
+        src = np.arange(phi.size)
+        
+        j = couplings*phi*phi[fwd]  # one row per axis
+        p_bond = -np.expm1(-2.*np.maximum(j, 0.))
+        active = self.rng.uniform(size=j.shape) < p_bond
+        return np.broadcast_to(src, fwd.shape)[active], fwd[active]
+    
+    def move(self, x):
+        """An embedded cluster update of x
+        
+        Required Inputs
+            x :: np.ndarray :: lattice
+        """
+        n = np.size(x)
+        labels = clusterLabels(n, *self.bonds(x))
+        
+        if self.single_cluster:
+            flip = labels == labels[self.rng.randint(n)]
+        else:
+            flip = (self.rng.uniform(size=n) < .5)[labels]
+        self.cluster_sizes.append(flip.sum())
+        
+        sign = (1. - 2.*flip).reshape(np.shape(x)).astype(x.dtype)
+        return x*sign
+#
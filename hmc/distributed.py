@@ -0,0 +1,444 @@
+import numpy as np
+import multiprocessing as mp
+
+from lattice import Periodic_Lattice
+from potentials import Shared
+import checks
+
+__all__ = [ 'Communicator',
+            'Shared_Memory_Communicator',
+            'Domain_Decomposition',
+            'Aborted']
+
+def sharedArray(shape, dtype=np.float64):
+    """A numpy array backed by shared memory that is inherited
+    by forked worker processes
+    
+    Required Inputs
+        shape :: tuple :: shape of the array
+    
+    Optional Inputs
+        dtype :: np.dtype :: data type
+    """
+    dtype = np.dtype(dtype)
+    n_bytes = int(np.prod(shape))*dtype.itemsize
+    return np.frombuffer(mp.RawArray('b', max(n_bytes, 1)), dtype=dtype,
+        count=int(np.prod(shape))).reshape(shape)
+
+def terminate(workers):
+    """Kills worker processes that cannot be stopped with a command"""
+    for worker in workers: worker.terminate()
+    for worker in workers: worker.join()
+    pass
+
+def receive(conn, worker, workers, timeout=1.):
+    """The reply of a worker, checking every timeout seconds that it is
+    still alive. If it has exited all the workers are terminated
+    
+    Required Inputs
+        conn    :: mp.Connection :: the parent end of the pipe to worker
+        worker  :: mp.Process :: the worker that replies on conn
+        workers :: list :: every worker of the pool
+    
+    Optional Inputs
+        timeout :: float :: seconds between the checks
+    """
+    while True:
+        if conn.poll(timeout):
+            try:
+                return conn.recv()
+            except EOFError: # the worker exited and closed its end
+                worker.join()
+        if not worker.is_alive():
+            code = worker.exitcode
+            terminate(workers)
+            raise RuntimeError('Error: A worker exited with code {}!'.format(code))
+
+class Aborted(RuntimeError):
+    """Raised in the ranks waiting at a barrier when another rank has failed"""
+    pass
+
+class _Barrier(object):
+    """A reusable barrier for processes as multiprocessing has none in python 2
+    
+    Required Inputs
+        n :: int :: number of processes to wait for
+    
+    Optional Inputs
+        timeout :: float :: seconds between checks of the abort flag
+    """
+    def __init__(self, n, timeout=1.):
+        self.n = n
+        self.timeout = timeout
+        self.count = mp.RawValue('i', 0)
+        self.generation = mp.RawValue('i', 0)
+        self.aborted = mp.RawValue('i', 0)
+        self.condition = mp.Condition()
+        pass
+    
+    def wait(self):
+        """Blocks until all n processes arrive. Raises Aborted if abort()
+        is called before then"""
+        with self.condition:
+            if self.aborted.value: raise Aborted('Error: Another rank failed!')
+            generation = self.generation.value
+            self.count.value += 1
+            if self.count.value == self.n:
+                self.count.value = 0
+                self.generation.value += 1
+                self.condition.notify_all()
+            else:
+                while generation == self.generation.value:
+                    if self.aborted.value: raise Aborted('Error: Another rank failed!')
+                    self.condition.wait(self.timeout)
+        pass
+    
+    def abort(self):
+        """Releases every waiting process with Aborted"""
+        with self.condition:
+            self.aborted.value = 1
+            self.condition.notify_all()
+        pass
+    
+    def reset(self):
+        """Clears an abort. Only call when no process is waiting"""
+        with self.condition:
+            self.count.value = 0
+            self.aborted.value = 0
+        pass
+#
+class Communicator(object):
+    """The communication layer used by the subdomains of a Domain_Decomposition
+    
+    Ranks own consecutive slabs along the first lattice axis so that
+    rank - 1 and rank + 1 (periodically) are the only neighbours.
+    A communicator for MPI implements the same methods over mpi4py
+    
+    Expectations
+        size :: int :: number of ranks
+        rank :: int :: set by attach() in each worker
+    """
+    def attach(self, rank):
+        """Called once in the worker that becomes rank. Returns self"""
+        raise NotImplementedError
+    
+    def barrier(self):
+        """Blocks until every rank has reached the barrier"""
+        raise NotImplementedError
+    
+    def exchange(self, lower, upper):
+        """Sends the first owned row (lower) to rank - 1 and the last owned
+        row (upper) to rank + 1
+        
+        Returns the rows (from rank - 1, from rank + 1) for the halos
+        """
+        raise NotImplementedError
+    
+    def allreduce(self, value):
+        """Returns the sum of value over all ranks on every rank
+        
+        The sum must be taken in rank order so the result is deterministic
+        """
+        raise NotImplementedError
+    
+    def abort(self):
+        """Called by a rank that failed so that the ranks blocked in a
+        barrier raise Aborted instead of waiting forever"""
+        raise NotImplementedError
+    
+    def reset(self):
+        """Called by the parent once every rank has replied after an abort"""
+        raise NotImplementedError
+
+class Shared_Memory_Communicator(Communicator):
+    """A local stand-in for MPI between forked processes
+    
+    Halo rows and partial sums are passed through shared memory buffers
+    that are created before the workers are forked
+    
+    Required Inputs
+        size        :: int :: number of ranks
+        row_shape   :: tuple :: shape of one row of the lattice (shape[1:])
+    
+    Optional Inputs
+        dtype :: np.dtype :: data type of the lattice
+    """
+    def __init__(self, size, row_shape, dtype=np.float64):
+        self.size = size
+        self.rank = None
+        self.halos = sharedArray((size, 2) + tuple(row_shape), dtype)
+        self.partials = sharedArray((size,), np.float64)
+        self._barrier = _Barrier(size)
+        pass
+    
+    def attach(self, rank):
+        self.rank = rank
+        return self
+    
+    def barrier(self):
+        self._barrier.wait()
+        pass
+    
+    def abort(self):
+        self._barrier.abort()
+        pass
+    
+    def reset(self):
+        self._barrier.reset()
+        pass
+    
+    def exchange(self, lower, upper):
+        self.halos[self.rank, 0] = lower
+        self.halos[self.rank, 1] = upper
+        self.barrier() # all rows written
+        from_prev = self.halos[(self.rank - 1) % self.size, 1].copy()
+        from_next = self.halos[(self.rank + 1) % self.size, 0].copy()
+        self.barrier() # all rows read before the next exchange
+        return from_prev, from_next
+    
+    def allreduce(self, value):
+        self.partials[self.rank] = value
+        self.barrier()
+        total = 0.
+        for rank in xrange(self.size): total += self.partials[rank]
+        self.barrier()
+        return total
+#
+class _Subdomain(object):
+    """The slab of the lattice owned by one worker process
+    
+    The local arrays have one halo row either side so that
+    x[1:-1] are the owned rows
+    
+    Required Inputs
+        comm        :: Communicator :: attached to this rank
+        potential   :: potentials.Klein_Gordon :: provides slabAction and slabForce
+        coefficients :: tuple :: from potential._coefficients()
+        start, stop :: int :: the owned rows of the global lattice
+        io_p, io_x  :: np.ndarray :: global shared buffers to scatter and gather
+    """
+    def __init__(self, comm, potential, coefficients, start, stop, io_p, io_x):
+        self.comm = comm
+        self.potential = potential
+        self.coefficients = coefficients
+        self.start, self.stop = start, stop
+        self.io_p, self.io_x = io_p, io_x
+        
+        shape = (stop - start + 2,) + io_x.shape[1:]
+        self.x = np.zeros(shape, dtype=io_x.dtype)
+        self.p = np.zeros((stop - start,) + io_x.shape[1:], dtype=io_p.dtype)
+        pass
+    
+    def scatter(self):
+        """Copies the owned rows from the global buffers"""
+        self.x[1:-1] = self.io_x[self.start:self.stop]
+        self.p[...] = self.io_p[self.start:self.stop]
+        pass
+    
+    def gather(self):
+        """Copies the owned rows to the global buffers"""
+        self.io_x[self.start:self.stop] = self.x[1:-1]
+        self.io_p[self.start:self.stop] = self.p
+        pass
+    
+    def exchange(self):
+        """Fills the halo rows from the neighbouring ranks"""
+        self.x[0], self.x[-1] = self.comm.exchange(self.x[1], self.x[-2])
+        pass
+    
+    def force(self):
+        self.exchange()
+        return self.potential.slabForce(self.x, self.coefficients)
+    
+    def action(self):
+        self.exchange()
+        return self.potential.slabAction(self.x, self.coefficients)
+    
+    def hamiltonian(self):
+        """The global hamiltonian from a reduction of the partial sums"""
+        kinetic = .5*np.sum(self.p**2, dtype=np.float64)
+        return self.comm.allreduce(kinetic + self.action())
+    
+    def trajectory(self, step_size, n_steps):
+        """A leapfrog trajectory with a halo exchange for each force
+        
+        The step ordering is that of dynamics.Leap_Frog._integrateFast
+        """
+        x = self.x[1:-1]
+        self.p -= .5*step_size*self.force()
+        for step in xrange(n_steps):
+            x += step_size*self.p
+            frac = .5 if step == n_steps - 1 else 1.
+            self.p -= frac*step_size*self.force()
+        pass
+
+def _work(comm, rank, conn, *args):
+    """The command loop of a worker process"""
+    domain = _Subdomain(comm.attach(rank), *args)
+    while True:
+        command = conn.recv()
+        name, args = command[0], command[1:]
+        if name == 'stop': break
+        try:
+            if name == 'trajectory':
+                domain.scatter()
+                domain.trajectory(*args)
+                domain.gather()
+                result = None
+            elif name == 'hamiltonian':
+                domain.scatter()
+                result = domain.hamiltonian()
+            elif name == 'action':
+                domain.scatter()
+                result = domain.comm.allreduce(domain.action())
+            elif name == 'force': # gathered through the momentum buffer
+                domain.scatter()
+                domain.io_p[domain.start:domain.stop] = domain.force()
+                result = None
+            else:
+                raise ValueError('Unknown command: {}'.format(name))
+        except Exception as e:
+            domain.comm.abort() # release the peers waiting on this rank
+            result = e
+        conn.send(result)
+    conn.close()
+#
+class Domain_Decomposition(Shared):
+    """A Klein-Gordon lattice distributed across worker processes
+    
+    The lattice is split into slabs along the first axis, each owned by a
+    process that exchanges halo rows with its neighbours. Trajectories run
+    cooperatively with a halo exchange per force evaluation and the
+    hamiltonian is a global reduction over the subdomains
+    
+    This is the potential for Hybrid_Monte_Carlo and its trajectory
+    is used by dynamics.Leap_Frog as
+        
+        dynamics = Leap_Frog(duE=domain.duE, trajectory=domain.trajectory)
+        sampler = Hybrid_Monte_Carlo(x0, dynamics, domain, rng)
+    
+    Required Inputs
+        potential :: potentials.Klein_Gordon :: the serial potential
+        x0 :: Periodic_Lattice :: sets the shape, dtype and lattice spacing
+    
+    Optional Inputs
+        n_procs      :: int :: number of worker processes
+        communicator :: Communicator :: created with n_procs ranks. The default
+                        is a Shared_Memory_Communicator
+    
+    Expectations
+        potential has n_threads=1 as thread pools do not survive a fork
+        and x0.shape[0] >= n_procs
+    
+    Notes
+        The global buffers are only touched at the start and end of a
+        trajectory. Use close() to stop the workers
+        
+        An exception in one rank aborts the command on every rank and is
+        raised in the caller. The workers are terminated if one of them
+        exits without replying
+    """
+    def __init__(self, potential, x0, n_procs=2, communicator=None):
+        self.name = 'Distributed ' + potential.name
+        self.debug = False
+        self.potential = potential
+        self.n_procs = n_procs
+        self.shape = x0.shape
+        self.lattice_spacing = getattr(x0, 'lattice_spacing', 1.)
+        dtype = x0.dtype if x0.dtype in (np.float32, np.float64) else np.float64
+        
+        checks.tryAssertEqual(n_procs <= self.shape[0], True,
+            ' more processes than rows\n> n_procs: {}, shape: {}'.format(n_procs, self.shape))
+        
+        if communicator is None:
+            communicator = Shared_Memory_Communicator(n_procs, self.shape[1:], dtype)
+        self.comm = communicator
+        
+        self.io_p = sharedArray(self.shape, dtype)
+        self.io_x = sharedArray(self.shape, dtype)
+        
+        x0 = Periodic_Lattice(np.asarray(x0, dtype=dtype), lattice_spacing=self.lattice_spacing)
+        coefficients = potential._coefficients(x0)
+        edges = np.linspace(0, self.shape[0], n_procs + 1).astype(int)
+        
+        self.conns, self.workers = [], []
+        for rank in xrange(n_procs):
+            conn, child = mp.Pipe()
+            worker = mp.Process(target=_work, args=(self.comm, rank, child, potential,
+                coefficients, edges[rank], edges[rank+1], self.io_p, self.io_x))
+            worker.daemon = True
+            worker.start()
+            self.conns.append(conn)
+            self.workers.append(worker)
+        
+        super(Domain_Decomposition, self)._lattice()
+        super(Domain_Decomposition, self).__init__()
+        pass
+    
+    def _run(self, command, p=None, x=None):
+        """Scatters (p, x), runs command on every rank and returns the result"""
+        if x is not None: self.io_x[...] = x
+        if p is not None: self.io_p[...] = p
+        for conn in self.conns: conn.send(command)
+        try:
+            results = [receive(conn, worker, self.workers)
+                for conn, worker in zip(self.conns, self.workers)]
+        except RuntimeError:
+            self.conns, self.workers = [], []
+            raise
+        errors = [r for r in results if isinstance(r, Exception)]
+        if errors:
+            self.comm.reset()
+            raise next((e for e in errors if not isinstance(e, Aborted)), errors[0])
+        return results[0]
+    
+    def _toLattice(self, arr):
+        return Periodic_Lattice(arr.copy(), lattice_spacing=self.lattice_spacing)
+    
+    def kineticEnergy(self, p):
+        return .5 * np.sum(p**2, axis=None, dtype=np.float64)
+    
+    def potentialEnergy(self, positions):
+        """The action from a global reduction over the subdomains"""
+        return self._run(('action',), x=positions)
+    
+    def gradPotentialEnergy(self, positions):
+        """The force evaluated on the subdomains and gathered"""
+        self._run(('force',), x=positions)
+        return self._toLattice(self.io_p)
+    
+    def hamiltonian(self, p, x):
+        """The hamiltonian from a single global reduction
+        
+        Required Inputs
+            p :: np.array (nd) :: momentum array
+            x :: class :: see lattice.py for info
+        """
+        return np.asarray(self._run(('hamiltonian',), p=p, x=x), dtype=np.float64).reshape(1)
+    
+    def trajectory(self, p, x, step_size, n_steps):
+        """A leapfrog trajectory run cooperatively by the workers
+        
+        The signature is that of the trajectory option in dynamics.Leap_Frog
+        
+        Required Inputs
+            p           :: np.ndarray :: momentum
+            x           :: class :: see lattice.py for info
+            step_size   :: float :: integration step size
+            n_steps     :: int   :: number of leapfrog steps
+        """
+        self._run(('trajectory', step_size, n_steps), p=p, x=x)
+        return self.io_p.copy(), self._toLattice(self.io_x)
+    
+    def close(self):
+        """Stops the worker processes"""
+        for conn in self.conns: conn.send(('stop',))
+        for worker in self.workers: worker.join()
+        self.conns, self.workers = [], []
+        pass
+    
+    def terminate(self):
+        """Kills the worker processes when they cannot be stopped by close()"""
+        terminate(self.workers)
+        self.conns, self.workers = [], []
+        pass
@@ -14,6 +14,14 @@ class Leap_Frog(Init):
         step_size   :: integration step size
         n_steps     :: leap frog integration steps (trajectory length)
         save_path   :: saves the integration path - see _stepSteps() for locations
+        dtype       :: floating point type of (p, x) during integration.
+                        The default keeps the dtype of the inputs
+        trajectory  :: func :: a compiled trajectory f(p, x, step_size, n_steps)
+                        such as potentials.Klein_Gordon.trajectory. Replaces
+                        the python steps when the path is not saved
+        mass        :: mass.Mass_Matrix :: the drift is M^-1 p instead of p.
+                        The compiled trajectory assumes a unit mass so is not
+                        used when this is set
     
     Note: Do not confuse x0,p0 with initial x0,p0 for HD
     """
@@ -24,7 +32,10 @@ class Leap_Frog(Init):
             'step_size':0.1,
             'n_steps':250,
             'rand_steps':False,
-            'save_path':False
+            'save_path':False,
+            'dtype':None,
+            'trajectory':None,
+            'mass':None
             }
         self.initDefaults(kwargs)
         if self.n_steps == 1 and self.rand_steps: # save confusion
@@ -58,7 +69,7 @@ class Leap_Frog(Init):
         """
         self.n = self._getStepLen()
         
-        p, x = p0, x0
+        p, x = self._cast(p0), self._cast(x0)
         self._storeSteps(p, x, self.n) # store zeroth step
         
         iterator = range(0, self.n)
@@ -89,6 +100,10 @@ class Leap_Frog(Init):
             (x,p) :: tuple :: momentum, position
         """
         self.n = self._getStepLen()
+        p0, x0 = self._cast(p0), self._cast(x0)
+        
+        if self.trajectory is not None and self.mass is None:
+            return self.trajectory(p0, x0, self.step_size, self.n)
         
         # first step and half momentum step
         p = self._moveP(p0, x0, frac_step=0.5)
@@ -105,6 +120,15 @@ class Leap_Frog(Init):
         
         return p, x
     
+    def _cast(self, arr):
+        """Casts to self.dtype if required - a no-op when already cast
+        
+        Required Inputs
+            arr :: np.ndarray :: momentum or position
+        """
+        if self.dtype is None: return arr
+        return arr.astype(self.dtype, copy=False)
+    
     def _getStepLen(self):
         """Determines if steps are constant or binomially distributed
         
@@ -123,7 +147,7 @@ class Leap_Frog(Init):
             p :: float :: current momentum
             x :: float :: current position
         """
-        
+        if self.mass is not None: p = self.mass.velocity(p)
         x += frac_step*self.step_size*p
         return x
     
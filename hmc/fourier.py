@@ -0,0 +1,131 @@
+# default pip imports
+import numpy as np
+
+# local imports
+from common import Init
+from metropolis import Accept_Reject
+
+__docformat__ = "restructuredtext en"
+
+class Fourier_Sampler(Init):
+    """Independent samples of free (quadratic) translation invariant
+    lattice actions drawn exactly in Fourier space
+    
+    On a periodic lattice S = x^T M x/2 + b^T x has a circulant M whose
+    eigenvalues are the Fourier transform of the response of the
+    gradient to a unit source at the origin. These are found once by
+    probing `potential.duE`. White noise filtered by M^{-1/2},
+        
+        x = irfftn(rfftn(noise) / sqrt(lambda_k)) - M^{-1} b
+    
+    is then exactly distributed as exp(-S) and every lattice of a batch
+    is drawn with one pair of transforms over the lattice axes
+    
+    Parameters
+    ----------
+    x0         : array_like
+        A lattice of the shape to sample. Its values are not used
+    potential  : class
+        A quadratic lattice potential e.g. the free `Klein_Gordon` in any
+        dimension or `Quantum_Harmonic_Oscillator`
+    rng        : `np.random.RandomState`
+        random number state
+    dtype       : np.dtype, optional
+        floating point type of the samples
+    
+    Attributes
+    ----------
+    eigenvalues
+        The eigenvalue of M for each mode of rfftn
+    mean
+        The mean lattice -M^{-1} b
+    samples_traj
+        One draw per sample to match the HMC samplers
+    accept
+        Records an acceptance of 1 for every sample as in `metropolis.Accept_Reject`
+    """
+    def __init__(self, x0, potential, rng, **kwargs):
+        super(Fourier_Sampler, self).__init__()
+        self.initArgs(locals())
+        self.defaults = {
+            'dtype':None
+            }
+        self.initDefaults(kwargs)
+        
+        self.shape = np.shape(self.x0)
+        self.axes = tuple(xrange(-len(self.shape), 0))
+        self.eigenvalues, self.mean = self._spectrum()
+        self.accept = Accept_Reject(self.rng, accept_all=True, get_accept_rates=True)
+        pass
+    
+    def _spectrum(self):
+        """The eigenvalues of M from the response of the gradient to unit
+        sources at the origin and at a second site
+        
+        Raises a ValueError if the action is not quadratic, not
+        translation invariant or not positive definite
+        """
+        zero = self.x0*0.
+        g0 = np.asarray(self.potential.duE(zero))
+        source = np.zeros(self.shape)
+        source[(0,)*len(self.shape)] = 1.
+        once = np.asarray(self.potential.duE(zero + source)) - g0
+        twice = np.asarray(self.potential.duE(zero + 2*source)) - g0
+        if not np.allclose(twice, 2*once, rtol=1e-6, atol=1e-8):
+            raise ValueError("Error: The Fourier sampler requires a quadratic action!")
+        
+        shift = tuple(n//2 for n in self.shape)
+        moved = np.asarray(self.potential.duE(zero + self._roll(source, shift))) - g0
+        if not np.allclose(moved, self._roll(once, shift), rtol=1e-6, atol=1e-8):
+            raise ValueError("Error: The Fourier sampler requires a translation invariant action!")
+        
+        eigenvalues = np.fft.rfftn(once).real
+        if not (eigenvalues > 0).all():
+            raise ValueError("Error: The action is not positive definite!")
+        
+        mean = -np.fft.irfftn(np.fft.rfftn(g0)/eigenvalues, self.shape)
+        return eigenvalues, mean
+    
+    def _roll(self, arr, shift):
+        """Rolls arr by shift over every lattice axis"""
+        for axis, s in enumerate(shift): arr = np.roll(arr, s, axis=axis)
+        return arr
+    
+    def draw(self, n):
+        """n independent lattices with a leading sample axis
+        
+        Required Inputs
+            n :: int :: number of lattices
+        """
+        noise = self.rng.normal(size=(n,) + self.shape)
+        modes = np.fft.rfftn(noise, axes=self.axes)/np.sqrt(self.eigenvalues)
+        x = np.fft.irfftn(modes, self.shape, axes=self.axes) + self.mean
+        if self.dtype is not None: x = x.astype(self.dtype)
+        return x
+    
+    def sample(self, n_samples, n_burn_in = 20, verbose = False, verb_pos = 0, **kwargs):
+        """Draws the samples with the interface of `hmc.Hybrid_Monte_Carlo.sample`
+        
+        Parameters
+        ----------
+        n_samples       : integer
+            Number of samples
+        n_burn_in       : int,  optional
+            Number of burn in samples. These are independent draws too
+        verbose         : bool, optional
+            Unused as the samples are drawn in bulk
+        verb_pos        : int,  optional
+            Unused
+        
+        Notes
+        ----------
+        Other keyword arguments such as `mixing_angle` are ignored. The
+        momenta are empty
+        """
+        x = self.draw(n_burn_in + n_samples + 2)
+        self.burn_in, self.samples = list(x[:n_burn_in+1]), list(x[n_burn_in+1:])
+        self.burn_in_traj = [0] + [1]*n_burn_in
+        self.samples_traj = [0] + [1]*n_samples
+        self.burn_in_p, self.samples_p = [], []
+        for i in xrange(n_samples): self.accept.metropolisHastings(h_old=0., h_new=0.)
+        return (self.burn_in_p, self.samples_p), (self.burn_in, self.samples)
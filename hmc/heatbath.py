@@ -0,0 +1,171 @@
+# default pip imports
+import numpy as np
+from tqdm import tqdm
+
+# local imports
+import checks
+from common import Init
+from metropolis import Accept_Reject
+
+__docformat__ = "restructuredtext en"
+
+def checkerboard(shape):
+    """The even and odd sublattices as 0/1 float masks
+    
+    Required Inputs
+        shape :: tuple :: lattice shape with an even length on every axis
+    """
+    checks.tryAssertEqual(all(n % 2 == 0 for n in shape), True,
+        ' a periodic checkerboard needs even lattice lengths\n> shape: {}'.format(shape))
+    odd = np.indices(shape).sum(axis=0) % 2
+    return [(odd == 0).astype(np.float64), (odd == 1).astype(np.float64)]
+
+class Checkerboard_Heatbath(Init):
+    """Local heatbath and overrelaxation updates of the even and odd
+    sublattices for free (quadratic) nearest neighbour lattice actions
+    
+    For S = x^T M x/2 + b^T x the conditional distribution of a site
+    given its neighbours is Gaussian with precision A = M_ii and mean
+    x_i - g_i/A where g = grad S. Sites of one colour only couple to
+    the other colour so a whole sublattice is updated at once
+    
+        heatbath:       x_s -> x_s - g_s/A + noise/sqrt(A)
+        overrelaxation: x_s -> x_s - 2 g_s/A
+    
+    Parameters
+    ----------
+    x0         : array_like
+        Initial lattice with an even length on every axis
+    potential  : class
+        A quadratic lattice potential e.g. the free `Klein_Gordon`
+        or `Quantum_Harmonic_Oscillator`
+    rng        : `np.random.RandomState`
+        random number state
+    n_overrelax : int, optional
+        overrelaxation sweeps after each heatbath sweep
+    dtype       : np.dtype, optional
+        floating point type of the samples
+    
+    Attributes
+    ----------
+    precision
+        The diagonal M_ii found by probing `potential.duE`
+    samples_traj
+        Number of sweeps of each move to match the HMC samplers
+    accept
+        Records an acceptance of 1 for every move as in `metropolis.Accept_Reject`
+    """
+    def __init__(self, x0, potential, rng, **kwargs):
+        super(Checkerboard_Heatbath, self).__init__()
+        self.initArgs(locals())
+        self.defaults = {
+            'n_overrelax':1,
+            'dtype':None
+            }
+        self.initDefaults(kwargs)
+        
+        if self.dtype is not None: self.x0 = self.x0.astype(self.dtype)
+        self.masks = checkerboard(self.x0.shape)
+        self.precision = self._precision()
+        self.accept = Accept_Reject(self.rng, accept_all=True, get_accept_rates=True)
+        pass
+    
+    def _precision(self):
+        """The diagonal of the action from the change in the gradient when
+        each sublattice is shifted by one and two units
+        
+        Raises a ValueError if the responses are not linear
+        """
+        zero = self.x0*0.
+        g0 = self.potential.duE(zero)
+        precision = np.zeros(self.x0.shape)
+        for mask in self.masks:
+            once = np.asarray(self.potential.duE(zero + mask) - g0)
+            twice = np.asarray(self.potential.duE(zero + 2*mask) - g0)
+            if not np.allclose(twice, 2*once, rtol=1e-6, atol=1e-8):
+                raise ValueError("Error: The heatbath requires a quadratic action!")
+            precision += mask*once
+        
+        if not (precision > 0).all():
+            raise ValueError("Error: The action has a non-positive diagonal!")
+        return precision
+    
+    def heatbath(self, x):
+        """An exact Gaussian heatbath sweep of the even then the odd sites
+        
+        Required Inputs
+            x :: np.ndarray :: lattice
+        """
+        for mask in self.masks:
+            g = self.potential.duE(x)
+            noise = self.rng.normal(size=x.shape)
+            x = x + mask*(-g + np.sqrt(self.precision)*noise)/self.precision
+        return x
+    
+    def overrelax(self, x):
+        """A microcanonical overrelaxation sweep of the even then the odd sites
+        
+        Each site is reflected about its conditional mean so the
+        action is unchanged
+        
+        Required Inputs
+            x :: np.ndarray :: lattice
+        """
+        for mask in self.masks:
+            x = x - 2.*mask*self.potential.duE(x)/self.precision
+        return x
+    
+    def move(self, x):
+        """A heatbath sweep followed by n_overrelax overrelaxation sweeps
+        
+        Required Inputs
+            x :: np.ndarray :: lattice
+        """
+        x = self.heatbath(x)
+        for sweep in xrange(self.n_overrelax): x = self.overrelax(x)
+        self.accept.metropolisHastings(h_old=0., h_new=0.)
+        if self.dtype is not None: x = x.astype(self.dtype)
+        return x
+    
+    def sample(self, n_samples, n_burn_in = 20, verbose = False, verb_pos = 0, **kwargs):
+        """Runs the sampler with the interface of `hmc.Hybrid_Monte_Carlo.sample`
+        
+        Parameters
+        ----------
+        n_samples       : integer
+            Number of samples (# steps after burn in)
+        n_burn_in       : int,  optional
+            Number of steps to discard at start
+        verbose         : bool, optional
+            A progress bar if True
+        verb_pos        : int,  optional
+            Offset for status bar
+        
+        Notes
+        ----------
+        There are no momenta so the momentum samples are empty. Other
+        keyword arguments such as `mixing_angle` are ignored
+        """
+        x = self.x0.copy()
+        n = 1 + self.n_overrelax
+        
+        self.burn_in_p, self.samples_p = [], []
+        self.burn_in = [x.copy()]
+        self.burn_in_traj = [0]
+        for step in xrange(n_burn_in):
+            x = self.move(x)
+            self.burn_in.append(x.copy())
+            self.burn_in_traj.append(n)
+        
+        self.samples = [x.copy()]
+        self.samples_traj = [0]
+        iterator = xrange(n_samples)
+        if verbose:
+            iterator = tqdm(iterator, position=verb_pos,
+                desc='Sampling: {}'.format(verb_pos))
+        for step in iterator:
+            x = self.move(x)
+            self.samples.append(x.copy())
+            self.samples_traj.append(n)
+        
+        return (self.burn_in_p, self.samples_p), (self.burn_in, self.samples)
@@ -1,5 +1,6 @@
 # default pip imports
 import numpy as np
+import multiprocessing as mp
 from tqdm import tqdm
 
 # local imports
@@ -7,9 +8,47 @@ import checks
 from common import Init
 from dynamics import Leap_Frog
 from metropolis import Accept_Reject
+from mass import Mass_Matrix, Welford, adaptationWindows, regularise
+from distributed import sharedArray, receive
 
 __docformat__ = "restructuredtext en"
 
+def _speculation(rank, conn, dynamics, x0, ps, xs):
+    """The command loop of a worker process integrating the speculative
+    trajectory in row rank of the shared momenta and positions in place
+    """
+    dynamics.rand_steps = False # the lengths are drawn by the parent
+    while True:
+        command = conn.recv()
+        if command[0] == 'stop': break
+        try:
+            dynamics.n_steps = command[1]
+            x = x0.copy() # the shared row with the type of x0
+            np.asarray(x)[...] = xs[rank]
+            ps[rank], xs[rank] = dynamics.integrate(ps[rank].copy(), x)
+            result = None
+        except Exception as e:
+            result = e
+        conn.send(result)
+    conn.close()
+
+def _unsupported(option, combinations):
+    """Raises a ValueError naming the options that cannot be combined
+    with option
+    
+    Parameters
+    ----------
+    option : str
+        the option that was requested
+    combinations : list
+        (bool, str) pairs that are True for an unsupported option
+    """
+    names = [name for bad, name in combinations if bad]
+    if names:
+        raise ValueError("Error: {} is not supported with {}!".format(option, ', '.join(names)))
+    pass
+#
+
 class Hybrid_Monte_Carlo(Init):
     """The Hybrid (Hamiltonian) Monte Carlo method
     
@@ -33,6 +72,50 @@ class Hybrid_Monte_Carlo(Init):
     accept_kwargs    : dict, optional
         A dictionary of keyworkd arguments (kwargs) to pass to
         :class:`metropolis.Accept_Reject` as `self.accept(**accept_kwargs)`
+    dtype            : np.dtype, optional
+        floating point type of the fields, momenta and stored samples.
+        `'float32'` halves the memory traffic on large lattices while the
+        Hamiltonians for the accept/reject step remain in float64
+    mass             : :class:`mass.Mass_Matrix`, optional
+        A fixed mass matrix used by the refresh, kinetic energy and drift
+    adapt_mass       : str, optional
+        `'diag'` or `'dense'` to estimate the inverse mass matrix from the
+        covariance of the burn in samples in windows that double in length
+    block_size       : int, optional
+        Run the moves in compiled blocks of this many when the potential
+        has a `moves` kernel (see :func:`potentials.compiledMoves`) and
+        nothing needs Python between the moves. The random numbers of a
+        block are drawn together so the chain differs from that of the
+        Python moves with the same seed but has the same distribution.
+        :meth:`sample` raises a ValueError for the options the compiled
+        moves cannot make e.g. a mass matrix or the lifted acceptance
+    acceptance       : str, optional
+        `'standard'` M-H or `'lifted'` for the non-reversible test of
+        :meth:`metropolis.Accept_Reject.liftedMetropolis` which clusters
+        the rejections
+    lift_delta       : float, optional
+        Translation of the lifted uniform variable per move
+    flip             : str, optional
+        `'always'` reverses the momentum on a rejection. `'reduced'` only
+        reverses it with probability max(0, a_b - a)/(1 - a) where a and
+        a_b are the acceptance probabilities of the rejected trajectory
+        and of the trajectory from the reversed momentum. This costs an
+        extra trajectory per rejection (Wagoner and Pande 2012)
+    extra_chances    : int, optional
+        On a rejection the trajectory continues for up to this many
+        further segments of the same length as the first, even with
+        `rand_steps`, and the move is accepted at
+        the first that passes the look ahead test of
+        :meth:`metropolis.Accept_Reject.extraChance`. Only the standard
+        acceptance and flips are supported
+    speculate        : int, optional
+        Integrate the trajectories of up to this many following moves on
+        worker processes, assuming every move before them is rejected,
+        while the current one is integrated. The chain is exactly that of
+        the serial moves and a round commits one move more than the run
+        of rejections it starts with (see :meth:`_sampleSpeculative`).
+        :meth:`sample` raises a ValueError for the options it cannot be
+        combined with e.g. a mass matrix or extra chances
     
     Methods
     ----------
@@ -54,6 +137,8 @@ class Hybrid_Monte_Carlo(Init):
         Initial momentum
     x0 
         Initial position
+    extra_segments
+        The number of extra segments integrated by each move
     
     """
     def __init__(self, x0, dynamics, potential, rng, **kwargs):
@@ -62,15 +147,36 @@ class Hybrid_Monte_Carlo(Init):
         self.defaults = {
             'accept_kwargs':{ # kwargs to pass to accept
                 'store_acceptance':False
-                }
+                },
+            'dtype':None,
+            'mass':None,
+            'adapt_mass':None,
+            'block_size':None,
+            'acceptance':'standard',
+            'lift_delta':.05,
+            'flip':'always',
+            'extra_chances':0,
+            'speculate':0
             }
         self.initDefaults(kwargs)
         
+        if self.acceptance not in ('standard', 'lifted') or self.flip not in ('always', 'reduced'):
+            raise ValueError("Error: Unknown acceptance '{}' or flip '{}'!".format(
+                self.acceptance, self.flip))
+        if self.acceptance == 'lifted' and self.flip == 'reduced':
+            raise ValueError("Error: Reduced flips need the standard acceptance!")
+        if self.extra_chances and (self.acceptance, self.flip) != ('standard', 'always'):
+            raise ValueError("Error: Extra chances need the standard acceptance and flips!")
+        
         # legacy support - need to update
         a = 'store_acceptance'
         if a in kwargs: self.accept_kwargs[a] = kwargs[a]
         
-        self.momentum = Momentum(self.rng)
+        if self.dtype is not None: self.x0 = self.x0.astype(self.dtype)
+        if self.adapt_mass is not None and self.mass is None:
+            self.mass = Mass_Matrix(self.x0.shape, dense=self.adapt_mass == 'dense')
+        self.dynamics.mass = self.mass
+        self.momentum = Momentum(self.rng, dtype=self.dtype, mass=self.mass)
         self.accept = Accept_Reject(self.rng, **self.accept_kwargs)
         
         # Take the position in just for the shape
@@ -84,9 +190,11 @@ class Hybrid_Monte_Carlo(Init):
              error_msg=' x0.shape != p0.shape' \
              +'\n x0: {}, p0: {}'.format(*shapes))
         self.h_old = None
+        self.extra_segments = []
         pass
     
-    def sample(self, n_samples, n_burn_in = 20, mixing_angle=.5*np.pi, verbose = False, verb_pos = 0):
+    def sample(self, n_samples, n_burn_in = 20, mixing_angle=.5*np.pi, verbose = False, verb_pos = 0,
+            cluster_update = None, cluster_every = 1):
         """Runs the sampler for GHMC
         
         Parameters
@@ -105,6 +213,12 @@ class Hybrid_Monte_Carlo(Init):
             A progress bar if True
         verb_pos        : int,  optional 
             Offset for status bar
+        cluster_update  : class, optional
+            A field update with a `move(x)` method such as
+            :class:`cluster.Embedded_Wolff` that is made after every
+            `cluster_every` GHMC moves
+        cluster_every   : int,  optional
+            Number of GHMC moves between cluster updates
         
         Notes
         ----------
@@ -115,14 +229,27 @@ class Hybrid_Monte_Carlo(Init):
         p, x = self.p0.copy(), self.x0.copy()
         self.h_old = None
         
+        if self._blocks(cluster_update):
+            return self._sampleBlocks(p, x, n_samples, n_burn_in, mixing_angle, verbose, verb_pos)
+        if self._speculative(cluster_update):
+            return self._sampleSpeculative(p, x, n_samples, n_burn_in, mixing_angle,
+                verbose, verb_pos)
+        
         # Burn in section
         self.burn_in_p = [p.copy()]
         self.burn_in = [x.copy()]
         self.burn_in_traj = [0]
         
+        if self.adapt_mass is not None:
+            windows = adaptationWindows(n_burn_in)
+            estimate = Welford(self.mass.size, dense=self.mass.dense)
+        
         iterator = xrange(n_burn_in)
         for step in iterator: # burn in
             p, x = self.move(p, x, mixing_angle=mixing_angle)
+            if cluster_update is not None and (step + 1) % cluster_every == 0:
+                x = cluster_update.move(x)
+            if self.adapt_mass is not None: self._adaptMass(step, x, windows, estimate)
             self.burn_in_p.append(p.copy())
             self.burn_in.append(x.copy())
             self.burn_in_traj.append(self.dynamics.n)
@@ -139,12 +266,213 @@ class Hybrid_Monte_Carlo(Init):
             # tqdm.write('Sampling ...')
         for step in iterator:
             p, x = self.move(p, x, mixing_angle=mixing_angle)
+            if cluster_update is not None and (step + 1) % cluster_every == 0:
+                x = cluster_update.move(x)
             self.samples_p.append(p.copy())
             self.samples.append(x.copy())
             self.samples_traj.append(self.dynamics.n)
         
         return (self.burn_in_p, self.samples_p), (self.burn_in, self.samples)
     
+    def _blocks(self, cluster_update):
+        """True if the moves run in compiled blocks. Raises a ValueError
+        if `block_size` is combined with an option that the compiled
+        moves do not make
+        
+        Parameters
+        ----------
+        cluster_update : class
+            see :meth:`sample`
+        """
+        if self.block_size is None: return False
+        stored = [k for k in self.accept.store if getattr(self.accept, 'get_' + k)]
+        _unsupported('block_size', [
+            (getattr(self.potential, 'moves', None) is None, 'a potential without a compiled moves kernel'),
+            (np.asarray(self.x0).dtype not in (np.float32, np.float64), 'the dtype {}'.format(np.asarray(self.x0).dtype)),
+            (type(self).move != Hybrid_Monte_Carlo.move, 'an overridden move()'),
+            (not isinstance(self.dynamics, Leap_Frog) or self.dynamics.duE is not self.potential.duE,
+                'dynamics other than the Leap_Frog of the potential'),
+            (self.dynamics.save_path, 'save_path'),
+            (self.mass is not None, 'a mass matrix'),
+            (cluster_update is not None, 'cluster updates'),
+            (self.accept.accept_all, 'accept_all'),
+            (self.acceptance != 'standard', 'the lifted acceptance'),
+            (self.flip != 'always', 'reduced flips'),
+            (self.extra_chances, 'extra chances'),
+            (not set(stored) <= set(['accept_rates']), 'stored {}'.format(', '.join(stored)))])
+        return True
+    
+    def _speculative(self, cluster_update):
+        """True if the moves after a rejection are speculated on worker
+        processes. Raises a ValueError if `speculate` is combined with an
+        option that the speculative moves do not make
+        
+        Parameters
+        ----------
+        cluster_update : class
+            see :meth:`sample`
+        """
+        if self.speculate <= 0: return False
+        _unsupported('speculate', [
+            (type(self).move != Hybrid_Monte_Carlo.move, 'an overridden move()'),
+            (not isinstance(self.dynamics, Leap_Frog), 'dynamics other than Leap_Frog'),
+            (self.dynamics.save_path, 'save_path'),
+            (self.mass is not None, 'a mass matrix'),
+            (cluster_update is not None, 'cluster updates'),
+            (self.accept.accept_all, 'accept_all'),
+            (self.acceptance != 'standard', 'the lifted acceptance'),
+            (self.flip != 'always', 'reduced flips'),
+            (self.extra_chances, 'extra chances')])
+        return True
+    
+    def _sampleSpeculative(self, p, x, n_samples, n_burn_in, mixing_angle, verbose, verb_pos):
+        """Runs :meth:`sample` with the moves that follow a rejection
+        integrated in advance on `speculate` worker processes
+        
+        A round draws the random numbers of the next `speculate + 1`
+        moves in the order that :meth:`move` draws them. Move k of the
+        round starts from the current position with the momentum left by
+        k rejections and the workers integrate moves 1, 2, ... while this
+        process integrates move 0. The moves are tested in order up to
+        the first acceptance. The later moves started from the wrong state
+        so are discarded but their random numbers are kept for the moves
+        that follow. The chain is therefore exactly that of :meth:`move`
+        
+        Parameters
+        ----------
+        See :meth:`sample`
+        """
+        shape = np.shape(x)
+        ps = sharedArray((self.speculate,) + shape, np.asarray(p).dtype)
+        xs = sharedArray((self.speculate,) + shape, np.asarray(x).dtype)
+        conns, workers = [], []
+        for rank in xrange(self.speculate):
+            conn, child = mp.Pipe()
+            worker = mp.Process(target=_speculation,
+                args=(rank, child, self.dynamics, x, ps, xs))
+            worker.daemon = True
+            worker.start()
+            conns.append(conn)
+            workers.append(worker)
+        
+        total = n_burn_in + n_samples
+        bar = tqdm(total=total, position=verb_pos,
+            desc='Sampling: {}'.format(verb_pos)) if verbose else None
+        chain = [(p.copy(), x.copy(), 0)]
+        queue = [] # (noise, steps, uniform) of the moves to come
+        try:
+            while len(chain) <= total:
+                size = min(self.speculate + 1, total + 1 - len(chain))
+                while len(queue) < size:
+                    noise = self.rng.normal(size=shape, scale=1., loc=0.)
+                    if self.dtype is not None: noise = noise.astype(self.dtype)
+                    queue.append((noise, self.dynamics._getStepLen(), self.rng.uniform()))
+                
+                # the momentum after each number of rejections
+                starts = [p]
+                for noise, steps, u in queue[:size]:
+                    starts.append(self.momentum._refresh(starts[-1], noise, theta=mixing_angle))
+                starts = starts[1:]
+                
+                for k in xrange(1, size):
+                    ps[k-1], xs[k-1] = starts[k], x
+                    conns[k-1].send(('run', queue[k][1]))
+                ends = [self._integrateFixed(starts[0].copy(), x.copy(), queue[0][1])]
+                for k in xrange(1, size):
+                    result = receive(conns[k-1], workers[k-1], workers)
+                    if isinstance(result, Exception): raise result
+                    y = x.copy()
+                    np.asarray(y)[...] = xs[k-1]
+                    ends.append((ps[k-1].copy(), y))
+                
+                for k in xrange(size):
+                    steps, u = queue[k][1:]
+                    p_new, x_new = self.momentum.flip(ends[k][0]), ends[k][1]
+                    self.h_old = self.hamiltonian(starts[k], x)
+                    self.h_new = self.hamiltonian(p_new, x_new)
+                    accept = self.accept.metropolisHastings(h_old=self.h_old,
+                        h_new=self.h_new, u=u)
+                    if accept:
+                        p, x = p_new, x_new
+                    else:
+                        p = starts[k]
+                    chain.append((p.copy(), x.copy(), steps))
+                    if accept: break
+                del queue[:k+1]
+                if bar is not None: bar.update(k + 1)
+        finally:
+            for conn, worker in zip(conns, workers):
+                if worker.is_alive(): conn.send(('stop',))
+            for worker in workers: worker.join()
+            if bar is not None: bar.close()
+        
+        self.dynamics.n = chain[-1][2]
+        burn_in, samples = chain[:n_burn_in+1], chain[n_burn_in:]
+        samples[0] = samples[0][:2] + (0,)
+        self.burn_in_p, self.burn_in, self.burn_in_traj = map(list, zip(*burn_in))
+        self.samples_p, self.samples, self.samples_traj = map(list, zip(*samples))
+        return (self.burn_in_p, self.samples_p), (self.burn_in, self.samples)
+    
+    def _sampleBlocks(self, p, x, n_samples, n_burn_in, mixing_angle, verbose, verb_pos):
+        """Runs :meth:`sample` with blocks of compiled moves
+        
+        Parameters
+        ----------
+        See :meth:`sample`
+        """
+        chains = []
+        for n, show in [(n_burn_in, False), (n_samples, verbose)]:
+            chain_p, chain, traj = [p.copy()], [x.copy()], [0]
+            blocks = xrange(0, n, self.block_size)
+            if show:
+                blocks = tqdm(blocks, position=verb_pos,
+                    desc='Sampling: {}'.format(verb_pos))
+            for start in blocks:
+                p, x, samples, samples_p, steps = self.moveBlock(p, x,
+                    min(self.block_size, n - start), mixing_angle)
+                chain.extend(samples)
+                chain_p.extend(samples_p)
+                traj.extend(steps)
+            chains.append((chain_p, chain, traj))
+        
+        (self.burn_in_p, self.burn_in, self.burn_in_traj), \
+            (self.samples_p, self.samples, self.samples_traj) = chains
+        return (self.burn_in_p, self.samples_p), (self.burn_in, self.samples)
+    
+    def moveBlock(self, p, x, n_moves, mixing_angle=.5*np.pi):
+        """Makes n_moves GHMC moves in one call of the compiled kernel
+        of the potential
+        
+        Parameters
+        ----------
+        p            : np.ndarray
+            momentum
+        x            : np.ndarray
+            position
+        n_moves      : int
+            number of moves
+        mixing_angle : float,   optional
+            `0` is no mixing, `np.pi/2.` is a total refreshment
+        
+        Notes
+        ----------
+        Returns `p, x, samples, samples_p, steps` where the samples are
+        arrays with one row per move and steps are the leapfrog steps of
+        each move
+        """
+        if self.dynamics.rand_steps: # as dynamics.Leap_Frog._getStepLen
+            steps = self.rng.geometric(1./float(self.dynamics.n_steps), size=n_moves)
+        else:
+            steps = np.full(n_moves, self.dynamics.n_steps, dtype=int)
+        noise = self.rng.normal(size=(n_moves,) + np.shape(x), scale=1., loc=0.)
+        uniforms = self.rng.uniform(size=n_moves)
+        
+        p, x, samples, samples_p, accept_rates = self.potential.moves(p, x,
+            self.dynamics.step_size, steps, mixing_angle, noise, uniforms)
+        if self.accept.get_accept_rates: self.accept.accept_rates.extend(accept_rates)
+        self.dynamics.n = steps[-1]
+        return p, x, samples, samples_p, steps
+    
     def move(self, p, x, step_size = None, n_steps = None, mixing_angle=.5*np.pi):
         """A generalised Hybrid Monte Carlo move:
         Combines Hamiltonian Dynamics and Momentum Refreshment
@@ -188,12 +516,142 @@ class Hybrid_Monte_Carlo(Init):
         p = self.momentum.flip(p)
         
         # Metropolis-Hastings accept / reject condition
-        self.h_old = self.potential.hamiltonian(p0, x0)     # get old hamiltonian (after mom refresh)
-        self.h_new = self.potential.hamiltonian(p, x)       # get new hamiltonian
-        accept = self.accept.metropolisHastings(h_old=self.h_old, h_new=self.h_new)
+        self.h_old = self.hamiltonian(p0, x0)     # get old hamiltonian (after mom refresh)
+        self.h_new = self.hamiltonian(p, x)       # get new hamiltonian
+        if self.acceptance == 'lifted':
+            accept = self.accept.liftedMetropolis(h_old=self.h_old, h_new=self.h_new,
+                delta=self.lift_delta)
+        elif self.extra_chances:
+            return self._lookAhead(p0, x0, p, x)
+        else:
+            accept = self.accept.metropolisHastings(h_old=self.h_old, h_new=self.h_new)
         
         if accept: return p,x
-        else: return p0, x0 # return old p,x
+        # the flip in the next refresh is undone if the rejection does not reverse
+        if self.flip == 'reduced' and not self._reverse(p0, x0):
+            return self.momentum.flip(p0), x0
+        return p0, x0 # return old p,x
+    
+    def _lookAhead(self, p0, x0, p, x):
+        """Continues a trajectory for up to `extra_chances` segments
+        until one is accepted by the look ahead test
+        
+        One uniform number decides the move. Every segment has the
+        length of the first so the move stays reversible when the lengths
+        are random. The steps of the segments are added to dynamics.n and
+        the number of extra segments used is appended to extra_segments
+        
+        Parameters
+        ----------
+        p0 : np.ndarray
+            momentum at the start of the trajectory
+        x0 : np.ndarray
+            position at the start of the trajectory
+        p : np.ndarray
+            flipped momentum at the end of the first segment
+        x : np.ndarray
+            position at the end of the first segment
+        """
+        u = self.rng.uniform()
+        h = [self.h_old, self.h_new]
+        n = segment = self.dynamics.n
+        for k in xrange(self.extra_chances + 1):
+            if k > 0:
+                p, x = self._integrateFixed(self.momentum.flip(p), x, segment)
+                p = self.momentum.flip(p)
+                n += segment
+                h.append(self.hamiltonian(p, x))
+            if self.accept.extraChance(h, u, final=k == self.extra_chances): break
+        else:
+            p, x = p0, x0 # return old p,x
+        
+        self.h_new = h[-1]
+        self.dynamics.n = n
+        self.extra_segments.append(k)
+        return p, x
+    
+    def _reverse(self, p0, x0):
+        """Decides if a rejected move reverses the momentum with the
+        reduced flip probability max(0, a_b - a)/(1 - a)
+        
+        The trajectory from the reversed momentum has the same number
+        of steps as the rejected one. Its steps are added to dynamics.n
+        
+        Parameters
+        ----------
+        p0 : np.ndarray
+            momentum at the start of the rejected trajectory
+        x0 : np.ndarray
+            position at the start of the rejected trajectory
+        """
+        n = self.dynamics.n
+        p, x = self._integrateFixed(self.momentum.flip(p0).copy(), x0.copy(), n)
+        self.dynamics.n = 2*n
+        
+        h_back = self.hamiltonian(self.momentum.flip(p), x)
+        # a diverged trajectory (nan) has no chance of acceptance
+        a, a_back = np.nan_to_num(np.exp(np.minimum(self.h_old - [self.h_new, h_back], 0.))).ravel()
+        if a_back <= a: return False
+        return self.rng.uniform() < (a_back - a)/(1. - a)
+    
+    def _integrateFixed(self, p, x, n):
+        """Integrates exactly n steps whether or not the trajectory
+        lengths are random
+        
+        Parameters
+        ----------
+        p : np.ndarray
+            momentum
+        x : np.ndarray
+            position
+        n : int
+            number of leapfrog steps
+        """
+        rand_steps, n_steps = self.dynamics.rand_steps, self.dynamics.n_steps
+        self.dynamics.rand_steps, self.dynamics.n_steps = False, n
+        try:
+            return self.dynamics.integrate(p, x)
+        finally:
+            self.dynamics.rand_steps, self.dynamics.n_steps = rand_steps, n_steps
+    
+    def hamiltonian(self, p, x):
+        """The hamiltonian of the potential with the kinetic
+        energy of the mass matrix if there is one
+        
+        Parameters
+        ----------
+        p : np.ndarray
+            momentum
+        x : np.ndarray
+            position
+        """
+        if self.mass is None: return self.potential.hamiltonian(p, x)
+        h = self.mass.kineticEnergy(p) + np.sum(self.potential.uE(x), dtype=np.float64)
+        return np.asarray(h, dtype=np.float64).reshape(1)
+    
+    def _adaptMass(self, step, x, windows, estimate):
+        """Accumulates the burn in samples and updates the mass matrix
+        at the end of each adaptation window
+        
+        Parameters
+        ----------
+        step     : int
+            burn in move just made (from 0)
+        x        : np.ndarray
+            position after the move
+        windows  : list
+            (start, end) moves of each window from :func:`mass.adaptationWindows`
+        estimate : :class:`mass.Welford`
+            the running covariance of the current window
+        """
+        for start, end in windows:
+            if start <= step < end:
+                estimate.update(x)
+                if step == end - 1:
+                    self.mass.update(regularise(estimate.variance(), estimate.n))
+                    estimate.reset()
+                break
+        pass
     
 #
 class Momentum(object):
@@ -201,9 +659,17 @@ class Momentum(object):
     
     Required Inputs
         rng :: np.random.RandomState :: random number generator
+    
+    Optional Inputs
+        dtype :: np.dtype :: floating point type of the noise. The default
+                            is that of the random number generator (float64)
+        mass  :: mass.Mass_Matrix :: the noise is drawn from N(0, M). The
+                            default is a unit mass
     """
-    def __init__(self, rng):
+    def __init__(self, rng, dtype=None, mass=None):
         self.rng = rng
+        self.dtype = dtype
+        self.mass = mass
         pass
     
     def fullRefresh(self, p):
@@ -227,7 +693,11 @@ class Momentum(object):
         """
         
         # Random Gaussian noise with: sdev=scale & mean=loc
-        self.noise = self.rng.normal(size=p.shape, scale=1., loc=0.)
+        if self.mass is None:
+            self.noise = self.rng.normal(size=p.shape, scale=1., loc=0.)
+        else:
+            self.noise = self.mass.noise(self.rng, p.shape)
+        if self.dtype is not None: self.noise = self.noise.astype(self.dtype)
         self.mixed = self._refresh(p, self.noise, theta=mixing_angle)
         
         return self.mixed
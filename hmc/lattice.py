@@ -1,4 +1,6 @@
 import numpy as np
+from scipy import sparse
+from multiprocessing.pool import ThreadPool
 
 import checks
 
@@ -98,6 +100,272 @@ class Periodic_Lattice(np.ndarray):
             raise ValueError('Unexpected index: {}'.format(index))
     
 #
+class Lattice_Geometry(object):
+    """Precomputed neighbour tables and sparse stencils for a lattice geometry
+    
+    The tables are built once per geometry and are then applied as either a
+    sparse mat-vec or a gather over the flattened (C-ordered) lattice sites.
+    
+    Required Inputs
+        shape :: tuple :: the lattice shape
+    
+    Optional Inputs
+        boundaries  :: str/list :: 'periodic', 'antiperiodic' or 'open' for
+                                    all axes or as a list with one per axis
+        spacing     :: float/list :: link lengths relative to the lattice
+                                    spacing. One per axis for anisotropic
+                                    lattices where each may also be an array
+                                    of shape[axis] link lengths for
+                                    non-uniform spacing. Link i joins i to i+1
+    
+    Notes
+        'open' boundaries are Dirichlet: the field vanishes beyond the edge
+        so that the boundary link is removed from the hopping term only
+        
+        All operators are symmetric so the force is the exact
+        gradient of the corresponding quadratic action
+    """
+    boundary_signs = {'periodic':1., 'antiperiodic':-1., 'open':0.}
+    
+    def __init__(self, shape, boundaries='periodic', spacing=1.):
+        self.shape = tuple(shape)
+        self.dim = len(self.shape)
+        self.n_sites = int(np.prod(self.shape))
+        
+        if isinstance(boundaries, str): boundaries = [boundaries]*self.dim
+        if np.ndim(spacing) == 0: spacing = [spacing]*self.dim
+        self.boundaries = tuple(boundaries)
+        self.spacing = tuple(spacing)
+        
+        checks.tryAssertEqual(len(self.boundaries), self.dim,
+            "mismatch of boundaries...\nreceived: {}\ndims: {}".format(
+            self.boundaries, self.dim))
+        checks.tryAssertEqual(len(self.spacing), self.dim,
+            "mismatch of spacing...\nreceived: {}\ndims: {}".format(
+            self.spacing, self.dim))
+        
+        self._tables()
+        self._operators()
+        pass
+    
+    def _tables(self):
+        """Builds the forwards and backwards neighbour tables
+        
+        Each table has shape (dim, n_sites) and is indexed by the flat site.
+        The signs are 0 on open boundary links and -1 across antiperiodic
+        boundaries. The weights are 1/h^2 of the link joining the neighbours
+        """
+        coords = np.indices(self.shape).reshape(self.dim, -1)
+        self.fwd = np.empty((self.dim, self.n_sites), dtype=int)
+        self.bwd = np.empty((self.dim, self.n_sites), dtype=int)
+        self.fwd_sign = np.ones((self.dim, self.n_sites))
+        self.bwd_sign = np.ones((self.dim, self.n_sites))
+        self.fwd_weight = np.empty((self.dim, self.n_sites))
+        self.bwd_weight = np.empty((self.dim, self.n_sites))
+        
+        for axis, (l, bc, h) in enumerate(zip(self.shape, self.boundaries, self.spacing)):
+            if bc not in self.boundary_signs:
+                raise ValueError('Unknown boundary: {}'.format(bc))
+            
+            h = np.ones(l)*np.asarray(h, dtype='float64') # link lengths
+            c = coords[axis]
+            
+            shift = np.zeros(self.dim, dtype=int)
+            shift[axis] = 1
+            self.fwd[axis] = np.ravel_multi_index(coords + shift[:, None], self.shape, mode='wrap')
+            self.bwd[axis] = np.ravel_multi_index(coords - shift[:, None], self.shape, mode='wrap')
+            
+            sign = self.boundary_signs[bc]
+            self.fwd_sign[axis, c == l-1] = sign    # links across the boundary
+            self.bwd_sign[axis, c == 0] = sign
+            
+            self.fwd_weight[axis] = 1./h[c]**2
+            self.bwd_weight[axis] = 1./h[(c - 1) % l]**2
+        
+        # the coefficient of each site in the laplacian
+        self.diagonal = -(self.fwd_weight + self.bwd_weight).sum(axis=0)
+        pass
+    
+    def _operators(self):
+        """Builds the sparse hopping matrix and Laplacian
+        
+        The hopping matrix sums over the (weighted) neighbours and the
+        Laplacian is the hopping matrix plus the diagonal
+        """
+        rows = np.tile(np.arange(self.n_sites), 2*self.dim)
+        cols = np.concatenate([self.fwd.ravel(), self.bwd.ravel()])
+        vals = np.concatenate([(self.fwd_sign*self.fwd_weight).ravel(),
+                               (self.bwd_sign*self.bwd_weight).ravel()])
+        
+        # coo -> csr sums the duplicates that occur for lengths <= 2
+        self.hopping = sparse.coo_matrix((vals, (rows, cols)),
+            shape=(self.n_sites, self.n_sites)).tocsr()
+        self.hopping.eliminate_zeros()
+        self.laplacian = (self.hopping + sparse.diags(self.diagonal)).tocsr()
+        self._typed = {}
+        pass
+    
+    def _operator(self, name, dtype):
+        """returns the named sparse operator cast to the floating point
+        dtype of the field so that float32 lattices are not upcast"""
+        dtype = np.dtype(dtype) if np.dtype(dtype).kind == 'f' else np.dtype(np.float64)
+        if (name, dtype) not in self._typed:
+            self._typed[(name, dtype)] = getattr(self, name).astype(dtype)
+        return self._typed[(name, dtype)]
+    
+    def _flat(self, arr):
+        """views arr as (n_sites, batch) where any trailing axes are batches"""
+        arr = np.asarray(arr)
+        checks.tryAssertEqual(arr.shape[:self.dim], self.shape,
+            "mismatch of lattice shape...\nreceived: {}\nexpected: {}".format(
+            arr.shape[:self.dim], self.shape))
+        return arr.reshape(self.n_sites, -1)
+    
+    def laplace(self, arr):
+        """Laplacian as a single sparse mat-vec
+        
+        Required Inputs
+            arr :: np.ndarray :: shape of the lattice with optional
+                                trailing batch axes (e.g. many chains)
+        """
+        flat = self._flat(arr)
+        return self._operator('laplacian', flat.dtype).dot(flat).reshape(np.shape(arr))
+    
+    def hop(self, arr):
+        """Weighted sum over nearest neighbours as a sparse mat-vec
+        
+        Required Inputs
+            arr :: np.ndarray :: as in laplace()
+        """
+        flat = self._flat(arr)
+        return self._operator('hopping', flat.dtype).dot(flat).reshape(np.shape(arr))
+    
+    def laplaceGather(self, arr):
+        """Laplacian through a gather over the cached neighbour tables
+        
+        Equivalent to laplace() but avoids the sparse matrix overhead
+        on very small lattices
+        
+        Required Inputs
+            arr :: np.ndarray :: as in laplace()
+        """
+        flat = self._flat(arr)
+        out = self.diagonal[:, None]*flat
+        for axis in xrange(self.dim):
+            out += (self.fwd_sign[axis]*self.fwd_weight[axis])[:, None]*flat[self.fwd[axis]]
+            out += (self.bwd_sign[axis]*self.bwd_weight[axis])[:, None]*flat[self.bwd[axis]]
+        if flat.dtype.kind == 'f': out = out.astype(flat.dtype, copy=False)
+        return out.reshape(np.shape(arr))
+#
+_geometries = {}
+def getGeometry(shape, boundaries='periodic', spacing=1.):
+    """Returns a cached Lattice_Geometry so that the tables are only
+    built once per geometry
+    
+    See Lattice_Geometry for the inputs
+    """
+    if np.ndim(spacing) == 0:
+        spacing_key = float(spacing)
+    else: # may be ragged: one array per axis
+        spacing_key = tuple(tuple(np.ravel(h)) for h in spacing)
+    key = (tuple(shape), str(boundaries), spacing_key)
+    if key not in _geometries:
+        _geometries[key] = Lattice_Geometry(shape, boundaries, spacing)
+    return _geometries[key]
+#
+def restrict(arr, block=2):
+    """Block-spin restriction: the average of each block of block^d sites
+    
+    Required Inputs
+        arr :: np.ndarray :: fine lattice with every axis divisible by block
+    
+    Optional Inputs
+        block :: int :: sites per block along each axis
+    """
+    arr = np.asarray(arr)
+    checks.tryAssertEqual(all(n % block == 0 for n in arr.shape), True,
+        ' lattice not divisible into blocks\n> shape: {}, block: {}'.format(arr.shape, block))
+    blocks = sum(((n // block, block) for n in arr.shape), ())
+    return arr.reshape(blocks).mean(axis=tuple(xrange(1, 2*arr.ndim, 2)))
+
+def prolong(arr, block=2):
+    """Block-spin prolongation: copies each coarse site to its block of
+    block^d fine sites (piecewise constant interpolation)
+    
+    The transpose of prolong is block^d * restrict
+    
+    Required Inputs
+        arr :: np.ndarray :: coarse lattice
+    
+    Optional Inputs
+        block :: int :: sites per block along each axis
+    """
+    arr = np.asarray(arr)
+    for ax in xrange(arr.ndim): arr = np.repeat(arr, block, axis=ax)
+    return arr
+#
+_pools = {}
+def getThreadPool(n_threads):
+    """Returns a cached ThreadPool so that every Slab_Decomposition with
+    the same n_threads shares its threads, which are never joined
+    
+    Required Inputs
+        n_threads :: int :: number of threads
+    """
+    if n_threads not in _pools:
+        _pools[n_threads] = ThreadPool(n_threads)
+    return _pools[n_threads]
+#
+class Slab_Decomposition(object):
+    """Splits a periodic lattice into slabs along the slowest (first) axis
+    that are processed by a pool of threads
+    
+    Each slab is passed with one periodic halo row either side so that
+    nearest neighbour stencils are exact on the slab interior. Interior
+    slabs are views, only the two edge slabs copy to wrap the boundary
+    
+    Required Inputs
+        n_threads :: int :: number of threads and maximum number of slabs
+    
+    Notes
+        The work functions should release the GIL to scale: NumPy
+        arithmetic and the clibs kernels do. Results are returned in
+        slab order so reductions are deterministic for a given n_threads.
+        The pool is shared between instances - see getThreadPool()
+    """
+    def __init__(self, n_threads):
+        self.n_threads = n_threads
+        self.pool = getThreadPool(n_threads)
+        pass
+    
+    def bounds(self, n):
+        """The (start, stop) rows of each slab for an axis of length n"""
+        edges = np.linspace(0, n, min(self.n_threads, n) + 1).astype(int)
+        return zip(edges[:-1], edges[1:])
+    
+    def halo(self, arr, start, stop):
+        """arr[start-1:stop+1] along axis 0 with periodic wrapping
+        
+        Required Inputs
+            arr         :: np.ndarray :: the full lattice
+            start, stop :: int :: slab rows
+        """
+        n = arr.shape[0]
+        if start > 0 and stop < n: return arr[start-1:stop+1]
+        return arr.take(np.arange(start-1, stop+1) % n, axis=0)
+    
+    def map(self, fn, arr):
+        """Returns [fn(slab, start, stop)] in slab order where slab includes
+        the halo rows so slab[1:-1] is arr[start:stop]
+        
+        Required Inputs
+            fn  :: func :: the work for a single slab
+            arr :: np.ndarray :: the full lattice
+        """
+        arr = np.asarray(arr)
+        work = lambda (start, stop): fn(self.halo(arr, start, stop), start, stop)
+        return self.pool.map(work, self.bounds(arr.shape[0]))
+#
 def laplacian(lattice, position, a_power=0):
     """lattice Laplacian for a point with a periodic boundary
     
@@ -0,0 +1,171 @@
+import numpy as np
+from scipy import linalg
+
+__all__ = [ 'Welford',
+            'Mass_Matrix',
+            'adaptationWindows',
+            'regularise']
+
+class Welford(object):
+    """Running mean and (co)variance from Welford's updates
+    
+    Required Inputs
+        size :: int :: number of degrees of freedom
+    
+    Optional Inputs
+        dense :: bool :: accumulate the full covariance instead of the diagonal
+    """
+    def __init__(self, size, dense=False):
+        self.size = size
+        self.dense = dense
+        self.reset()
+        pass
+    
+    def reset(self):
+        self.n = 0
+        self.mean = np.zeros(self.size)
+        self.m2 = np.zeros((self.size, self.size) if self.dense else self.size)
+        pass
+    
+    def update(self, x):
+        """Adds the sample x which is flattened
+        
+        Required Inputs
+            x :: np.ndarray :: a sample
+        """
+        x = np.asarray(x, dtype=np.float64).ravel()
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta/self.n
+        if self.dense:
+            self.m2 += np.outer(x - self.mean, delta)
+        else:
+            self.m2 += (x - self.mean)*delta
+        pass
+    
+    def variance(self):
+        """The unbiased sample variance, or covariance when dense"""
+        return self.m2/max(self.n - 1, 1)
+#
+def regularise(variance, n, shrinkage=5., floor=1e-3):
+    """Shrinks an estimated (co)variance towards a small multiple of the identity
+        
+        (n/(n + s)) var + floor s/(n + s) I
+    
+    as in Stan so that short windows cannot give a singular mass matrix
+    
+    Required Inputs
+        variance :: np.ndarray :: diagonal or dense estimate
+        n        :: int :: number of samples in the estimate
+    
+    Optional Inputs
+        shrinkage :: float :: pseudo samples of the prior
+        floor     :: float :: variance of the prior
+    """
+    n = float(n)
+    reg = n/(n + shrinkage)*variance
+    prior = floor*shrinkage/(n + shrinkage)
+    if np.ndim(variance) == 2:
+        return reg + prior*np.identity(variance.shape[0])
+    return reg + prior
+
+def adaptationWindows(n_burn_in, init_buffer=75, term_buffer=50, base_window=25):
+    """The burn in moves at which the mass matrix is updated
+    
+    A fast initial buffer is followed by slow windows that double in length
+    and a terminal buffer in which the mass is fixed, as in Stan. When the
+    burn in is too short the buffers are 15% and 10% of it
+    
+    Required Inputs
+        n_burn_in :: int :: number of burn in moves
+    
+    Returns the (start, end) move of each estimation window
+    """
+    if n_burn_in < init_buffer + term_buffer + base_window:
+        init_buffer = int(.15*n_burn_in)
+        term_buffer = int(.1*n_burn_in)
+        base_window = n_burn_in - init_buffer - term_buffer
+    if base_window <= 0: return []
+    
+    windows = []
+    end_adapt = n_burn_in - term_buffer
+    start, size = init_buffer, base_window
+    while start < end_adapt:
+        end = start + size
+        # extend the last window to the terminal buffer
+        if end + 2*size > end_adapt: end = end_adapt
+        windows.append((start, end))
+        start, size = end, 2*size
+    return windows
+#
+class Mass_Matrix(object):
+    """A diagonal or dense mass matrix M held through its inverse
+    
+    The momenta are drawn from N(0, M), the kinetic energy is p^T M^-1 p/2
+    and the leapfrog drift is M^-1 p. Setting M^-1 to the covariance of
+    the target makes the dynamics see a target with unit variance
+    
+    Required Inputs
+        shape :: tuple :: shape of the positions
+    
+    Optional Inputs
+        dense :: bool :: a full matrix over the flattened positions
+                        instead of one entry per position
+    """
+    def __init__(self, shape, dense=False):
+        self.shape = tuple(shape)
+        self.size = int(np.prod(self.shape))
+        self.dense = dense
+        if dense:
+            self.update(np.identity(self.size))
+        else:
+            self.update(np.ones(self.size))
+        pass
+    
+    def update(self, inv):
+        """Sets the inverse mass matrix
+        
+        Required Inputs
+            inv :: np.ndarray :: diagonal (size,) or dense (size, size) M^-1
+        """
+        if self.dense:
+            self.inv = np.asarray(inv, dtype=np.float64).reshape(self.size, self.size)
+            self.inv_chol = linalg.cholesky(self.inv, lower=True)
+        else:
+            self.inv = np.asarray(inv, dtype=np.float64).reshape(self.shape)
+            self.inv_sqrt = np.sqrt(self.inv)
+        pass
+    
+    def velocity(self, p):
+        """The drift M^-1 p
+        
+        Required Inputs
+            p :: np.ndarray :: momentum
+        """
+        if self.dense:
+            return self.inv.dot(np.ravel(p)).reshape(np.shape(p)).astype(p.dtype)
+        return (self.inv*p).astype(p.dtype)
+    
+    def kineticEnergy(self, p):
+        """p^T M^-1 p/2 in float64
+        
+        Required Inputs
+            p :: np.ndarray :: momentum
+        """
+        p = np.asarray(p, dtype=np.float64)
+        return .5*np.sum(p*np.asarray(self.velocity(p)), dtype=np.float64)
+    
+    def noise(self, rng, shape):
+        """A momentum drawn from N(0, M)
+        
+        With M^-1 = CC^T the momentum C^-T z has covariance M
+        
+        Required Inputs
+            rng   :: np.random.RandomState :: random number generator
+            shape :: tuple :: shape of the momentum
+        """
+        z = rng.normal(size=shape, scale=1., loc=0.)
+        if self.dense:
+            p = linalg.solve_triangular(self.inv_chol.T, z.ravel(), lower=False)
+            return p.reshape(shape)
+        return z/self.inv_sqrt
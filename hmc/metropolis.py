@@ -34,9 +34,11 @@ class Accept_Reject(Init):
         # set up the lists as empty
         for k in self.store: 
             if getattr(self, 'get_' + k): setattr(self, k, [])
+        
+        self.lift = None # the persistent variable of liftedMetropolis
         pass
     
-    def metropolisHastings(self, h_old, h_new):
+    def metropolisHastings(self, h_old, h_new, u=None):
         """A M-H accept/reject test as per
         Duane, Kennedy, Pendleton (1987)
         and also used by Neal (2003)
@@ -57,6 +59,10 @@ class Accept_Reject(Init):
             h_old :: float :: old hamiltonian
             h_new :: float :: new hamiltonian
         
+        Optional Inputs
+            u :: float :: the uniform number to compare with. A new one
+                        is drawn if None
+        
         Return :: bool
             True    :: acceptance
             False   :: rejection
@@ -66,18 +72,124 @@ class Accept_Reject(Init):
         if self.accept_all:
             accept_reject = True
         else:
-            # (self.rng.uniform() < min(1., np.exp(-delta_h))) # Neal / DKP original
-            accept_reject = (np.exp(-delta_h) - self.rng.uniform()) >= 0 # faster
+            if u is None: u = self.rng.uniform()
+            # (u < min(1., np.exp(-delta_h))) # Neal / DKP original
+            accept_reject = (np.exp(-delta_h) - u) >= 0 # faster
         
         accept_rate = min(1., np.exp(-delta_h))
         
-        # stores useful values for analysis during runtime
-        l = locals()
+        self._store(locals())
+        return accept_reject
+    
+    def _store(self, l):
+        """Stores useful values for analysis during runtime
+        
+        Required Inputs
+            l :: dict :: the locals() of the test with the non plural
+                        of each key in self.store
+        """
         for k in self.store:
             # if the parameter has a 'get_' set as True... we get it!
             if getattr(self, 'get_' + k): 
                 # append the non plural from locals
                 lk = k[:-1]
                 getattr(self, k).append(l[lk])
+        pass
+    
+    def liftedMetropolis(self, h_old, h_new, delta=.05):
+        """A non-reversible M-H test as per Neal (2020)
+        
+        The uniform number is u = |s| for a variable s in [-1, 1] that
+        persists between calls. s is translated by delta (mod 2) before
+        each test and on acceptance is rescaled as
+        
+            s -> s exp(h_new - h_old)
+        
+        which keeps s uniform. Small values of u follow small values so
+        the rejections are clustered in time and the momentum flips of
+        GHMC with small mixing angles reverse the chain less often
+        
+        Required Inputs
+            h_old :: float :: old hamiltonian
+            h_new :: float :: new hamiltonian
+        
+        Optional Inputs
+            delta :: float :: translation of s per test
+        
+        Return :: bool as metropolisHastings()
+        """
+        if self.lift is None: self.lift = self.rng.uniform(-1., 1.)
+        self.lift = (self.lift + delta + 1.) % 2. - 1.
+        
+        accept_reject = self.metropolisHastings(h_old, h_new, u=abs(self.lift))
+        if accept_reject and not self.accept_all:
+            self.lift *= np.exp(np.asarray(h_new - h_old, dtype=np.float64).ravel()[0])
+        return accept_reject
+
+    
+    def extraChance(self, h, u, final=True):
+        """The look ahead test of Sohl-Dickstein, Mudigonda and DeWeese
+        (2014) at the last of the states integrated so far
+        
+        h[0] is the energy of the start of the trajectory and h[k] that
+        of the end of the k-th segment. The move is accepted at the
+        first k with
+        
+            u < P(0, 1) + ... + P(0, k)
+        
+        from one uniform number per move (see lookAhead()). Only the
+        stage that ends the move is stored: accept_rate is the sum of
+        P(0, k) over the stages integrated
+        
+        Required Inputs
+            h :: np.ndarray :: energies of the states k = 0, ..., K
+            u :: float :: the uniform number of the move
+        
+        Optional Inputs
+            final :: bool :: True if no further segments are integrated
+        
+        Return :: bool as metropolisHastings()
+        """
+        h_old, h_new = h[0], h[-1]
+        delta_h = h_new - h_old
+        accept_rate = lookAhead(h).sum()
+        accept_reject = self.accept_all or u < accept_rate
         
+        if accept_reject or final: self._store(locals())
         return accept_reject
+#
+def lookAhead(h):
+    """The probabilities P(0, k) of accepting the state at the end of
+    segment k = 1, ..., K of a look ahead trajectory
+    
+    The probabilities between states a and b of the trajectory are
+    built up from the shorter segments as
+    
+        P(a, b) = min(1 - sum_j P(a, a + j),
+            exp(h[a] - h[b]) (1 - sum_j P(b, b - j)))
+    
+    for 0 < j < |b - a| stepping towards b. The second sum is over the
+    trajectory from the reversed momentum at b so detailed balance
+    holds stage by stage. Diverged states (nan / inf) are never accepted
+    
+    Required Inputs
+        h :: np.ndarray :: energies of the states k = 0, ..., K
+    """
+    h = np.asarray(h, dtype=np.float64).ravel()
+    probs = {}
+    
+    def prob(a, b):
+        if (a, b) not in probs:
+            s = np.sign(b - a)
+            if not np.isfinite(h[a]) or not np.isfinite(h[b]):
+                p = 0.
+            else:
+                forward = 1. - sum(prob(a, a + j*s) for j in xrange(1, abs(b - a)))
+                backward = 1. - sum(prob(b, b - j*s) for j in xrange(1, abs(b - a)))
+                # capped at 1 in the log to avoid overflow as forward <= 1
+                reverse = np.exp(min(h[a] - h[b] + np.log(backward), 0.)) if backward > 0. else 0.
+                p = max(min(forward, reverse), 0.)
+            probs[(a, b)] = p
+        return probs[(a, b)]
+    
+    return np.asarray([prob(0, k) for k in xrange(1, h.size)])
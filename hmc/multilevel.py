@@ -0,0 +1,148 @@
+import numpy as np
+
+from lattice import restrict, prolong
+from potentials import Shared
+from dynamics import Leap_Frog
+from hmc import Hybrid_Monte_Carlo
+
+__docformat__ = "restructuredtext en"
+
+class Block_Spin_Potential(Shared):
+    """The action of a coarse correction to a fixed fine lattice
+    
+    S_c(delta) = S(x + P delta) with gradient P^T grad S(x + P delta)
+    where P is the piecewise constant block-spin prolongation
+    
+    HMC in delta leaves the fine distribution invariant as it only
+    moves x along the long wavelength directions spanned by P
+    
+    Required Inputs
+        potential :: class :: the fine lattice potential
+    
+    Optional Inputs
+        block :: int :: fine sites per coarse site along each axis
+    
+    Expectations
+        self.x is the current fine lattice and is set before each update
+    """
+    def __init__(self, potential, block=2):
+        self.name = 'Block Spin ' + potential.name
+        self.potential = potential
+        self.block = block
+        self.x = None
+        
+        super(Block_Spin_Potential, self)._lattice()
+        super(Block_Spin_Potential, self).__init__()
+        pass
+    
+    def fine(self, delta):
+        """The fine lattice x + P delta"""
+        return self.x + prolong(delta, self.block)
+    
+    def kineticEnergy(self, p):
+        return .5 * np.sum(p**2, axis=None, dtype=np.float64)
+    
+    def potentialEnergy(self, positions):
+        return self.potential.uE(self.fine(positions))
+    
+    def gradPotentialEnergy(self, positions):
+        dims = np.ndim(positions)
+        return self.block**dims*restrict(self.potential.duE(self.fine(positions)), self.block)
+#
+class Multilevel_HMC(Hybrid_Monte_Carlo):
+    """Multilevel Hybrid Monte Carlo with block-spin coarsening
+    
+    Each move is a fine GHMC move followed by an HMC update of a coarse
+    correction on each level, x -> x + P_l delta, where P_l prolongs
+    blocks of block^l sites per axis. The coarse levels move the long
+    wavelength modes that are slow under the fine dynamics
+    
+    Parameters
+    ----------
+    x0         : array_like
+        Initial starting position vector. Every axis must be divisible by
+        `block**(n_levels-1)`
+    dynamics   : class
+        Fine level integrator e.g. :class:`dynamics.Leap_Frog`
+    potential  : class
+        A lattice potential following :mod:`potentials`
+    rng        : `np.random.RandomState`
+        random number state
+    n_levels   : int, optional
+        Number of levels including the fine lattice
+    block      : int, optional
+        Block size per axis between consecutive levels
+    coarse_step_size : list, optional
+        Step sizes of the coarse levels. The default scales the fine
+        step size by `block**(-(d-1)/2.)` per level which keeps the stiffest
+        coarse mode as stable as the stiffest fine mode
+    coarse_n_steps   : list, optional
+        Trajectory lengths of the coarse levels. The default is the fine
+        `n_steps`
+    
+    All other parameters are those of :class:`hmc.Hybrid_Monte_Carlo`
+    
+    Attributes
+    ----------
+    levels
+        The `Hybrid_Monte_Carlo` sampler of each coarse level
+    coarse_accept_rates
+        Coarse acceptance probabilities of each move, one list per level
+    
+    Notes
+    ----------
+    Each coarse force costs a fine force evaluation so `samples_traj`
+    counts the fine and coarse integration steps of every move
+    """
+    def __init__(self, x0, dynamics, potential, rng, **kwargs):
+        super(Multilevel_HMC, self).__init__(x0, dynamics, potential, rng, **kwargs)
+        self.defaults = {
+            'n_levels':2,
+            'block':2,
+            'coarse_step_size':None,
+            'coarse_n_steps':None
+            }
+        self.initDefaults(kwargs)
+        
+        dims = np.ndim(self.x0)
+        levels = range(1, self.n_levels)
+        if self.coarse_step_size is None:
+            self.coarse_step_size = [self.dynamics.step_size*self.block**(-(dims-1)*l/2.)
+                for l in levels]
+        if self.coarse_n_steps is None:
+            self.coarse_n_steps = [self.dynamics.n_steps for l in levels]
+        
+        self.levels = []
+        for l, step_size, n_steps in zip(levels, self.coarse_step_size, self.coarse_n_steps):
+            block = self.block**l
+            coarse = Block_Spin_Potential(self.potential, block=block)
+            delta0 = restrict(np.zeros(np.shape(self.x0)), block)
+            coarse_dynamics = Leap_Frog(duE=coarse.duE, step_size=step_size, n_steps=n_steps,
+                rand_steps=self.dynamics.rand_steps)
+            self.levels.append(Hybrid_Monte_Carlo(delta0, coarse_dynamics, coarse, self.rng,
+                accept_kwargs={'get_accept_rates':True}))
+        self.coarse_accept_rates = [level.accept.accept_rates for level in self.levels]
+        pass
+    
+    def move(self, p, x, step_size = None, n_steps = None, mixing_angle=.5*np.pi):
+        """A fine GHMC move followed by an HMC move on each coarse level
+        
+        The fine momentum is independent of x so it is unchanged by the
+        coarse updates and is carried into the next GHMC refresh
+        
+        Parameters
+        ----------
+        See :meth:`hmc.Hybrid_Monte_Carlo.move`
+        """
+        p, x = super(Multilevel_HMC, self).move(p, x, step_size, n_steps, mixing_angle)
+        n_coarse = 0
+        
+        for level in self.levels:
+            level.potential.x = x
+            delta0 = np.zeros_like(level.x0)
+            _, delta = level.move(level.momentum.fullRefresh(delta0), delta0)
+            x = level.potential.fine(delta)
+            n_coarse += level.dynamics.n
+        
+        self.dynamics.n += n_coarse
+        return p, x
@@ -0,0 +1,294 @@
+import numpy as np
+import multiprocessing as mp
+from tqdm import tqdm
+
+from common import Init
+from dynamics import Leap_Frog
+from hmc import Momentum
+from metropolis import Accept_Reject
+from distributed import sharedArray, receive, terminate
+
+__all__ = [ 'Multiple_Proposal_HMC']
+
+def _integrateRows(rows, dynamics, potential, momentum, x0, arms_p, arms_x, energies):
+    """Replaces the given rows of the shared arms with the flipped end
+    points of their trajectories and stores the energies
+    """
+    for j in rows:
+        x = x0.copy() # the shared row with the type of x0
+        np.asarray(x)[...] = arms_x[j]
+        p, x = dynamics.integrate(arms_p[j].copy(), x)
+        p = momentum.flip(p)
+        arms_p[j], arms_x[j] = p, x
+        energies[j] = potential.hamiltonian(p, x)
+    pass
+
+def _proposals(rank, n_workers, conn, *args):
+    """The command loop of a worker process integrating the arms
+    rank, rank + n_workers, ... (see _integrateRows())
+    """
+    arms_p = args[4]
+    while True:
+        command = conn.recv()
+        if command[0] == 'stop': break
+        try:
+            _integrateRows(xrange(rank, arms_p.shape[0], n_workers), *args)
+            result = None
+        except Exception as e:
+            result = e
+        conn.send(result)
+    conn.close()
+#
+class Multiple_Proposal_HMC(Init):
+    """HMC with many proposals per iteration integrated in parallel as
+    per Calderhead (2014)
+    
+    The flipped trajectory from the current state (x, p) gives the base
+    point (x_b, p_b) = Phi(x, p) where Phi is the flip after the leap
+    frog, a volume preserving involution. A centre momentum c is an
+    AR(1) step from p_b and the momentum p_j of each of the P arms is
+    an AR(1) step from c. Every arm integrates Phi(x_b, p_j) in its own
+    worker process. The joint distribution of the P + 1 candidates is
+    then symmetric in which of them is the current state so the index
+    of the next state has the stationary distribution
+        
+        w_j ~ exp(-H(y_j) + K(p_j))
+    
+    where y_0 = (x, p) and p_0 = p_b. The next state is one move of the
+    finite Markov chain over the candidates with the Metropolised Gibbs
+    kernel which never proposes staying. All candidates contribute to
+    the estimators through the weights (see :meth:`weightedSeries`)
+    
+    Parameters
+    ----------
+    x0          : array_like
+        Initial configuration
+    potential   : class
+        The target potential following the structure in :mod:`potentials`
+    rng         : `np.random.RandomState`
+        random number state. Every random number is drawn by the parent
+        so the chain does not depend on `n_workers`
+    n_proposals : int, optional
+        Number of arms P
+    step_size   : float, optional
+        Step size of the leap frog
+    n_steps     : int, optional
+        Number of leap frog steps of the base and of each arm
+    arm_angle   : float, optional
+        The angle of the AR(1) steps to and from the centre momentum.
+        `np.pi/2` gives independent arm momenta
+    n_workers   : int, optional
+        Worker processes for the arms. `0` integrates them in this process
+    store_candidates : bool, optional
+        Keep the positions of every candidate for :meth:`weightedSeries`
+    
+    Attributes
+    ----------
+    weights
+        The normalised weights of the candidates of each sample
+        with the current state first
+    accept_rates
+        The probability of moving away from the current state
+    
+    Notes
+    ----------
+    The workers are forked when the class is created. Use close() to stop them.
+    An error in an arm is raised by the sampler. If a worker exits, all the
+    workers are terminated and a RuntimeError is raised
+    """
+    def __init__(self, x0, potential, rng, **kwargs):
+        super(Multiple_Proposal_HMC, self).__init__()
+        self.initArgs(locals())
+        self.defaults = {
+            'n_proposals':4,
+            'step_size':.1,
+            'n_steps':20,
+            'arm_angle':.5*np.pi,
+            'n_workers':None,
+            'store_candidates':True
+            }
+        self.initDefaults(kwargs)
+        if self.n_workers is None: self.n_workers = min(self.n_proposals, mp.cpu_count())
+        
+        self.dynamics = Leap_Frog(duE=self.potential.duE, step_size=self.step_size,
+            n_steps=self.n_steps, trajectory=getattr(self.potential, 'trajectory', None))
+        self.momentum = Momentum(self.rng)
+        self.accept = Accept_Reject(self.rng, get_accept_rates=True)
+        self.p0 = self.momentum.fullRefresh(self.x0)
+        
+        shape = (self.n_proposals,) + np.shape(self.x0)
+        self.arms_p = sharedArray(shape)
+        self.arms_x = sharedArray(shape)
+        self.energies = sharedArray((self.n_proposals,))
+        
+        self.conns, self.workers = [], []
+        for rank in xrange(self.n_workers):
+            conn, child = mp.Pipe()
+            worker = mp.Process(target=_proposals,
+                args=(rank, self.n_workers, child) + self._shared())
+            worker.daemon = True
+            worker.start()
+            self.conns.append(conn)
+            self.workers.append(worker)
+        pass
+    
+    def _shared(self):
+        """The arguments of _integrateRows() after the rows"""
+        return (self.dynamics, self.potential, self.momentum, self.x0,
+            self.arms_p, self.arms_x, self.energies)
+    
+    def _arms(self):
+        """Integrates every arm in place"""
+        if not self.workers:
+            _integrateRows(xrange(self.n_proposals), *self._shared())
+            return
+        
+        for conn in self.conns: conn.send(('run',))
+        try:
+            results = [receive(conn, worker, self.workers)
+                for conn, worker in zip(self.conns, self.workers)]
+        except RuntimeError:
+            self.conns, self.workers = [], []
+            raise
+        for result in results:
+            if isinstance(result, Exception): raise result
+        pass
+    
+    def move(self, p, x, mixing_angle=.5*np.pi):
+        """Generates the candidates from (p, x) and moves the finite chain
+        over them once
+        
+        Parameters
+        ----------
+        p : np.ndarray
+            current momentum
+        x : np.ndarray
+            current position
+        mixing_angle : float, optional
+            The partial refresh of the current momentum before the move
+        
+        Notes
+        ----------
+        Returns `p, x` of the chosen candidate and stores the weights
+        and positions of the candidates
+        """
+        p = self.momentum.generalisedRefresh(p, mixing_angle=mixing_angle)
+        h = self.potential.hamiltonian(p, x)
+        
+        # the base point is the flipped trajectory from the current state
+        p_b, x_b = self.dynamics.integrate(p.copy(), x.copy())
+        p_b = self.momentum.flip(p_b)
+        
+        # AR(1) steps to the centre and out to the arms keep N(0, 1)
+        c, s = np.cos(self.arm_angle), np.sin(self.arm_angle)
+        centre = c*p_b + s*self.rng.normal(size=p_b.shape)
+        self.arms_p[...] = c*centre + s*self.rng.normal(size=self.arms_p.shape)
+        self.arms_x[...] = x_b
+        kinetic = [self.potential.kE(p_b)] + [self.potential.kE(q) for q in self.arms_p]
+        self._arms()
+        
+        # a diverged arm (nan) has no weight
+        log_w = np.concatenate([np.ravel(h), self.energies])
+        log_w = np.where(np.isfinite(log_w), np.asarray(kinetic).ravel() - log_w, -np.inf)
+        w = np.exp(log_w - log_w.max())
+        w /= w.sum()
+        
+        # Metropolised Gibbs from the current state (index 0): propose
+        # j != 0 with w_j/(1 - w_0) and accept with (1 - w_0)/(1 - w_j)
+        rest = w[1:].sum()
+        if rest > 0.:
+            others = rest - w[1:] + w[0] # 1 - w_j without cancellation
+            accept_probs = np.minimum(1., rest/others)
+            j = self.rng.choice(self.n_proposals, p=w[1:]/rest)
+            accept = self.rng.uniform() < accept_probs[j]
+            self.accept.accept_rates.append(np.sum(w[1:]/rest*accept_probs))
+        else:
+            accept = False
+            self.accept.accept_rates.append(0.)
+        
+        self.weights.append(w)
+        if self.store_candidates:
+            self.candidates.append(np.concatenate([np.asarray(x)[None], self.arms_x]))
+        self.dynamics.n = (self.n_proposals + 1)*self.n_steps
+        
+        if not accept: return p, x
+        y = x.copy()
+        np.asarray(y)[...] = self.arms_x[j]
+        return self.arms_p[j].copy(), y
+    
+    def sample(self, n_samples, n_burn_in = 20, mixing_angle=.5*np.pi, verbose = False, verb_pos = 0):
+        """Runs the multiple proposal sampler
+        
+        Parameters
+        ----------
+        n_samples       : integer
+            Number of samples (# iterations after burn in)
+        n_burn_in       : int,  optional
+            Number of iterations to discard at start
+        mixing_angle    : float,optional
+            As in :meth:`hmc.Hybrid_Monte_Carlo.sample`
+        verbose         : bool, optional
+            A progress bar if True
+        verb_pos        : int,  optional
+            Offset for status bar
+        
+        Notes
+        ----------
+        Returns the interface of :meth:`hmc.Hybrid_Monte_Carlo.sample`.
+        The weights and candidates are those of the samples only.
+        samples_traj counts the leap frog steps of all the candidates
+        """
+        p, x = self.p0.copy(), self.x0.copy()
+        
+        chains = []
+        for burn_in, n in [(True, n_burn_in), (False, n_samples)]:
+            self.weights, self.candidates = [], []
+            del self.accept.accept_rates[:]
+            chain_p, chain, traj = [p.copy()], [x.copy()], [0]
+            
+            iterator = xrange(n)
+            if verbose and not burn_in:
+                iterator = tqdm(iterator, position=verb_pos,
+                    desc='Sampling: {}'.format(verb_pos))
+            for step in iterator:
+                p, x = self.move(p, x, mixing_angle=mixing_angle)
+                chain_p.append(p.copy())
+                chain.append(x.copy())
+                traj.append(self.dynamics.n)
+            chains.append((chain_p, chain, traj))
+        
+        (self.burn_in_p, self.burn_in, self.burn_in_traj), \
+            (self.samples_p, self.samples, self.samples_traj) = chains
+        self.weights = np.asarray(self.weights)
+        self.accept_rates = self.accept.accept_rates
+        return (self.burn_in_p, self.samples_p), (self.burn_in, self.samples)
+    
+    def weightedSeries(self, observable):
+        """The weighted average of an observable over the candidates of
+        each sample. Its mean is an estimate of the expectation with a
+        lower variance than that of the samples alone and it can be
+        given to the autocorrelation routines as a time series
+        
+        Required Inputs
+            observable :: func :: maps an array of configurations with a
+                            leading axis to an array of values
+        """
+        if not self.store_candidates:
+            raise ValueError("Error: The candidates were not stored!")
+        candidates = np.asarray(self.candidates)
+        n, m = candidates.shape[:2]
+        values = np.asarray(observable(candidates.reshape((n*m,) + candidates.shape[2:])))
+        return (self.weights*values.reshape(n, m)).sum(axis=1)
+    
+    def close(self):
+        """Stops the worker processes"""
+        for conn in self.conns: conn.send(('stop',))
+        for worker in self.workers: worker.join()
+        self.conns, self.workers = [], []
+        pass
+    
+    def terminate(self):
+        """Kills the worker processes when they cannot be stopped by close()"""
+        terminate(self.workers)
+        self.conns, self.workers = [], []
+        pass
@@ -1,34 +1,127 @@
 from __future__ import division
 import numpy as np
 
-from lattice import Periodic_Lattice, laplacian, gradSquared
-from scipy import ndimage
+from lattice import Periodic_Lattice, laplacian, gradSquared, getGeometry, Slab_Decomposition
+from scipy import ndimage, linalg
 from scipy.ndimage import _nd_image,_ni_support,correlate1d,generic_laplace
 import checks
 
+# optional compiled kernels - see setup.py. Falls back to NumPy
+try:
+    import clibs
+except ImportError:
+    clibs = None
+
 __all__ = [ 'Klein_Gordon',
             'Quantum_Harmonic_Oscillator',
             'Simple_Harmonic_Oscillator',
-            'Multivariate_Gaussian']
+            'Multivariate_Gaussian',
+            'Phi4_Hopping',
+            'U1_Gauge',
+            'O_N_Scalar',
+            'Batched_Klein_Gordon']
 
 laplace_filter = np.asarray([1, -2, 1], dtype=np.float64)
-def fastLaplaceNd(arr):
+def fastLaplaceNd(arr, axes=None):
     """A very fast laplace filter for small arrays directly calling the scipy c++ function
     
     Required Inputs
         arr :: nd.array :: the array to calculate the n-dim laplace filter
+    
+    Optional Inputs
+        axes :: iterable :: the lattice axes to sum the stencil over. The
+                default is all axes. Use range(1, arr.ndim) for fields
+                with a leading component axis
+    
+    The output has the (floating point) dtype of arr so that single
+    precision lattices stay in single precision
     """
-    output = np.zeros(arr.shape, 'float64')
-    if arr.ndim > 0:
+    dtype = arr.dtype if arr.dtype.kind == 'f' else np.float64
+    if axes is None: axes = xrange(arr.ndim)
+    axes = list(axes)
+    output = np.zeros(arr.shape, dtype)
+    if axes:
         # send output as a pointer sio no need for equals sign
-        _nd_image.correlate1d(arr, laplace_filter, 0, output, 1, 0.0, 0)
-        if arr.ndim == 1: return output
-        for ax in xrange(1, arr.ndim):
+        _nd_image.correlate1d(arr, laplace_filter, axes[0], output, 1, 0.0, 0)
+        if len(axes) == 1: return output
+        for ax in axes[1:]:
             return_value = np.zeros(arr.shape, dtype=output.dtype)
-            _nd_image.correlate1d(arr, laplace_filter, ax, output, 1, 0.0, 0)
+            _nd_image.correlate1d(arr, laplace_filter, ax, return_value, 1, 0.0, 0)
             output += return_value
     return output.view(Periodic_Lattice)
 
+def _compiledType(arr):
+    """The clibs kernels are built for float32 and float64 only"""
+    return arr.dtype if arr.dtype in (np.float32, np.float64) else np.float64
+
+def compiledAction(positions, coefficients):
+    """The action from a single pass of the clibs kernel
+    
+    Required Inputs
+        positions    :: np.ndarray :: periodic lattice
+        coefficients :: tuple :: (c_kin, c_pot, m2, g3, g4) - see clibs.pyx
+    """
+    x = np.ascontiguousarray(positions, dtype=_compiledType(positions))
+    shape, stride = clibs._strides(x)
+    return clibs.action(x.reshape(-1), shape, stride, *coefficients)
+
+def compiledForce(positions, coefficients):
+    """The gradient of the action from the clibs kernel
+    
+    Required Inputs
+        positions    :: np.ndarray :: periodic lattice
+        coefficients :: tuple :: (c_kin, c_pot, m2, g3, g4) - see clibs.pyx
+    
+    The output has the type of positions and its dtype if it is
+    float32 or float64 as in fastLaplaceNd
+    """
+    dtype = _compiledType(positions)
+    x = np.ascontiguousarray(positions, dtype=dtype)
+    shape, stride = clibs._strides(x)
+    out = np.empty_like(positions, dtype=dtype)
+    clibs.force(x.reshape(-1), np.asarray(out).reshape(-1), shape, stride, *coefficients)
+    return out
+
+def compiledMoves(p, x, coefficients, step_size, n_steps, mixing_angle, noise, uniforms):
+    """A block of complete GHMC moves from the clibs kernel
+    
+    Required Inputs
+        p, x         :: np.ndarray :: momentum and position
+        coefficients :: tuple :: (c_kin, c_pot, m2, g3, g4) - see clibs.pyx
+        step_size    :: float :: integration step size
+        n_steps      :: np.ndarray :: leapfrog steps of each move
+        mixing_angle :: float :: 0 is no mixing, pi/2 is total mix
+        noise        :: np.ndarray :: unit gaussians of shape (n_moves,) + x.shape
+        uniforms     :: np.ndarray :: uniform numbers of shape (n_moves,)
+    
+    Returns (p, x, samples, samples_p, accept_rates) where the samples
+    are arrays of shape (n_moves,) + x.shape in the dtype of x
+    """
+    dtype = _compiledType(x)
+    p = np.array(p, dtype=dtype, order='C')
+    x = np.array(x, dtype=dtype, order='C', subok=True)
+    noise = np.ascontiguousarray(noise, dtype=dtype).reshape(len(uniforms), -1)
+    uniforms = np.ascontiguousarray(uniforms, dtype=np.float64)
+    n_steps = np.ascontiguousarray(n_steps, dtype=np.intp)
+    
+    # the exact refreshments of hmc.Momentum._refresh at the end points
+    if mixing_angle == .5*np.pi:
+        c, s = 0., 1.
+    elif mixing_angle == 0:
+        c, s = 1., 0.
+    else:
+        c, s = np.cos(mixing_angle), np.sin(mixing_angle)
+    
+    samples = np.empty((len(uniforms),) + x.shape, dtype=dtype)
+    samples_p = np.empty_like(samples)
+    accept_rates = np.empty(len(uniforms))
+    shape, stride = clibs._strides(x)
+    clibs.ghmcMoves(p.reshape(-1), np.asarray(x).reshape(-1), shape, stride,
+        step_size, n_steps, c, s, noise, uniforms,
+        samples.reshape(len(uniforms), -1), samples_p.reshape(len(uniforms), -1),
+        accept_rates, *coefficients)
+    return p, x, samples, samples_p, accept_rates
+
 class Shared(object):
     """Shared methods"""
     def __init__(self):
@@ -76,6 +169,7 @@ class Shared(object):
             h = self.kE(p) + self.uE(x)[0]
         else:
             h = self.kE(p) + self.uE(x)
+        h = np.asarray(h, dtype=np.float64) # float64 for the accept/reject
         
         # check 1 dimensional
         checks.tryAssertEqual(h.shape, (1,)*len(h.shape),
@@ -94,16 +188,63 @@ class Klein_Gordon(Shared):
         m       :: float :: mass
         phi_3   :: phi_3 coupling constant
         phi_4   :: phi_4 coupling constant
+        geometry :: lattice.Lattice_Geometry :: precomputed stencil for
+                    non-periodic or anisotropic lattices. The default
+                    is the periodic hypercubic stencil in fastLaplaceNd
+        compiled :: bool :: use the kernels in clibs.pyx when they are
+                    built. Ignored for a geometry or when debugging
+        n_threads :: int :: split the action and force into slabs along
+                    the first lattice axis on this many threads. Not
+                    supported with a geometry or when debugging
+
+    
+    Notes
+        The force has the dtype of the positions so float32 lattices
+        stay in single precision. The action is accumulated in float64
+        
+        self.trajectory is a full compiled leapfrog trajectory for
+        dynamics.Leap_Frog or None when the NumPy or threaded methods
+        are used. Likewise self.moves runs a block of complete GHMC
+        moves for the block_size option of hmc.Hybrid_Monte_Carlo
     """
-    def __init__(self, m=1., phi_3=0., phi_4=0., debug=False):
+    def __init__(self, m=1., phi_3=0., phi_4=0., debug=False, geometry=None, compiled=True,
+            n_threads=1):
         self.name = 'Klein-Gordon'
         self.debug = debug
         self.m = m
         self.phi_3 = phi_3      # phi^3 coupling const.
         self.phi_4 = phi_4      # phi^4 coupling const.
+        self.geometry = geometry
+        
+        # the stencil is a single sparse mat-vec for a given geometry
+        if self.geometry is None:
+            self.laplace = fastLaplaceNd
+        else:
+            self.laplace = self.geometry.laplace
+        
+        self.compiled = compiled and clibs is not None \
+            and self.geometry is None and not self.debug
+        self.trajectory = None
+        self.moves = None
+        
+        self.slabs = None
+        if n_threads > 1 and self.geometry is not None:
+            raise ValueError("Error: The slabs need the periodic stencil, not a geometry (n_threads = 1)!")
+        if n_threads > 1 and self.debug:
+            raise ValueError("Error: Debugging uses the serial NumPy methods (n_threads = 1)!")
+        if n_threads > 1:
+            self.slabs = Slab_Decomposition(n_threads)
         
         # use a fast method from C++ if no additional terms
-        if self.phi_3 == self.phi_4 == 0 and self.debug == False:
+        if self.slabs is not None:
+            self.potentialEnergy = self.potentialEnergySlabs
+            self.gradPotentialEnergy = self.gradPotentialEnergySlabs
+        elif self.compiled:
+            self.potentialEnergy = self.potentialEnergyCompiled
+            self.gradPotentialEnergy = self.gradPotentialEnergyCompiled
+            self.trajectory = self.trajectoryCompiled
+            self.moves = self.movesCompiled
+        elif self.phi_3 == self.phi_4 == 0 and self.debug == False:
             self.potentialEnergy = self.potentialEnergyBare
             self.gradPotentialEnergy = self.gradPotentialEnergyBare
         else: 
@@ -122,7 +263,7 @@ class Klein_Gordon(Shared):
         Required Inputs
             p :: np.array (nd) :: momentum array
         """
-        return .5 * np.sum(p**2, axis=None)
+        return .5 * np.sum(p**2, axis=None, dtype=np.float64)
     
     def potentialEnergyBare(self, positions):
         """n-dim potential without interactions for speed
@@ -132,10 +273,11 @@ class Klein_Gordon(Shared):
         Required Inputs
             positions :: class :: see lattice.py for info
         """
-        p_sq = fastLaplaceNd(positions)*positions.lattice_spacing**(positions.lattice_dim-2)
+        p_sq = self.laplace(positions)*positions.lattice_spacing**(positions.lattice_dim-2)
         
         # multiply the potential by the positions spacing as required
-        return .5 * (-np.sum(positions * p_sq) + positions.lattice_spacing * self.m**2 * np.sum(positions**2))
+        return .5 * (-np.sum(positions * p_sq, dtype=np.float64) \
+            + positions.lattice_spacing * self.m**2 * np.sum(positions**2, dtype=np.float64))
     def gradPotentialEnergyBare(self, positions):
         """Gradient of the action with interactions
         
@@ -144,7 +286,7 @@ class Klein_Gordon(Shared):
         Required Inputs
             positions :: class :: see lattice.py for info
         """
-        return -fastLaplaceNd(positions)*positions.lattice_spacing**(positions.lattice_dim-2) + positions.lattice_spacing * self.m**2 * positions
+        return -self.laplace(positions)*positions.lattice_spacing**(positions.lattice_dim-2) + positions.lattice_spacing * self.m**2 * positions
     def potentialEnergyInt(self, positions):
         """n-dim potential with interactions
         
@@ -157,13 +299,13 @@ class Klein_Gordon(Shared):
         Required Inputs
             positions :: class :: see lattice.py for info
         """
-        x_sq_sum = (positions**2).sum()
+        x_sq_sum = (positions**2).sum(dtype=np.float64)
         
         # p_sq_sum = np.array(0.)
         # sum (integrate) across euclidean-space (i.e. all positions sites)
         # p_sq = ndimage.filters.laplace(positions, mode='wrap') / float(positions.lattice_spacing)
-        p_sq = fastLaplaceNd(positions) / float(positions.lattice_spacing)
-        p_sq_sum = (positions * p_sq).sum()
+        p_sq = self.laplace(positions) / float(positions.lattice_spacing)
+        p_sq_sum = (positions * p_sq).sum(dtype=np.float64)
         
         #### free action S_0: 1/2 \phi(m^2 - \klein_gordon)\phi 
         kinetic = - .5 * p_sq_sum
@@ -172,13 +314,13 @@ class Klein_Gordon(Shared):
         
         # Add interation terms if required
         if self.phi_3: # phi^3 term
-            x_3_sum = (positions**3).sum()
+            x_3_sum = (positions**3).sum(dtype=np.float64)
             u_3 = self.phi_3 * x_3_sum / np.math.factorial(3)
         else:
             u_3 = 0.
         
         if self.phi_4: # phi^4 term
-            x_4_sum = (positions**4).sum()
+            x_4_sum = (positions**4).sum(dtype=np.float64)
             u_4 = self.phi_4 * x_4_sum / np.math.factorial(4)
         else:
             u_4 = 0.
@@ -204,7 +346,7 @@ class Klein_Gordon(Shared):
             positions :: class :: see lattice.py for info
         """
         # gradient of kinetic term positions \klein_gordon^2 positions = 2 \klein_gordon^2 positions
-        p_sq = fastLaplaceNd(positions) / float(positions.lattice_spacing)
+        p_sq = self.laplace(positions) / float(positions.lattice_spacing)
         # p_sq = laplacian(positions, idpositions, a_power=1)
         
         #### grad of free action S_0: 2/2 * (m^2 - \klein_gordon^2)\phi
@@ -219,7 +361,7 @@ class Klein_Gordon(Shared):
             u_3 = 0.
         
         if self.phi_4: # phi^4 term
-            u_4 = self.phi_4 * positions**3 /4 / np.math.factorial(3)
+            u_4 = self.phi_4 * positions**3 / np.math.factorial(3)
         else:
             u_4 = 0.
         
@@ -231,6 +373,556 @@ class Klein_Gordon(Shared):
         # print 'kinetic, {}\npot: {}\n\n'.format(kinetic, potential)
         return derivative
     
+    def _coefficients(self, positions):
+        """The (c_kin, c_pot, m2, g3, g4) arguments of the clibs kernels
+        
+        These match potentialEnergyBare with no interactions and
+        potentialEnergyInt otherwise
+        
+        Required Inputs
+            positions :: class :: see lattice.py for info
+        """
+        a = positions.lattice_spacing
+        if self.phi_3 == self.phi_4 == 0:
+            c_kin = a**(positions.lattice_dim-2)
+        else:
+            c_kin = 1./a
+        return c_kin, a, self.m**2, self.phi_3, self.phi_4
+    
+    def actionTerms(self, positions):
+        """The parameter free sums of the action
+        
+        The action is linear in these, S = np.dot(c, t) with the
+        coefficients c from actionCoefficients(), so storing t for each
+        sample is enough to reweight a chain to any m, phi_3 or phi_4
+        (see correlations.reweight)
+        
+        Required Inputs
+            positions :: class :: see lattice.py for info
+        
+        Returns t = (-phi.laplace(phi)/2, sum phi^2/2!, sum phi^3/3!, sum phi^4/4!)
+        """
+        kinetic = -.5 * (positions * self.laplace(positions)).sum(dtype=np.float64)
+        x = np.asarray(positions)
+        return np.array([kinetic,
+            (x**2).sum(dtype=np.float64) / np.math.factorial(2),
+            (x**3).sum(dtype=np.float64) / np.math.factorial(3),
+            (x**4).sum(dtype=np.float64) / np.math.factorial(4)])
+    
+    def actionCoefficients(self, positions):
+        """The coefficients of actionTerms() for these couplings
+        
+        Required Inputs
+            positions :: class :: see lattice.py for info
+        """
+        c_kin, c_pot, m2, g3, g4 = self._coefficients(positions)
+        return np.array([c_kin, c_pot*m2, c_pot*g3, c_pot*g4])
+    
+    def bondCouplings(self, positions):
+        """The hopping coupling K_xy of each forward link for cluster.Embedded_Wolff
+        
+        The action contains -K_xy phi_x phi_y for each link. Returns the
+        forward neighbour table and K_xy, both of shape (dim, n_sites)
+        
+        Required Inputs
+            positions :: class :: see lattice.py for info
+        """
+        if self.phi_3:
+            raise ValueError("Error: Cluster flips need a Z2 symmetric action (phi_3 = 0)!")
+        g = self.geometry
+        if g is None: g = getGeometry(positions.shape)
+        c_kin = self._coefficients(positions)[0]
+        return g.fwd, c_kin*g.fwd_sign*g.fwd_weight
+    
+    def potentialEnergyCompiled(self, positions):
+        """The action from a single pass of the compiled kernel
+        
+        Required Inputs
+            positions :: class :: see lattice.py for info
+        """
+        return compiledAction(positions, self._coefficients(positions))
+    
+    def gradPotentialEnergyCompiled(self, positions):
+        """Gradient of the action from the compiled kernel
+        
+        Required Inputs
+            positions :: class :: see lattice.py for info
+        """
+        return compiledForce(positions, self._coefficients(positions))
+    
+    def _slabLaplace(self, slab):
+        """The laplacian of the interior rows of a slab with halo rows
+        
+        Required Inputs
+            slab :: np.ndarray :: see lattice.Slab_Decomposition.map
+        """
+        if self.compiled: # the kernel releases the GIL
+            lap = compiledForce(slab, (-1., 0., 0., 0., 0.))
+        else:
+            lap = self.laplace(slab)
+        return np.asarray(lap)[1:-1]
+    
+    def slabAction(self, slab, coefficients):
+        """The action of the interior rows of a slab with halo rows
+        
+        Required Inputs
+            slab :: np.ndarray :: see lattice.Slab_Decomposition.map
+            coefficients :: tuple :: from _coefficients()
+        """
+        c_kin, c_pot, m2, g3, g4 = coefficients
+        x = slab[1:-1]
+        kinetic = -.5 * (x * self._slabLaplace(slab)).sum(dtype=np.float64)
+        potential = (x**2 * (m2/2. + x*(g3/6. + x*g4/24.))).sum(dtype=np.float64)
+        return c_kin*kinetic + c_pot*potential
+    
+    def slabForce(self, slab, coefficients):
+        """Gradient of the action for the interior rows of a slab with halo rows
+        
+        Required Inputs
+            slab :: np.ndarray :: see lattice.Slab_Decomposition.map
+            coefficients :: tuple :: from _coefficients()
+        """
+        if self.compiled: # fused kernel, the halo rows are discarded
+            return np.asarray(compiledForce(slab, coefficients))[1:-1]
+        c_kin, c_pot, m2, g3, g4 = coefficients
+        x = slab[1:-1]
+        return -c_kin*self._slabLaplace(slab) + c_pot*x*(m2 + x*(g3/2. + x*g4/6.))
+    
+    def potentialEnergySlabs(self, positions):
+        """The action summed over slabs in parallel
+        
+        The partial sums are reduced in slab order so the result is
+        deterministic for a given n_threads
+        
+        Required Inputs
+            positions :: class :: see lattice.py for info
+        """
+        coefficients = self._coefficients(positions)
+        slabAction = lambda slab, start, stop: self.slabAction(slab, coefficients)
+        return sum(self.slabs.map(slabAction, positions))
+    
+    def gradPotentialEnergySlabs(self, positions):
+        """Gradient of the action with each slab written by its own thread
+        
+        Required Inputs
+            positions :: class :: see lattice.py for info
+        """
+        coefficients = self._coefficients(positions)
+        out = np.empty_like(positions, dtype=_compiledType(positions))
+        rows = np.asarray(out) # slices without the periodic indexing
+        def slabForce(slab, start, stop):
+            rows[start:stop] = self.slabForce(slab, coefficients)
+        self.slabs.map(slabForce, positions)
+        return out
+    
+    def trajectoryCompiled(self, p, x, step_size, n_steps):
+        """A complete leapfrog trajectory in the compiled kernel
+        
+        As dynamics.Leap_Frog._integrateFast this updates p and x in place
+        
+        Required Inputs
+            p           :: np.ndarray :: momentum
+            x           :: class :: see lattice.py for info
+            step_size   :: float :: integration step size
+            n_steps     :: int   :: number of leapfrog steps
+        """
+        if not (p.flags.c_contiguous and x.flags.c_contiguous) or p.dtype != x.dtype:
+            p = np.ascontiguousarray(p, dtype=x.dtype)
+            x = np.ascontiguousarray(x).view(type(x))
+        shape, stride = clibs._strides(x)
+        clibs.leapFrog(np.asarray(p).reshape(-1), np.asarray(x).reshape(-1), shape, stride,
+            step_size, n_steps, *self._coefficients(x))
+        return p, x
+    
+    def movesCompiled(self, p, x, step_size, n_steps, mixing_angle, noise, uniforms):
+        """A block of complete GHMC moves in the compiled kernel
+        
+        See compiledMoves() for the inputs and outputs
+        """
+        return compiledMoves(p, x, self._coefficients(x), step_size, n_steps,
+            mixing_angle, noise, uniforms)
+    
+#
+class Batched_Klein_Gordon(Shared):
+    """Independent Klein Gordon lattices with their own couplings
+    
+    The positions have a leading batch axis of B chains, (B, *lattice),
+    and each coupling is a scalar or has one value per chain. The action
+    of chain b is that of Klein_Gordon(m[b], phi_3[b], phi_4[b]) so a
+    whole grid of parameters is one NumPy computation per step
+    
+    Optional Inputs
+        m       :: float / np.ndarray :: mass
+        phi_3   :: float / np.ndarray :: phi_3 coupling constant
+        phi_4   :: float / np.ndarray :: phi_4 coupling constant
+        spacing :: float :: lattice spacing
+    
+    Notes
+        The actions and the kinetic energies are returned per chain with
+        shape (B,) so hamiltonian() is not a scalar
+    """
+    def __init__(self, m=1., phi_3=0., phi_4=0., spacing=1., debug=False):
+        self.name = 'Batched Klein-Gordon'
+        self.debug = debug
+        self.m = np.asarray(m, dtype=np.float64)
+        self.phi_3 = np.asarray(phi_3, dtype=np.float64)
+        self.phi_4 = np.asarray(phi_4, dtype=np.float64)
+        self.spacing = spacing
+        
+        super(Batched_Klein_Gordon, self)._lattice()
+        super(Batched_Klein_Gordon, self).__init__()
+        pass
+    
+    def _batch(self, coupling, positions):
+        """A coupling broadcast against positions of shape (B, *lattice)"""
+        return np.reshape(coupling, np.shape(coupling) + (1,)*(positions.ndim - 1))
+    
+    def _coefficients(self, positions):
+        """The (c_kin, c_pot, m2, g3, g4) of Klein_Gordon._coefficients
+        for each chain broadcast against the positions
+        
+        Required Inputs
+            positions :: np.ndarray :: the lattices of shape (B, *lattice)
+        """
+        a, d = float(self.spacing), positions.ndim - 1
+        free = (self.phi_3 == 0) & (self.phi_4 == 0)
+        c_kin = np.where(free, a**(d-2), 1./a)
+        return [self._batch(c, positions) for c in
+            (c_kin, a, self.m**2, self.phi_3, self.phi_4)]
+    
+    def kineticEnergy(self, p):
+        """KE of each chain
+        
+        Required Inputs
+            p :: np.array (nd) :: momenta of shape (B, *lattice)
+        """
+        p = np.asarray(p)
+        return .5 * np.sum(p**2, axis=tuple(xrange(1, p.ndim)), dtype=np.float64)
+    
+    def potentialEnergy(self, positions):
+        """The action of each chain
+        
+        Required Inputs
+            positions :: np.ndarray :: the lattices of shape (B, *lattice)
+        """
+        x = np.asarray(positions)
+        c_kin, c_pot, m2, g3, g4 = self._coefficients(x)
+        axes = tuple(xrange(1, x.ndim))
+        lap = np.asarray(fastLaplaceNd(x, axes=axes))
+        s = -.5*c_kin*x*lap + c_pot*x**2*(m2/2. + x*(g3/6. + x*g4/24.))
+        return s.sum(axis=axes, dtype=np.float64)
+    
+    def gradPotentialEnergy(self, positions):
+        """Gradient of the action of each chain
+        
+        Required Inputs
+            positions :: np.ndarray :: the lattices of shape (B, *lattice)
+        """
+        x = np.asarray(positions)
+        c_kin, c_pot, m2, g3, g4 = self._coefficients(x)
+        lap = np.asarray(fastLaplaceNd(x, axes=xrange(1, x.ndim)))
+        return (-c_kin*lap + c_pot*x*(m2 + x*(g3/2. + x*g4/6.))).astype(x.dtype, copy=False)
+    
+    def hamiltonian(self, p, x):
+        """Returns the Hamiltonian of each chain in float64
+        
+        Required Inputs
+            p :: np.array (nd) :: momenta of shape (B, *lattice)
+            x :: np.ndarray :: the lattices of shape (B, *lattice)
+        """
+        return np.asarray(self.kE(p) + self.uE(x), dtype=np.float64)
+    
+#
+class O_N_Scalar(Shared):
+    """O(N) symmetric scalar field on a lattice
+    
+    $S = \sum_x a^{d-2}\frac{1}{2}\partial\phi\cdot\partial\phi
+        + a^d [\frac{1}{2}m^2\phi\cdot\phi + \frac{\lambda}{4!}(\phi\cdot\phi)^2]$
+    
+    The fields are stored as (N, *lattice). The stencil is applied to all
+    N components in one call over the lattice axes only and the O(N)
+    invariant phi.phi is a single contraction over the component axis
+    
+    Optional Inputs
+        m       :: float :: mass
+        lam     :: float :: (phi.phi)^2 coupling constant
+        spacing :: float :: lattice spacing
+        geometry :: lattice.Lattice_Geometry :: precomputed stencil for
+                    the lattice (not component) axes. The default is the
+                    periodic hypercubic stencil in fastLaplaceNd
+    
+    Notes
+        The lattice dimension is positions.ndim - 1. N = 1 is the
+        Klein-Gordon phi^4 theory with phi_4 = lam
+    """
+    def __init__(self, m=1., lam=0., spacing=1., geometry=None, debug=False):
+        self.name = 'O(N) Scalar'
+        self.debug = debug
+        self.m = m
+        self.lam = lam
+        self.spacing = spacing
+        self.geometry = geometry
+        
+        super(O_N_Scalar, self)._lattice()
+        super(O_N_Scalar, self).__init__()
+        pass
+    
+    def laplace(self, positions):
+        """The lattice laplacian of every component
+        
+        Required Inputs
+            positions :: np.ndarray :: fields of shape (N, *lattice)
+        """
+        if self.geometry is None:
+            return fastLaplaceNd(positions, axes=xrange(1, positions.ndim))
+        # the geometry takes the lattice axes first with trailing batch axes
+        lap = self.geometry.laplace(np.rollaxis(np.asarray(positions), 0, positions.ndim))
+        return np.rollaxis(lap, -1)
+    
+    def phiSquared(self, positions):
+        """The O(N) invariant phi.phi at each site
+        
+        Required Inputs
+            positions :: np.ndarray :: fields of shape (N, *lattice)
+        """
+        return np.einsum('i...,i...->...', positions, positions)
+    
+    def kineticEnergy(self, p):
+        """n-dim KE
+        
+        Required Inputs
+            p :: np.array (nd) :: momentum array
+        """
+        return .5 * np.sum(p**2, axis=None, dtype=np.float64)
+    
+    def potentialEnergy(self, positions):
+        """The action
+        
+        Required Inputs
+            positions :: np.ndarray :: fields of shape (N, *lattice)
+        """
+        a = float(self.spacing)
+        d = positions.ndim - 1
+        phi_sq = self.phiSquared(positions)
+        
+        kinetic = -.5 * (positions * self.laplace(positions)).sum(dtype=np.float64)
+        potential = .5 * self.m**2 * phi_sq.sum(dtype=np.float64)
+        if self.lam:
+            potential += self.lam * (phi_sq**2).sum(dtype=np.float64) / np.math.factorial(4)
+        return a**(d-2) * kinetic + a**d * potential
+    
+    def gradPotentialEnergy(self, positions):
+        """Gradient of the action
+        
+        Required Inputs
+            positions :: np.ndarray :: fields of shape (N, *lattice)
+        """
+        a = float(self.spacing)
+        d = positions.ndim - 1
+        
+        potential = self.m**2 * positions
+        if self.lam:
+            potential += self.lam / np.math.factorial(3) * self.phiSquared(positions) * positions
+        return -a**(d-2) * self.laplace(positions) + a**d * potential
+    
+#
+class Phi4_Hopping(Shared):
+    """phi^4 theory on a lattice in the hopping parameter form
+    
+    $S = \sum_x [-2\kappa \sum_\mu \phi_x \phi_{x+\mu} + \phi_x^2 + \lambda(\phi_x^2 - 1)^2]$
+    
+    as in ref_code/phi4_sol. The sum over the neighbours is a single
+    product with the cached hopping matrix of the lattice geometry. The
+    sum for the last positions is kept so the action and force at the
+    same positions, as at either end of a HMC trajectory or in
+    energyAndGradient(), share one product
+    
+    Optional Inputs
+        kappa    :: float :: hopping parameter
+        lam      :: float :: quartic coupling constant
+        geometry :: lattice.Lattice_Geometry :: the default is the cached
+                    periodic geometry for the shape of the positions
+    """
+    def __init__(self, kappa=0.18169, lam=1.3282, geometry=None, debug=False):
+        self.name = 'phi^4 (hopping)'
+        self.debug = debug
+        self.kappa = kappa
+        self.lam = lam
+        self.geometry = geometry
+        self._last = (None, None)   # (positions, neighbour sum)
+        
+        super(Phi4_Hopping, self)._lattice()
+        super(Phi4_Hopping, self).__init__()
+        pass
+    
+    def _hop(self, positions):
+        """sum over both nearest neighbours in all directions
+        
+        The positions are compared by value with the last ones as the
+        integrators update them in place. The first site rejects almost
+        every changed lattice before the full comparison
+        """
+        last, hop = self._last
+        if last is not None and last.shape == positions.shape and last.dtype == positions.dtype \
+                and last.flat[0] == positions.flat[0] and np.array_equal(last, positions):
+            return hop
+        
+        g = self.geometry
+        if g is None: g = getGeometry(positions.shape)
+        hop = g.hop(positions)
+        if last is None or last.shape != positions.shape or last.dtype != positions.dtype:
+            last = np.empty_like(positions)
+        np.copyto(last, positions)
+        self._last = (last, hop)
+        return hop
+    
+    def kineticEnergy(self, p):
+        """n-dim KE
+        
+        Required Inputs
+            p :: np.array (nd) :: momentum array
+        """
+        return .5 * np.sum(p**2, axis=None, dtype=np.float64)
+    
+    def potentialEnergy(self, positions):
+        """The action
+        
+        Each link appears twice in the neighbour sum so the hopping term
+        is -kappa * phi.hop(phi)
+        
+        Required Inputs
+            positions :: np.ndarray :: the lattice
+        """
+        phi = np.asarray(positions)
+        phi_sq = phi**2
+        s = phi_sq + self.lam*(phi_sq - 1.)**2 - self.kappa*phi*self._hop(phi)
+        return s.sum(dtype=np.float64)
+    
+    def gradPotentialEnergy(self, positions):
+        """Gradient of the action
+        
+        Required Inputs
+            positions :: np.ndarray :: the lattice
+        """
+        phi = np.asarray(positions)
+        return -2.*self.kappa*self._hop(phi) + 2.*phi + 4.*self.lam*phi*(phi**2 - 1.)
+    
+    def bondCouplings(self, positions):
+        """The hopping coupling 2 kappa of each forward link
+        
+        See Klein_Gordon.bondCouplings
+        
+        Required Inputs
+            positions :: np.ndarray :: the lattice
+        """
+        g = self.geometry
+        if g is None: g = getGeometry(positions.shape)
+        return g.fwd, 2.*self.kappa*g.fwd_sign*g.fwd_weight
+    
+    def energyAndGradient(self, positions):
+        """The action and its gradient sharing one neighbour sum
+        
+        Required Inputs
+            positions :: np.ndarray :: the lattice
+        """
+        phi = np.asarray(positions)
+        phin = self._hop(phi)
+        phi_sq = phi**2
+        s = phi_sq + self.lam*(phi_sq - 1.)**2 - self.kappa*phi*phin
+        ds = -2.*self.kappa*phin + 2.*phi + 4.*self.lam*phi*(phi_sq - 1.)
+        return s.sum(dtype=np.float64), ds
+    
+#
+class U1_Gauge(Shared):
+    """Compact U(1) pure gauge theory with the Wilson plaquette action
+    
+    $S = \beta \sum_x \sum_{\mu<\nu} [1 - \cos\theta_{\mu\nu}(x)]$
+    
+    $\theta_{\mu\nu}(x) = \theta_\mu(x) + \theta_\nu(x+\mu) - \theta_\mu(x+\nu) - \theta_\nu(x)$
+    
+    The links are angles stored as (ndim, *lattice) with periodic
+    boundaries. All plaquettes are computed at once from shifted copies
+    of the link field so the action and force have no site loops
+    
+    Optional Inputs
+        beta :: float :: inverse coupling
+    """
+    def __init__(self, beta=1., debug=False):
+        self.name = 'U(1) Gauge'
+        self.debug = debug
+        self.beta = beta
+        
+        super(U1_Gauge, self)._lattice()
+        super(U1_Gauge, self).__init__()
+        pass
+    
+    def _shift(self, arr, mu, n=-1):
+        """arr(x + mu) for n=-1 and arr(x - mu) for n=1 on the lattice axes"""
+        return np.roll(arr, n, axis=mu)
+    
+    def plaquettes(self, links):
+        """Returns {(mu, nu): theta_munu} for all mu < nu
+        
+        Required Inputs
+            links :: np.ndarray :: link angles of shape (ndim, *lattice)
+        """
+        links = np.asarray(links)
+        dim = links.shape[0]
+        checks.tryAssertEqual(dim, links.ndim - 1,
+            ' expected links of shape (ndim, *lattice)\n> shape: {}'.format(links.shape))
+        
+        plaqs = {}
+        for mu in xrange(dim):
+            for nu in xrange(mu+1, dim):
+                plaqs[(mu, nu)] = links[mu] + self._shift(links[nu], mu) \
+                    - self._shift(links[mu], nu) - links[nu]
+        return plaqs
+    
+    def averagePlaquette(self, links):
+        """<cos theta_P> over all sites and planes
+        
+        Required Inputs
+            links :: np.ndarray :: link angles of shape (ndim, *lattice)
+        """
+        plaqs = self.plaquettes(links)
+        return np.mean([np.cos(p).mean(dtype=np.float64) for p in plaqs.values()])
+    
+    def kineticEnergy(self, p):
+        """n-dim KE
+        
+        Required Inputs
+            p :: np.array (nd) :: momentum array
+        """
+        return .5 * np.sum(p**2, axis=None, dtype=np.float64)
+    
+    def potentialEnergy(self, positions):
+        """The Wilson action
+        
+        Required Inputs
+            positions :: np.ndarray :: link angles of shape (ndim, *lattice)
+        """
+        plaqs = self.plaquettes(positions)
+        return self.beta*sum((1. - np.cos(p)).sum(dtype=np.float64) for p in plaqs.values())
+    
+    def gradPotentialEnergy(self, positions):
+        """Gradient of the Wilson action
+        
+        Each plaquette in the (mu, nu) plane contributes to the four links
+        around it. As theta_numu = -theta_munu,
+        
+            dS/dtheta_mu(x) = beta sum_{nu != mu} [sin theta_munu(x) - sin theta_munu(x-nu)]
+        
+        Required Inputs
+            positions :: np.ndarray :: link angles of shape (ndim, *lattice)
+        """
+        force = np.zeros(np.shape(positions), dtype=np.asarray(positions).dtype)
+        for (mu, nu), p in self.plaquettes(positions).iteritems():
+            sin_p = np.sin(p)
+            force[mu] += sin_p - self._shift(sin_p, nu, n=1)
+            force[nu] -= sin_p - self._shift(sin_p, mu, n=1)
+        force *= self.beta
+        return force
+    
 #
 class Quantum_Harmonic_Oscillator(Shared):
     """Quantum Harmonic Oscillator on a lattice
@@ -244,8 +936,10 @@ class Quantum_Harmonic_Oscillator(Shared):
         mu      :: float :: x^2 coupling
         phi_3   :: phi_3 coupling constant
         phi_4   :: phi_4 coupling constant
+        compiled :: bool :: use the kernels in clibs.pyx when they are
+                    built. Ignored when debugging
     """
-    def __init__(self, m0=1., mu=1., phi_3=0., phi_4=0., debug=False):
+    def __init__(self, m0=1., mu=1., phi_3=0., phi_4=0., debug=False, compiled=True):
         self.name = 'QHO'
         self.debug = debug
         self.m0 = m0
@@ -253,6 +947,12 @@ class Quantum_Harmonic_Oscillator(Shared):
         self.phi_3 = phi_3      # phi^3 coupling const.
         self.phi_4 = phi_4      # phi^4 coupling const.
         
+        # the site loop in potentialEnergy is replaced by a single pass
+        self.compiled = compiled and clibs is not None and not self.debug
+        if self.compiled:
+            self.potentialEnergy = self.potentialEnergyCompiled
+            self.gradPotentialEnergy = self.gradPotentialEnergyCompiled
+        
         super(Quantum_Harmonic_Oscillator, self)._lattice()
         super(Quantum_Harmonic_Oscillator, self).__init__()
         pass
@@ -265,7 +965,7 @@ class Quantum_Harmonic_Oscillator(Shared):
         Required Inputs
             p :: np.array (nd) :: momentum array
         """
-        return .5 * np.square(p).ravel().sum(axis=0)
+        return .5 * np.square(p).ravel().sum(axis=0, dtype=np.float64)
     
     def potentialEnergy(self, positions):
         """n-dim potential
@@ -281,7 +981,7 @@ class Quantum_Harmonic_Oscillator(Shared):
         """
         lattice = positions # shortcut for brevity
         
-        x_sq_sum = (lattice**2).ravel().sum()
+        x_sq_sum = (lattice**2).ravel().sum(dtype=np.float64)
         
         v_sq_sum = np.array(0.) # initiate velocity squared
         # sum (integrate) across euclidean-space (i.e. all lattice sites)
@@ -306,13 +1006,13 @@ class Quantum_Harmonic_Oscillator(Shared):
         
         # Add interation terms if required
         if self.phi_3: # phi^3 term
-            x_3_sum = (lattice**3).sum()
+            x_3_sum = (lattice**3).sum(dtype=np.float64)
             u_3 = self.phi_3 * x_3_sum / np.math.factorial(3)
         else:
             u_3 = 0.
         
         if self.phi_4: # phi^4 term
-            x_4_sum = (lattice**4).sum()
+            x_4_sum = (lattice**4).sum(dtype=np.float64)
             u_4 = self.phi_4 * x_4_sum / np.math.factorial(4)
         else:
             u_4 = 0.
@@ -381,15 +1081,55 @@ class Quantum_Harmonic_Oscillator(Shared):
         derivative = kinetic + (positions.lattice_spacing * potential)
             
         return derivative
+    
+    def potentialEnergyCompiled(self, positions):
+        """The action from a single pass of the compiled kernel
+        
+        See potentialEnergy for help docs
+        
+        Required Inputs
+            positions :: class :: see lattice.py for info
+        """
+        a = positions.lattice_spacing
+        return compiledAction(positions, (self.m0, a, self.mu**2, self.phi_3, self.phi_4))
+    
+    def gradPotentialEnergyCompiled(self, positions):
+        """Gradient of the action from the compiled kernel
+        
+        See gradPotentialEnergy for help docs
+        
+        Required Inputs
+            positions :: class :: see lattice.py for info
+        """
+        a = positions.lattice_spacing
+        return compiledForce(positions, (self.m0/float(a), a, self.mu**2, self.phi_3, self.phi_4))
+    
+    def bondCouplings(self, positions):
+        """The hopping coupling m0 of each forward link as in potentialEnergy
+        
+        See Klein_Gordon.bondCouplings
+        
+        Required Inputs
+            positions :: class :: see lattice.py for info
+        """
+        if self.phi_3:
+            raise ValueError("Error: Cluster flips need a Z2 symmetric action (phi_3 = 0)!")
+        g = getGeometry(positions.shape)
+        return g.fwd, self.m0*g.fwd_sign*g.fwd_weight
  
 #
 class Mexican_Hat(Shared):
-    """Simple Harmonic Oscillator
+    """Mexican Hat Potential
     
-    The potential is given by: F(x) = k*x
+        (|x^2| + bias)^2*scale
     
     Optional Inputs
-        k :: float :: spring constant
+        bias  :: float :: sets the radius of the minimum
+        scale :: float :: depth of the potential
+    
+    Expectations
+        x has the dimensions in axis 0 with optional trailing batch axes
+        so a (2, n) array gives n energies and a (2, n) gradient
     """
     def __init__(self, bias=-1.5, scale=5):
         self.name = 'Ring Potential'
@@ -401,7 +1141,7 @@ class Mexican_Hat(Shared):
         pass
     
     def kineticEnergy(self, p):
-        return .5 * (p**2).sum()
+        return .5 * (p**2).sum(axis=0, dtype=np.float64)
     
     def potentialEnergy(self, x):
         return ((x**2).sum(axis=0)+self.bias)**2*self.scale
@@ -409,15 +1149,24 @@ class Mexican_Hat(Shared):
     def gradPotentialEnergy(self, x):
         """
         Required Inputs
-            x :: np.matrix :: column vector
+            x :: np.ndarray :: column vector(s) of shape (dim, ...)
         
-        Optional Inputs
-            idx :: tuple(int) :: an index for the n-dim SHO
         Notes
-            discard just stores extra arguments passed for compatibility
-            with the lattice versions
+            returns the same shape as x
+        """
+        return 4.*self.scale*x*((x**2).sum(axis=0)+self.bias)
+    
+    def hessian(self, x):
+        """The matrix of second derivatives at a single point
+        
+            4 scale ((|x^2| + bias) I + 2 x x^T)
+        
+        Required Inputs
+            x :: np.ndarray :: column vector of shape (dim, 1)
         """
-        return 2.*self.scale*x*self.potentialEnergy(x)
+        x = np.asarray(x, dtype=np.float64).ravel()
+        r2 = (x**2).sum() + self.bias
+        return 4.*self.scale*(r2*np.identity(x.size) + 2.*np.outer(x, x))
 
 class Ring_Potential(Shared):
     """Defines a simple ring potential
@@ -425,8 +1174,12 @@ class Ring_Potential(Shared):
         exp{-|x^2+bias|*scale}
     
     Optional Inputs
-        bias :: float :: 
-        scale
+        bias  :: float :: sets the radius of the ring
+        scale :: float :: depth of the potential
+    
+    Expectations
+        x has the dimensions in axis 0 with optional trailing batch axes
+        so a (2, n) array gives n energies and a (2, n) gradient
     """
     def __init__(self, bias=-50, scale=0.1):
         self.name = 'Ring Potential'
@@ -438,7 +1191,7 @@ class Ring_Potential(Shared):
         pass
     
     def kineticEnergy(self, p):
-        return .5 * (p**2).sum()
+        return .5 * (p**2).sum(axis=0, dtype=np.float64)
     
     def potentialEnergy(self, x):
         return np.abs((x**2).sum(axis=0)+self.bias)*self.scale
@@ -446,15 +1199,22 @@ class Ring_Potential(Shared):
     def gradPotentialEnergy(self, x):
         """
         Required Inputs
-            x :: np.matrix :: column vector
+            x :: np.ndarray :: column vector(s) of shape (dim, ...)
         
-        Optional Inputs
-            idx :: tuple(int) :: an index for the n-dim SHO
         Notes
-            discard just stores extra arguments passed for compatibility
-            with the lattice versions
+            returns the same shape as x
         """
-        return 2.*self.scale*x*self.potentialEnergy(x)
+        return 2.*self.scale*x*np.sign((x**2).sum(axis=0)+self.bias)
+    
+    def hessian(self, x):
+        """The matrix of second derivatives at a single point away from
+        the ring where the gradient is discontinuous
+        
+        Required Inputs
+            x :: np.ndarray :: column vector of shape (dim, 1)
+        """
+        x = np.asarray(x, dtype=np.float64).ravel()
+        return 2.*self.scale*np.sign((x**2).sum() + self.bias)*np.identity(x.size)
 #
 class Simple_Harmonic_Oscillator(Shared):
     """Simple Harmonic Oscillator
@@ -463,96 +1223,183 @@ class Simple_Harmonic_Oscillator(Shared):
     
     Optional Inputs
         k :: float :: spring constant
+        compiled :: bool :: run blocks of GHMC moves with the kernel in
+                    clibs.pyx when it is built and k is a scalar
+    
+    Expectations
+        x has the dimensions in axis 0 with optional trailing batch axes
+        so a (dim, n) array gives n energies and a (dim, n) gradient
+    
+    Notes
+        self.moves runs a block of complete GHMC moves for the block_size
+        option of hmc.Hybrid_Monte_Carlo or is None
     """
-    def __init__(self, k=1.):
+    def __init__(self, k=1., compiled=True):
         self.name = 'SHO'
         self.k = np.asarray(k)
         
+        self.compiled = compiled and clibs is not None and self.k.ndim == 0
+        self.moves = self.movesCompiled if self.compiled else None
+        
         super(Simple_Harmonic_Oscillator, self)._nonLattice()
         super(Simple_Harmonic_Oscillator, self).__init__()
         pass
     
     def kineticEnergy(self, p):
-        return .5 * (p**2).sum()
+        return .5 * (p**2).sum(axis=0, dtype=np.float64)
     
     def potentialEnergy(self, x):
-        return .5 * (x**2).sum()
+        return .5 * (self.k * x**2).sum(axis=0, dtype=np.float64)
     
     def gradPotentialEnergy(self, x):
         """
         Required Inputs
-            x :: np.matrix :: column vector
+            x :: np.ndarray :: column vector(s) of shape (dim, ...)
         
-        Optional Inputs
-            idx :: tuple(int) :: an index for the n-dim SHO
         Notes
-            discard just stores extra arguments passed for compatibility
-            with the lattice versions
+            returns the same shape as x
         """
         return self.k * x
     
+    def movesCompiled(self, p, x, step_size, n_steps, mixing_angle, noise, uniforms):
+        """A block of complete GHMC moves in the compiled kernel as a
+        lattice action with only a mass term
+        
+        See compiledMoves() for the inputs and outputs
+        """
+        return compiledMoves(p, x, (0., 1., float(self.k), 0., 0.), step_size, n_steps,
+            mixing_angle, noise, uniforms)
+    
 #
 class Multivariate_Gaussian(Shared):
     """Multivariate Gaussian Distribution
     
-    The potential is given by the n-dimensional gaussian
+    The potential is given by the n-dimensional gaussian and is backed by
+    the Cholesky factor of either the covariance or the precision matrix
+    so no explicit inverse is ever formed
     
-    Required Inputs
-        dim     :: integer >=0              :: number of dimensions
-        mean    :: n-dim vector (float)     :: the mean of each dimension
-        cov     :: n-dim^2 matrix (float)   :: covariance matrix
+    Optional Inputs
+        mean      :: n-dim column vector (float) :: the mean of each dimension
+        cov       :: n-dim^2 matrix (float)      :: covariance matrix
+        precision :: n-dim^2 matrix (float)      :: inverse covariance matrix.
+                                                    Used instead of cov if given
+                                                    and then self.cov is None
+        whitened  :: bool :: if True the potential is in the whitened
+                            coordinates z = L^{-1}(x - mean) where cov = LL^T
+                            use colour() to map samples back to x
+    
+    Expectations
+        positions are column vectors of shape (dim, 1) or (dim, n) for a
+        batch of n points / chains where energies of shape (n,) are returned
     """
-    def __init__(self, mean=[[0.], [0.]], cov=[[1.,.8],[.8,1.]]):
+    def __init__(self, mean=[[0.], [0.]], cov=[[1.,.8],[.8,1.]], precision=None,
+            whitened=False):
         self.name = 'MVG'
-        self.mean = np.asarray(mean)
-        self.cov = np.asmatrix(cov)
-        self.dim = self.mean.shape[1]
-        
-        self.dim_rng = np.arange(self.dim) # range of dimensions for iterating
-        # assert (self.cov.T == self.cov).all() # must be symmetric
-        assert (self.cov[self.dim_rng, self.dim_rng] == 1.).all() # diagonal of 1s
+        self.mean = np.asarray(mean, dtype='float64').reshape(-1, 1)
+        self.dim = self.mean.shape[0]
+        self.whitened = whitened
+        
+        if precision is None:
+            self.cov = np.asarray(cov, dtype='float64')
+            self.cov_chol = linalg.cholesky(self.cov, lower=True)
+            self.precision = self.precision_chol = None
+        else:
+            self.precision = np.asarray(precision, dtype='float64')
+            self.precision_chol = linalg.cholesky(self.precision, lower=True)
+            self.cov = self.cov_chol = None
         
-        self.cov_inv = self.cov.I # calculate inverse (save comp. time)
+        checks.tryAssertEqual(self._chol().shape, (self.dim, self.dim),
+            ' expected cov.shape = (dim, dim)\n> cov: {}, dim: {}'.format(
+            self._chol().shape, self.dim))
         
         super(Multivariate_Gaussian, self)._nonLattice()
         super(Multivariate_Gaussian, self).__init__()
         pass
     
+    def _chol(self):
+        """the Cholesky factor that backs the potential"""
+        return self.cov_chol if self.cov_chol is not None else self.precision_chol
+    
+    def _columns(self, x):
+        """views x as (dim, n) columns"""
+        x = np.asarray(x)
+        checks.tryAssertEqual(x.shape[0], self.dim,
+            ' expected x.shape[0] = dim\n> x: {}, dim: {}'.format(x.shape, self.dim))
+        return x.reshape(self.dim, -1)
+    
+    def whiten(self, x):
+        """Maps positions to the whitened coordinates z = L^{-1}(x - mean)
+        
+        Required Inputs
+            x :: np.ndarray (col vectors) :: positions of shape (dim, n)
+        """
+        d = self._columns(x) - self.mean
+        if self.cov_chol is not None:
+            z = linalg.solve_triangular(self.cov_chol, d, lower=True)
+        else: # cov = R^{-T}R^{-1} so L^{-1} = R^T
+            z = self.precision_chol.T.dot(d)
+        return z.reshape(np.shape(x))
+    
+    def colour(self, z):
+        """Maps whitened coordinates back to positions x = mean + Lz
+        
+        Required Inputs
+            z :: np.ndarray (col vectors) :: whitened coords of shape (dim, n)
+        """
+        w = self._columns(z)
+        if self.cov_chol is not None:
+            x = self.cov_chol.dot(w)
+        else:
+            x = linalg.solve_triangular(self.precision_chol.T, w, lower=False)
+        return (x + self.mean).reshape(np.shape(z))
+    
     def kineticEnergy(self, p):
         """n-dim KE
         
         Required Inputs
-            p :: np.matrix (col vector) :: momentum vector
+            p :: np.ndarray (col vectors) :: momentum vector(s)
         """
         checks.tryAssertEqual(len(p.shape), 2,
              ' expected momentum dims = 2.\n> p: {}'.format(p))
-        return .5 * (p**2).sum(axis=0)
+        return .5 * (np.asarray(p)**2).sum(axis=0, dtype=np.float64)
     
     def potentialEnergy(self, x):
-        """n-dim potential
+        """n-dim potential: one energy per column
         
         Required Inputs
-            x :: np.matrix (col vector) :: position vector
+            x :: np.ndarray (col vectors) :: position vector(s). Not modified
         """
-        checks.tryAssertEqual(x.shape, self.mean.shape,
-            ' expected x.shape = self.mean.shape\n> x: {}, mu: {}'.format(
-            x.shape, self.mean.shape))
-        x -= self.mean
-        return .5 * ( np.dot(x.T, self.cov_inv) * x).sum(axis=0)
+        if self.whitened:
+            z = self._columns(x)
+        else:
+            z = self._columns(self.whiten(x))
+        return .5 * (z**2).sum(axis=0, dtype=np.float64)
     
     def gradPotentialEnergy(self, x):
-        """n-dim gradient
+        """n-dim gradient: one column per position
         
-        Notes
-            discard just stores extra arguments passed for compatibility
-            with the lattice versions
+        Required Inputs
+            x :: np.ndarray (col vectors) :: position vector(s). Not modified
         """
+        if self.whitened: return np.array(x, copy=True)
         
-        checks.tryAssertEqual(len(x.shape), 2,
-             ' expected position dims = 2.\n> x: {}'.format(x))
+        d = self._columns(x) - self.mean
+        if self.cov_chol is not None:
+            grad = linalg.cho_solve((self.cov_chol, True), d)
+        else:
+            grad = self.precision_chol.dot(self.precision_chol.T.dot(d))
+        return grad.reshape(np.shape(x))
+    
+    def hessian(self, x):
+        """The (constant) precision matrix
         
-        # this is constant irrelevent of the index
-        return np.dot(self.cov_inv, x)
+        Required Inputs
+            x :: np.ndarray (col vector) :: position. Unused
+        """
+        if self.whitened: return np.identity(self.dim)
+        if self.cov_chol is not None:
+            return linalg.cho_solve((self.cov_chol, True), np.identity(self.dim))
+        return self.precision_chol.dot(self.precision_chol.T)
 #
 if __name__ == '__main__':
     from lattice import Periodic_Lattice
@@ -0,0 +1,379 @@
+# default pip imports
+import numpy as np
+from scipy import linalg
+
+# local imports
+from common import Init
+from hmc import Hybrid_Monte_Carlo
+
+__docformat__ = "restructuredtext en"
+
+__all__ = [ 'Metric',
+            'Potential_Metric',
+            'SoftAbs_Metric',
+            'Local_Metric',
+            'getMetric',
+            'Riemannian_Leap_Frog',
+            'Riemannian_HMC']
+
+class Metric(object):
+    """A position dependent metric G(x) over the flattened positions
+    
+    Subclasses define metric(x). The derivatives dG/dx_i are taken by
+    central differences unless a subclass overrides metricGrad(x)
+    
+    Optional Inputs
+        h :: float :: finite difference step
+    """
+    def __init__(self, h=1e-5):
+        self.h = h
+        pass
+    
+    def metric(self, x):
+        raise NotImplementedError('Error: A metric must define metric(x)')
+    
+    def metricGrad(self, x):
+        """The derivatives of the metric with shape (n, n, n) where the
+        first axis is the flat position that is differentiated
+        
+        Required Inputs
+            x :: np.ndarray :: position
+        """
+        x = np.asarray(x, dtype=np.float64)
+        flat = x.ravel()
+        n = flat.size
+        grad = np.empty((n, n, n))
+        for i in xrange(n):
+            up, down = flat.copy(), flat.copy()
+            up[i] += self.h
+            down[i] -= self.h
+            grad[i] = (self.metric(up.reshape(x.shape))
+                - self.metric(down.reshape(x.shape)))/(2.*self.h)
+        return grad
+#
+class Potential_Metric(Metric):
+    """The metric supplied by a potential with a `metric(x)` method and
+    optionally the derivatives as `metricGrad(x)`
+    
+    Required Inputs
+        potential :: class :: a potential with a metric
+    
+    Optional Inputs
+        h :: float :: finite difference step
+    """
+    def __init__(self, potential, h=1e-5):
+        super(Potential_Metric, self).__init__(h)
+        self.potential = potential
+        if hasattr(potential, 'metricGrad'): self.metricGrad = potential.metricGrad
+        pass
+    
+    def metric(self, x):
+        return np.asarray(self.potential.metric(x), dtype=np.float64)
+#
+class SoftAbs_Metric(Metric):
+    """The SoftAbs metric of Betancourt (2013)
+    
+    The eigenvalues l of the Hessian of the action are mapped to
+    l coth(alpha l) which is positive definite, tends to |l| for
+    strong curvature and to 1/alpha where the curvature vanishes
+    
+    Required Inputs
+        potential :: class :: a potential with `duE` and optionally
+                    `hessian(x)`. The Hessian is otherwise found by
+                    central differences of the gradient
+    
+    Optional Inputs
+        alpha :: float :: the sharpness of the soft absolute value
+        h     :: float :: finite difference step
+    
+    Notes
+        Every metric costs an eigendecomposition so this is for
+        targets of a small dimension
+    """
+    def __init__(self, potential, alpha=1., h=1e-5):
+        super(SoftAbs_Metric, self).__init__(h)
+        self.potential = potential
+        self.alpha = alpha
+        pass
+    
+    def hessian(self, x):
+        """The symmetrised Hessian of the action
+        
+        Required Inputs
+            x :: np.ndarray :: position
+        """
+        if hasattr(self.potential, 'hessian'):
+            hess = np.asarray(self.potential.hessian(x), dtype=np.float64)
+        else:
+            x = np.asarray(x, dtype=np.float64)
+            flat = x.ravel()
+            n = flat.size
+            hess = np.empty((n, n))
+            for i in xrange(n):
+                up, down = flat.copy(), flat.copy()
+                up[i] += self.h
+                down[i] -= self.h
+                hess[i] = (np.ravel(self.potential.duE(up.reshape(x.shape)))
+                    - np.ravel(self.potential.duE(down.reshape(x.shape))))/(2.*self.h)
+        return .5*(hess + hess.T)
+    
+    def metric(self, x):
+        l, q = linalg.eigh(self.hessian(x))
+        al = self.alpha*l
+        # l coth(al) -> 1/alpha as l -> 0
+        small = np.abs(al) < 1e-8
+        soft = np.where(small, 1./self.alpha, l/np.tanh(np.where(small, 1., al)))
+        return (q*soft).dot(q.T)
+#
+def getMetric(potential, alpha=1., h=1e-5):
+    """The metric of the potential if it has one and otherwise SoftAbs
+    
+    Required Inputs
+        potential :: class :: any potential in potentials.py
+    
+    Optional Inputs
+        alpha :: float :: the sharpness of the SoftAbs metric
+        h     :: float :: finite difference step
+    """
+    if hasattr(potential, 'metric'): return Potential_Metric(potential, h=h)
+    return SoftAbs_Metric(potential, alpha=alpha, h=h)
+
+class Local_Metric(object):
+    """The metric frozen at a point
+    
+    Has the interface of :class:`mass.Mass_Matrix` with M = G(x) so that
+    :class:`hmc.Momentum` draws the momenta from N(0, G(x))
+    
+    Required Inputs
+        metric :: Metric :: the metric
+        x      :: np.ndarray :: position
+    
+    Optional Inputs
+        grad :: bool :: also find the derivatives of the metric
+    
+    Raises a LinAlgError if G(x) is not positive definite
+    """
+    def __init__(self, metric, x, grad=True):
+        self.shape = np.shape(x)
+        self.g = metric.metric(x)
+        self.chol = linalg.cholesky(self.g, lower=True)
+        self.inv = linalg.cho_solve((self.chol, True), np.identity(self.g.shape[0]))
+        self.log_det = 2.*np.log(np.diag(self.chol)).sum()
+        if grad:
+            self.grad = metric.metricGrad(x)
+            self.trace = np.einsum('jk,ikj->i', self.inv, self.grad) # tr(G^-1 dG_i)
+        pass
+    
+    def velocity(self, p):
+        """The drift G^-1 p"""
+        return self.inv.dot(np.ravel(p)).reshape(np.shape(p))
+    
+    def kineticEnergy(self, p):
+        """p^T G^-1 p/2 + log det G/2 in float64"""
+        p = np.asarray(p, dtype=np.float64)
+        return .5*np.sum(p*self.velocity(p)) + .5*self.log_det
+    
+    def forces(self, p):
+        """The derivative of the kinetic energy with respect to x
+            
+            tr(G^-1 dG_i)/2 - v^T dG_i v/2 with v = G^-1 p
+        
+        Required Inputs
+            p :: np.ndarray :: momentum
+        """
+        v = self.inv.dot(np.ravel(p))
+        return .5*self.trace - .5*np.einsum('j,ijk,k->i', v, self.grad, v)
+    
+    def noise(self, rng, shape):
+        """A momentum drawn from N(0, G)"""
+        z = rng.normal(size=shape, scale=1., loc=0.)
+        return self.chol.dot(z.ravel()).reshape(shape)
+#
+class Riemannian_Leap_Frog(Init):
+    """The generalised leapfrog of Girolami and Calderhead (2011) for
+    the non-separable Hamiltonian
+        
+        H = U(x) + log det G(x)/2 + p^T G(x)^-1 p/2
+    
+    Each step is
+        
+        p' = p - e/2 dH/dx(p', x)                   implicit
+        x' = x + e/2 (G^-1(x) + G^-1(x')) p'         implicit
+        p" = p' - e/2 dH/dx(p', x')                 explicit
+    
+    where the implicit equations are solved by fixed point iterations.
+    The map is reversible and volume preserving when they converge
+    
+    Required Inputs
+        potential :: class :: any potential in potentials.py
+        metric    :: Metric :: see getMetric()
+    
+    Optional Inputs
+        step_size :: float :: integration step length
+        n_steps   :: int :: number of steps
+        tol       :: float :: largest change of an iterate at convergence
+        max_iter  :: int :: fixed point iterations before giving up
+    
+    Attributes
+        n          :: number of steps of the last trajectory
+        converged  :: False if an implicit step of the last trajectory
+                    did not converge. The proposal must then be rejected
+        iterations :: fixed point iterations of the last trajectory
+    """
+    def __init__(self, potential, metric, **kwargs):
+        super(Riemannian_Leap_Frog, self).__init__()
+        self.initArgs(locals())
+        self.defaults = {
+            'step_size':.1,
+            'n_steps':20,
+            'tol':1e-6,
+            'max_iter':50
+            }
+        self.initDefaults(kwargs)
+        self.n = 0
+        self.converged = True
+        self.iterations = 0
+        pass
+    
+    def local(self, x, grad=True):
+        """The metric frozen at x - see :class:`Local_Metric`"""
+        return Local_Metric(self.metric, x, grad=grad)
+    
+    def hamiltonian(self, p, x):
+        """The Riemannian Hamiltonian in float64 with shape (1,)
+        
+        Required Inputs
+            p :: np.ndarray :: momentum
+            x :: np.ndarray :: position
+        """
+        h = self.local(x, grad=False).kineticEnergy(p) \
+            + np.sum(self.potential.uE(x), dtype=np.float64)
+        return np.asarray(h, dtype=np.float64).reshape(1)
+    
+    def _solve(self, update, guess):
+        """Iterates guess = update(guess) to the tolerance
+        
+        Returns the last iterate and sets self.converged to False if
+        max_iter is reached
+        """
+        for i in xrange(self.max_iter):
+            new = update(guess)
+            self.iterations += 1
+            change = np.abs(new - guess).max()
+            guess = new
+            if change < self.tol: return guess
+        self.converged = False
+        return guess
+    
+    def integrate(self, p, x):
+        """Integrates the dynamics for n_steps
+        
+        Required Inputs
+            p :: np.ndarray :: momentum
+            x :: np.ndarray :: position
+        
+        Returns (p, x) with the types and shapes of the inputs
+        """
+        self.n = self.n_steps
+        self.converged = True
+        self.iterations = 0
+        e = self.step_size
+        
+        shape = np.shape(x)
+        q = np.asarray(x, dtype=np.float64).ravel().copy()
+        m = np.asarray(p, dtype=np.float64).ravel().copy()
+        unflat = lambda y: y.reshape(shape)
+        grad = lambda y: np.ravel(self.potential.duE(unflat(y)))
+        
+        try:
+            point, du = self.local(unflat(q)), grad(q)
+            for step in xrange(self.n_steps):
+                half = lambda mm: m - .5*e*(du + point.forces(mm))
+                m = self._solve(half, m)
+                
+                v = point.inv.dot(m)
+                drift = lambda qq: q + .5*e*(v + self.local(unflat(qq), grad=False).inv.dot(m))
+                q = self._solve(drift, q + e*v)
+                
+                point, du = self.local(unflat(q)), grad(q)
+                m = m - .5*e*(du + point.forces(m))
+                
+                if not (np.isfinite(q).all() and np.isfinite(m).all()):
+                    self.converged = False
+                if not self.converged: break
+        except (linalg.LinAlgError, ValueError):
+            self.converged = False # the metric broke down along the path
+        
+        x = x.copy()
+        np.asarray(x)[...] = unflat(q)
+        p = p.copy()
+        np.asarray(p)[...] = unflat(m)
+        return p, x
+#
+class Riemannian_HMC(Hybrid_Monte_Carlo):
+    """Riemannian Manifold Hybrid Monte Carlo (Girolami and Calderhead 2011)
+    
+    The momenta are drawn from N(0, G(x)) and moved with the generalised
+    leapfrog so that the step adapts to the local curvature of the
+    target. Partial refreshments mix with noise from N(0, G(x)) which
+    keeps the conditional distribution of p given x
+    
+    Parameters
+    ----------
+    x0         : array_like
+        Initial starting position vector
+    dynamics   : class
+        :class:`Riemannian_Leap_Frog`
+    potential  : class
+        A potential following :mod:`potentials`
+    rng        : `np.random.RandomState`
+        random number state
+    
+    All other parameters are those of :class:`hmc.Hybrid_Monte_Carlo`
+    except `mass` and `adapt_mass` which are replaced by the metric
+    
+    Attributes
+    ----------
+    n_diverged
+        Number of trajectories rejected as the fixed point iterations
+        did not converge
+    """
+    def __init__(self, x0, dynamics, potential, rng, **kwargs):
+        super(Riemannian_HMC, self).__init__(x0, dynamics, potential, rng, **kwargs)
+        self.momentum.mass = self.dynamics.local(self.x0, grad=False)
+        self.p0 = self.momentum.fullRefresh(self.x0)
+        self.n_diverged = 0
+        pass
+    
+    def move(self, p, x, step_size = None, n_steps = None, mixing_angle=.5*np.pi):
+        """A generalised RMHMC move
+        
+        Parameters
+        ----------
+        See :meth:`hmc.Hybrid_Monte_Carlo.move`
+        """
+        if (step_size is not None): self.dynamics.step_size = step_size
+        if (n_steps is not None): self.dynamics.n_steps = n_steps
+        
+        self.momentum.mass = self.dynamics.local(x, grad=False)
+        p = self.momentum.generalisedRefresh(p, mixing_angle=mixing_angle)
+        p0, x0 = p.copy(), x.copy()
+        
+        p, x = self.dynamics.integrate(p, x)
+        p = self.momentum.flip(p)
+        
+        self.h_old = self.hamiltonian(p0, x0)
+        if self.dynamics.converged:
+            self.h_new = self.hamiltonian(p, x)
+        else:
+            self.n_diverged += 1
+            self.h_new = np.full(1, np.inf)
+        accept = self.accept.metropolisHastings(h_old=self.h_old, h_new=self.h_new)
+        
+        if accept: return p,x
+        else: return p0, x0
+    
+    def hamiltonian(self, p, x):
+        """The Riemannian Hamiltonian - see :meth:`Riemannian_Leap_Frog.hamiltonian`"""
+        return self.dynamics.hamiltonian(p, x)
+#
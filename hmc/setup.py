@@ -0,0 +1,15 @@
+from distutils.core import setup
+from distutils.extension import Extension
+from Cython.Distutils import build_ext
+import numpy as np
+
+
+ext_modules = [
+    Extension("clibs", ["clibs.pyx"], include_dirs=[np.get_include()])
+    ]
+
+setup(
+  name = 'clibs',
+  cmdclass = {'build_ext': build_ext},
+  ext_modules = ext_modules  
+)
@@ -0,0 +1,374 @@
+import numpy as np
+import multiprocessing as mp
+from tqdm import tqdm
+
+from common import Init
+from potentials import Shared
+from dynamics import Leap_Frog
+from hmc import Hybrid_Monte_Carlo
+from distributed import sharedArray, receive, terminate
+
+__all__ = [ 'Tempered_Potential',
+            'Replica_Exchange']
+
+class Tempered_Potential(Shared):
+    """A potential at inverse temperature beta
+    
+    The action and its gradient are scaled by beta while the kinetic
+    energy is unchanged so the momenta are always unit gaussians
+    
+    Required Inputs
+        potential :: class :: any potential in potentials.py
+    
+    Optional Inputs
+        beta :: float :: inverse temperature
+    """
+    def __init__(self, potential, beta=1.):
+        self.name = 'Tempered ' + potential.name
+        self.debug = getattr(potential, 'debug', False)
+        self.potential = potential
+        self.beta = beta
+        
+        self.kE  = lambda p, *args, **kwargs: self.potential.kE(p)
+        self.uE  = lambda x, *args, **kwargs: self.beta*self.potential.uE(x)
+        self.duE = lambda x, *args, **kwargs: self.beta*self.potential.duE(x)
+        super(Tempered_Potential, self).__init__()
+        pass
+#
+def _replica(rank, conn, sampler, configs, energies):
+    """The command loop of the worker process running one replica
+    
+    The configuration of the replica is read from and written back to
+    configs[rank] around each run so that swaps made by the parent
+    between runs are picked up
+    """
+    x = sampler.x0.copy()
+    p = sampler.p0.copy()
+    n_replicas = configs.shape[0]
+    samples, samples_traj = [], []
+    
+    def config(k): # the shared row k with the type of x0
+        y = sampler.x0.copy()
+        np.asarray(y)[...] = configs[k]
+        return y
+    
+    while True:
+        command = conn.recv()
+        name, args = command[0], command[1:]
+        if name == 'stop': break
+        try:
+            result = None
+            if name == 'run':
+                n_moves, mixing_angle, record = args
+                x = config(rank)
+                for step in xrange(n_moves):
+                    p, x = sampler.move(p, x, mixing_angle=mixing_angle)
+                    if record and rank == 0:
+                        samples.append(np.asarray(x).copy())
+                        samples_traj.append(sampler.dynamics.n)
+                configs[rank] = x
+            elif name == 'energies': # actions of this replica at the neighbours
+                for i, k in enumerate([rank - 1, rank, rank + 1]):
+                    if 0 <= k < n_replicas:
+                        energies[rank, i] = sampler.potential.uE(config(k))
+            elif name == 'beta': # the step size follows the temperature
+                sampler.potential.beta, sampler.dynamics.step_size = args
+            elif name == 'step_size':
+                result = sampler.dynamics.step_size
+            elif name == 'reset':
+                p = sampler.p0.copy()
+                del sampler.accept.accept_rates[:]
+            elif name == 'samples':
+                result = samples, samples_traj, list(sampler.accept.accept_rates)
+                samples, samples_traj = [], []
+            else:
+                raise ValueError('Unknown command: {}'.format(name))
+        except Exception as e:
+            result = e
+        conn.send(result)
+    conn.close()
+#
+class Replica_Exchange(Init):
+    """Parallel tempering with one GHMC replica per worker process
+    
+    Each replica runs `swap_every` GHMC moves in its own process and then
+    neighbouring replicas attempt to exchange configurations. The swaps
+    alternate between the even and odd pairs and are made in place in
+    a shared memory array so that only commands pass through the pipes.
+    The first replica is the target distribution
+    
+    Parameters
+    ----------
+    x0         : array_like
+        Initial configuration of every replica
+    potential  : class
+        The target potential following the structure in :mod:`potentials`
+    rng        : `np.random.RandomState`
+        random number state. Each replica is seeded from it
+    n_replicas : int, optional
+        Number of replicas in the default geometric ladder
+    beta_min   : float, optional
+        Smallest inverse temperature of the default ladder
+    betas      : list, optional
+        An explicit temperature ladder starting at 1
+    potentials : list, optional
+        A ladder in a coupling instead of the temperature: one potential
+        per replica with the target first. The ladder is not adapted
+    step_size  : float, optional
+        Step size of the target replica. Replica r uses
+        `step_size/sqrt(beta_r)` as its forces are scaled by beta_r.
+        The step sizes follow the ladder when it is adapted
+    n_steps    : int, optional
+        Number of leapfrog steps per trajectory
+    swap_every : int, optional
+        GHMC moves between swap attempts
+    adapt_ladder : bool, optional
+        Adapt the temperatures during burn in towards uniform swap rates
+    adapt_rate : float, optional
+        Initial learning rate of the adaptation of the log spacings
+    
+    Attributes
+    ----------
+    swap_rates
+        The swap acceptance rate of each neighbouring pair
+    round_trips
+        The number of moves taken by each completed round trip of a
+        configuration from the target to the hottest replica and back
+    walkers
+        The label of the configuration held by each replica
+    step_sizes
+        The current leapfrog step size of each replica
+    
+    Notes
+    ----------
+    The workers are forked when the class is created. Use close() to stop them.
+    An error in a replica is raised by the sampler. If a replica exits, all the
+    workers are terminated and a RuntimeError is raised
+    """
+    def __init__(self, x0, potential, rng, **kwargs):
+        super(Replica_Exchange, self).__init__()
+        self.initArgs(locals())
+        self.defaults = {
+            'n_replicas':4,
+            'beta_min':.1,
+            'betas':None,
+            'potentials':None,
+            'step_size':.1,
+            'n_steps':20,
+            'swap_every':10,
+            'adapt_ladder':True,
+            'adapt_rate':.5
+            }
+        self.initDefaults(kwargs)
+        
+        if self.potentials is not None:
+            self.betas = [1.]*len(self.potentials)
+            self.adapt_ladder = False
+        elif self.betas is None:
+            self.betas = np.geomspace(1., self.beta_min, self.n_replicas)
+        self.betas = np.asarray(self.betas, dtype=np.float64)
+        self.n_replicas = self.betas.size
+        
+        dtype = self.x0.dtype if self.x0.dtype in (np.float32, np.float64) else np.float64
+        self.configs = sharedArray((self.n_replicas,) + np.shape(self.x0), dtype)
+        self.energies = sharedArray((self.n_replicas, 3), np.float64)
+        
+        self.conns, self.workers = [], []
+        for rank, beta in enumerate(self.betas):
+            if self.potentials is None:
+                pot = Tempered_Potential(self.potential, beta)
+            else:
+                pot = self.potentials[rank]
+            dynamics = Leap_Frog(duE=pot.duE, step_size=self.step_size/np.sqrt(beta),
+                n_steps=self.n_steps)
+            sampler = Hybrid_Monte_Carlo(self.x0, dynamics, pot,
+                np.random.RandomState(self.rng.randint(2**31)),
+                accept_kwargs={'get_accept_rates':True})
+            
+            conn, child = mp.Pipe()
+            worker = mp.Process(target=_replica,
+                args=(rank, child, sampler, self.configs, self.energies))
+            worker.daemon = True
+            worker.start()
+            self.conns.append(conn)
+            self.workers.append(worker)
+        pass
+    
+    def _run(self, command):
+        """Runs command on every replica"""
+        for conn in self.conns: conn.send(command)
+        return self._collect()
+    
+    def _collect(self):
+        """The replies of every replica to the last command
+        
+        Raises the first error reported by a replica. If a worker has
+        exited all of them are terminated and a RuntimeError is raised
+        """
+        try:
+            results = [receive(conn, worker, self.workers)
+                for conn, worker in zip(self.conns, self.workers)]
+        except RuntimeError:
+            self.conns, self.workers = [], []
+            raise
+        for result in results:
+            if isinstance(result, Exception): raise result
+        return results
+    
+    def _reset(self):
+        """Places x0 on every replica and clears the statistics"""
+        self.configs[...] = np.asarray(self.x0)
+        self._run(('reset',))
+        
+        n = self.n_replicas
+        self.walkers = np.arange(n)
+        self.directions = np.zeros(n, dtype=int)    # +1 heading hot, -1 heading back
+        self.departures = np.zeros(n, dtype=int)    # move at which each trip started
+        self.swap_attempts = np.zeros(n - 1, dtype=int)
+        self.swap_accepts = np.zeros(n - 1, dtype=int)
+        self.round_trips = []
+        self.n_swaps = 0
+        self.swap_probs = np.full(n - 1, .5)
+        self.moves = 0
+        pass
+    
+    def _swap(self, adapt):
+        """Attempts to swap the configurations of the even or odd pairs
+        
+        Required Inputs
+            adapt :: bool :: adapt the ladder to the swap probabilities
+        """
+        self._run(('energies',))
+        e = self.energies
+        pairs = np.arange(self.n_swaps % 2, self.n_replicas - 1, 2)
+        self.n_swaps += 1
+        
+        probs = []
+        for i in pairs:
+            delta = e[i, 1] + e[i+1, 1] - e[i, 2] - e[i+1, 0]
+            probs.append(min(1., np.exp(min(delta, 0.))))
+            self.swap_attempts[i] += 1
+            if self.rng.uniform() < probs[-1]:
+                self.swap_accepts[i] += 1
+                self.configs[[i, i+1]] = self.configs[[i+1, i]]
+                self.walkers[[i, i+1]] = self.walkers[[i+1, i]]
+        
+        # round trips of the configurations between the ends of the ladder
+        bottom, top = self.walkers[0], self.walkers[-1]
+        if self.directions[bottom] == -1:
+            self.round_trips.append(self.moves - self.departures[bottom])
+        if self.directions[bottom] != 1:
+            self.directions[bottom] = 1
+            self.departures[bottom] = self.moves
+        if self.directions[top] == 1: self.directions[top] = -1
+        
+        if adapt and len(pairs): self._adapt(pairs, np.asarray(probs))
+        pass
+    
+    def _adapt(self, pairs, probs):
+        """Moves the temperatures towards uniform swap probabilities
+        
+        A running estimate of the swap probability of each pair is kept
+        as only half of the pairs are attempted in a round. The log
+        spacings of pairs that swap more often than the average are
+        widened and the others narrowed, keeping the ends fixed. The
+        probabilities rather than the outcomes reduce the noise
+        
+        Required Inputs
+            pairs :: np.ndarray :: the pairs attempted in this round
+            probs :: np.ndarray :: their swap probabilities
+        """
+        self.swap_probs[pairs] += .1*(probs - self.swap_probs[pairs])
+        
+        log_gaps = np.log(np.diff(-np.log(self.betas)))
+        rate = self.adapt_rate/(1. + self.n_swaps/100.)
+        log_gaps += rate*(self.swap_probs - self.swap_probs.mean())
+        
+        gaps = np.exp(log_gaps)
+        gaps *= -np.log(self.betas[-1])/gaps.sum()
+        self.betas = np.exp(-np.concatenate([[0.], np.cumsum(gaps)]))
+        
+        for conn, beta in zip(self.conns, self.betas):
+            conn.send(('beta', beta, self.step_size/np.sqrt(beta)))
+        self._collect()
+        pass
+    
+    @property
+    def step_sizes(self):
+        """The leapfrog step size of each replica"""
+        return np.asarray(self._run(('step_size',)))
+    
+    @property
+    def swap_rates(self):
+        return self.swap_accepts/np.maximum(self.swap_attempts, 1).astype(np.float64)
+    
+    def sample(self, n_samples, n_burn_in = 20, mixing_angle=.5*np.pi, verbose = False, verb_pos = 0):
+        """Runs the replicas and returns the samples of the target
+        
+        Parameters
+        ----------
+        n_samples       : integer
+            Number of samples (# GHMC moves of the target after burn in)
+        n_burn_in       : int,  optional
+            Number of moves to discard at start. The ladder is adapted
+            during the burn in only so that the sampling is Markovian
+        mixing_angle    : float,optional
+            As in :meth:`hmc.Hybrid_Monte_Carlo.sample`
+        verbose         : bool, optional
+            A progress bar if True
+        verb_pos        : int,  optional
+            Offset for status bar
+        
+        Notes
+        ----------
+        Returns the interface of :meth:`hmc.Hybrid_Monte_Carlo.sample` with
+        empty momentum samples. The swap and round trip statistics
+        are those of the sampling only
+        """
+        self._reset()
+        n_moves = self.swap_every
+        
+        chains = []
+        for burn_in, n in [(True, n_burn_in), (False, n_samples)]:
+            start = self.configs[0].copy()
+            intervals = xrange(int(np.ceil(n/float(n_moves))))
+            if verbose and not burn_in:
+                intervals = tqdm(intervals, position=verb_pos,
+                    desc='Sampling: {}'.format(verb_pos))
+            done = 0
+            for interval in intervals:
+                moves = min(n_moves, n - done)
+                self._run(('run', moves, mixing_angle, True))
+                done += moves
+                self.moves += moves
+                self._swap(adapt=self.adapt_ladder and burn_in)
+            
+            # the target replica records the position after every move
+            samples, samples_traj, self.accept_rates = self._run(('samples',))[0]
+            chains.append(([start] + samples, [0] + samples_traj))
+            if burn_in: self._resetStats()
+        
+        (self.burn_in, self.burn_in_traj), (self.samples, self.samples_traj) = chains
+        self.burn_in_p, self.samples_p = [], []
+        return (self.burn_in_p, self.samples_p), (self.burn_in, self.samples)
+    
+    def _resetStats(self):
+        """Clears the swap statistics at the end of the burn in"""
+        self.swap_attempts[:] = 0
+        self.swap_accepts[:] = 0
+        self.round_trips = []
+        self.directions[:] = 0
+        pass
+    
+    def close(self):
+        """Stops the worker processes"""
+        for conn in self.conns: conn.send(('stop',))
+        for worker in self.workers: worker.join()
+        self.conns, self.workers = [], []
+        pass
+    
+    def terminate(self):
+        """Kills the worker processes when they cannot be stopped by close()"""
+        terminate(self.workers)
+        self.conns, self.workers = [], []
+        pass
@@ -1,6 +1,10 @@
 import numpy as np
 from hmc.lattice import Periodic_Lattice
 from hmc.hmc import *
+from hmc.heatbath import Checkerboard_Heatbath
+from hmc.fourier import Fourier_Sampler
+from hmc.riemannian import Riemannian_Leap_Frog, Riemannian_HMC, getMetric
+from hmc.batched import Batched_HMC
 from hmc.common import Init
 
 class Base(object):
@@ -36,14 +40,17 @@ class Base(object):
     def _getInstances(self):
         """gets the relevant instances for the model"""
         
-        self.x0 = Periodic_Lattice(self.x0, lattice_spacing=self.spacing)
+        self.x0 = Periodic_Lattice(np.asarray(self.x0, dtype=self.dtype),
+            lattice_spacing=self.spacing)
         if not hasattr(self, 'save_path'): self.save_path=False
         dynamics = Leap_Frog(
             duE = self.pot.duE,
             step_size = self.step_size,
             n_steps = self.n_steps,
             rand_steps = self.rand_steps,
-            save_path = self.save_path)
+            save_path = self.save_path,
+            dtype = self.dtype,
+            trajectory = getattr(self.pot, 'trajectory', None))
         
         if hasattr(self, 'accept_kwargs'):
             if 'get_accept_rates' not in self.accept_kwargs:
@@ -52,7 +59,14 @@ class Base(object):
             self.accept_kwargs = {'get_accept_rates':True}
         
         self.sampler = Hybrid_Monte_Carlo(self.x0, dynamics, self.pot, self.rng,
-            accept_kwargs = self.accept_kwargs)
+            accept_kwargs = self.accept_kwargs, dtype = self.dtype,
+            adapt_mass = getattr(self, 'adapt_mass', None),
+            block_size = getattr(self, 'block_size', None),
+            acceptance = getattr(self, 'acceptance', 'standard'),
+            lift_delta = getattr(self, 'lift_delta', .05),
+            flip = getattr(self, 'flip', 'always'),
+            extra_chances = getattr(self, 'extra_chances', 0),
+            speculate = getattr(self, 'speculate', 0))
         pass
 #
 class Basic_HMC(Init, Base):
@@ -67,6 +81,13 @@ class Basic_HMC(Init, Base):
         step_size   :: int  :: default step size for dynamics
         spacing     :: float :: lattice spacing
         rng :: np.random.RandomState :: must be able to call rng.uniform
+        dtype :: np.dtype :: 'float32' for single precision fields & samples
+        adapt_mass :: str :: 'diag' or 'dense' mass matrix adaptation in the burn in
+        block_size :: int :: moves per call of the compiled kernel of the potential
+        acceptance :: str :: 'standard' or 'lifted' (non-reversible) Metropolis test
+        flip :: str :: 'always' or 'reduced' momentum reversals on rejection
+        extra_chances :: int :: further segments tried on a rejection
+        speculate :: int :: worker processes integrating the moves after a rejection
     """
     def __init__(self, x0, pot, **kwargs):
         super(Basic_HMC, self).__init__()
@@ -76,7 +97,8 @@ class Basic_HMC(Init, Base):
             'rng':np.random.RandomState(111),
             'step_size': .1,
             'n_steps': 20,
-            'rand_steps':False
+            'rand_steps':False,
+            'dtype':'float64'
         }
         
         self.initDefaults(kwargs)
@@ -95,6 +117,13 @@ class Basic_KHMC(Init, Base):
         step_size   :: int  :: default step size for dynamics
         spacing     :: float :: lattice spacing
         rng :: np.random.RandomState :: must be able to call rng.uniform
+        dtype :: np.dtype :: 'float32' for single precision fields & samples
+        adapt_mass :: str :: 'diag' or 'dense' mass matrix adaptation in the burn in
+        block_size :: int :: moves per call of the compiled kernel of the potential
+        acceptance :: str :: 'standard' or 'lifted' (non-reversible) Metropolis test
+        flip :: str :: 'always' or 'reduced' momentum reversals on rejection
+        extra_chances :: int :: further segments tried on a rejection
+        speculate :: int :: worker processes integrating the moves after a rejection
     """
     def __init__(self, x0, pot, **kwargs):
         super(Basic_KHMC, self).__init__()
@@ -103,7 +132,8 @@ class Basic_KHMC(Init, Base):
             'spacing':1.,
             'rng':np.random.RandomState(111),
             'step_size': .1,
-            'rand_steps':False
+            'rand_steps':False,
+            'dtype':'float64'
         }
         self.initDefaults(kwargs)
         self.n_steps = 1 # this is a key paramter of KHMC
@@ -123,6 +153,13 @@ class Basic_GHMC(Init, Base):
         step_size   :: int  :: default step size for dynamics
         spacing     :: float :: lattice spacing
         rng :: np.random.RandomState :: must be able to call rng.uniform
+        dtype :: np.dtype :: 'float32' for single precision fields & samples
+        adapt_mass :: str :: 'diag' or 'dense' mass matrix adaptation in the burn in
+        block_size :: int :: moves per call of the compiled kernel of the potential
+        acceptance :: str :: 'standard' or 'lifted' (non-reversible) Metropolis test
+        flip :: str :: 'always' or 'reduced' momentum reversals on rejection
+        extra_chances :: int :: further segments tried on a rejection
+        speculate :: int :: worker processes integrating the moves after a rejection
     """
     def __init__(self, x0, pot, **kwargs):
         super(Basic_GHMC, self).__init__()
@@ -132,9 +169,172 @@ class Basic_GHMC(Init, Base):
             'rng':np.random.RandomState(111),
             'step_size': .1,
             'n_steps': 20,
-            'rand_steps':False
+            'rand_steps':False,
+            'dtype':'float64'
         }
         self.initDefaults(kwargs)
         self._getInstances()
         pass
-    
\ No newline at end of file
+    
+    
+#
+class Basic_Heatbath(Init, Base):
+    """A checkerboard heatbath and overrelaxation model for free lattice potentials
+    
+    Required Inputs
+        x0          :: position (lattice)
+        pot         :: quadratic potential class - see hmc.potentials
+    
+    Optional Inputs
+        n_overrelax :: int  :: overrelaxation sweeps per heatbath sweep
+        spacing     :: float :: lattice spacing
+        rng :: np.random.RandomState :: random number generator
+        dtype :: np.dtype :: 'float32' for single precision fields & samples
+    
+    Notes
+        self.traj counts sweeps: one heatbath plus n_overrelax per sample.
+        Each sweep costs two gradient evaluations
+    """
+    def __init__(self, x0, pot, **kwargs):
+        super(Basic_Heatbath, self).__init__()
+        self.initArgs(locals())
+        self.defaults = {
+            'spacing':1.,
+            'rng':np.random.RandomState(111),
+            'n_overrelax':1,
+            'dtype':'float64'
+        }
+        self.initDefaults(kwargs)
+        self.step_size = 1. # a sweep is the unit of time
+        self.x0 = Periodic_Lattice(np.asarray(self.x0, dtype=self.dtype),
+            lattice_spacing=self.spacing)
+        self.sampler = Checkerboard_Heatbath(self.x0, self.pot, self.rng,
+            n_overrelax = self.n_overrelax, dtype = self.dtype)
+        pass
+#
+class Basic_Fourier(Init, Base):
+    """Exact independent samples of free lattice potentials drawn in Fourier space
+    
+    Required Inputs
+        x0          :: position (lattice) - only the shape is used
+        pot         :: quadratic potential class - see hmc.potentials
+    
+    Optional Inputs
+        spacing     :: float :: lattice spacing
+        rng :: np.random.RandomState :: random number generator
+        dtype :: np.dtype :: 'float32' for single precision fields & samples
+    
+    Notes
+        Every sample is independent so the autocorrelation times are 1/2.
+        self.traj counts one draw per sample and p_acc is 1
+    """
+    def __init__(self, x0, pot, **kwargs):
+        super(Basic_Fourier, self).__init__()
+        self.initArgs(locals())
+        self.defaults = {
+            'spacing':1.,
+            'rng':np.random.RandomState(111),
+            'dtype':'float64'
+        }
+        self.initDefaults(kwargs)
+        self.step_size = 1. # a draw is the unit of time
+        self.x0 = Periodic_Lattice(np.asarray(self.x0, dtype=self.dtype),
+            lattice_spacing=self.spacing)
+        self.sampler = Fourier_Sampler(self.x0, self.pot, self.rng, dtype = self.dtype)
+        pass
+#
+class Basic_RMHMC(Init, Base):
+    """A Riemannian manifold HMC model with the generalised LeapFrog
+    
+    Required Inputs
+        x0          :: position (column vector of a small dimension)
+        pot         :: potential class - see hmc.potentials
+    
+    Optional Inputs
+        n_steps     :: int  :: default number of steps for dynamics
+        step_size   :: int  :: default step size for dynamics
+        tol         :: float :: tolerance of the implicit fixed point iterations
+        max_iter    :: int  :: fixed point iterations before a trajectory is rejected
+        alpha       :: float :: sharpness of the SoftAbs metric used when
+                                pot has no metric(x) method
+        rng :: np.random.RandomState :: must be able to call rng.uniform
+    
+    Notes
+        The positions are not wrapped in a Periodic_Lattice
+    """
+    def __init__(self, x0, pot, **kwargs):
+        super(Basic_RMHMC, self).__init__()
+        self.initArgs(locals())
+        self.defaults = {
+            'rng':np.random.RandomState(111),
+            'step_size': .1,
+            'n_steps': 20,
+            'tol':1e-6,
+            'max_iter':50,
+            'alpha':1.
+        }
+        self.initDefaults(kwargs)
+        
+        self.x0 = np.asarray(self.x0, dtype='float64')
+        dynamics = Riemannian_Leap_Frog(self.pot, getMetric(self.pot, alpha=self.alpha),
+            step_size = self.step_size, n_steps = self.n_steps,
+            tol = self.tol, max_iter = self.max_iter)
+        self.sampler = Riemannian_HMC(self.x0, dynamics, self.pot, self.rng,
+            accept_kwargs = {'get_accept_rates':True})
+        pass
+#
+class Basic_Batched_GHMC(Init, Base):
+    """A GHMC model for a batch of chains with their own parameters
+    
+    Required Inputs
+        x0          :: positions with a leading batch axis (B, *lattice)
+        pot         :: a batched potential e.g. hmc.potentials.Batched_Klein_Gordon
+    
+    Optional Inputs
+        n_steps     :: int  :: number of steps for dynamics
+        step_size   :: float / np.ndarray :: step size of each chain
+        rand_steps  :: bool :: geometric trajectory lengths shared by the chains
+        rng :: np.random.RandomState :: random number generator
+    
+    Notes
+        The mixing angle of run() may also have one value per chain.
+        samples has the shape (n_samples + 1, B, n_sites), traj the shape
+        (n_samples + 1, B) and p_acc one value per chain
+    """
+    def __init__(self, x0, pot, **kwargs):
+        super(Basic_Batched_GHMC, self).__init__()
+        self.initArgs(locals())
+        self.defaults = {
+            'rng':np.random.RandomState(111),
+            'step_size': .1,
+            'n_steps': 20,
+            'rand_steps':False
+        }
+        self.initDefaults(kwargs)
+        
+        self.sampler = Batched_HMC(self.x0, self.pot, self.rng, step_size = self.step_size,
+            n_steps = self.n_steps, rand_steps = self.rand_steps)
+        pass
+    
+    def run(self, n_samples, n_burn_in, **kwargs):
+        """Runs every chain as Base.run
+        
+        Required Inputs
+            n_samples   :: int  :: number of samples
+            n_burn_in   :: int  :: number of burnin steps
+        
+        Optional Inputs
+            mixing_angle :: float / np.ndarray :: mixing angle of each chain
+            verbose :: bool :: a progress bar if True
+        """
+        p_samples, samples = self.sampler.sample(
+            n_samples = n_samples, n_burn_in = n_burn_in, **kwargs)
+        burn_in, samples = samples
+        n_chains = self.sampler.n_chains
+        
+        self.burn_in = np.asarray(burn_in).reshape(n_burn_in+1, n_chains, -1)
+        self.samples = np.asarray(samples).reshape(n_samples+1, n_chains, -1)
+        traj = np.asarray(self.sampler.samples_traj, dtype='float64').reshape(n_samples+1, 1)
+        self.traj = traj*np.broadcast_to(np.ravel(self.step_size), (n_chains,))
+        self.p_acc = np.asarray(self.sampler.accept_rates).reshape(-1, n_chains).mean(axis=0)
+        pass
@@ -7,6 +7,8 @@ import random
 
 from correlations import acorr, corr, errors
 from models import Basic_GHMC as Model
+from models import Basic_Batched_GHMC as Batched_Model
+from hmc.potentials import Batched_Klein_Gordon
 from data import store
 from utils import saveOrDisplay, prll_map
 from plotter import Pretty_Plotter, PLOT_LOC
@@ -76,7 +78,7 @@ def plot(x, lines, subtitle, op_name, save):
 def main(x0, pot, file_name, n_samples, n_burn_in, angle_fracs,
         opFn, op_name, rand_steps = False, step_size = .1, n_steps = 1, spacing = 1.,
         iTauTheory = None, pacc_theory = None, op_theory = None,
-        save = False):
+        save = False, batched = False):
     """Takes a function: opFn. Runs HMC-MCMC. Runs opFn on GHMC samples.
         Calculates Integrated Autocorrelation + Errors across a number of angles
     
@@ -99,6 +101,9 @@ def main(x0, pot, file_name, n_samples, n_burn_in, angle_fracs,
         pacc_theory :: float :: a value for theoretical acceptance probability
         op_theory   :: float :: a value for the operator at 0 separation
         save :: bool :: True saves the plot, False prints to the screen
+        batched :: bool :: run every angle as one chain of a single batched
+                        model instead of one model per angle. pot must be
+                        a Klein_Gordon potential
     
     """
     if not isinstance(angle_fracs, np.ndarray): angle_fracs = np.asarray(angle_fracs)
@@ -121,15 +126,27 @@ def main(x0, pot, file_name, n_samples, n_burn_in, angle_fracs,
         
         # get parameters generated
         p = c.model.p_acc           # get acceptance rates at each M-H step
-        
-        # Calculating integrated autocorrelations
+        return measure(cfn, p)
+    
+    def measure(cfn, p):
+        """integrated autocorrelations of the function of the samples"""
         ans = errors.uWerr(cfn)
         xx, f_diff, _, itau, itau_diff, itaus, _ = ans
         w = errors.getW(itau, itau_diff, n=cfn.shape[0])
-        out = itau, itau_diff, f_diff, w
         return xx, p, itau, itau_diff, f_diff, w
     #
-    ans = prll_map(coreFunc, zip(range(angle_fracs.size), angls, n_samples), verbose=1-explicit_prog)
+    if batched: # one chain per angle in a single run
+        batch_pot = Batched_Klein_Gordon(m=pot.m, phi_3=pot.phi_3, phi_4=pot.phi_4,
+            spacing=spacing)
+        model = Batched_Model(np.tile(x0, (angls.size,) + (1,)*x0.ndim), batch_pot,
+            rng=rng, step_size=step_size, n_steps=n_steps, rand_steps=rand_steps)
+        model.run(n_samples=max(n_samples), n_burn_in=n_burn_in, mixing_angle=angls,
+            verbose=True)
+        ans = [measure(opFn(model.samples[:n+1, i]), model.p_acc[i])
+            for i, n in enumerate(n_samples)]
+    else:
+        ans = prll_map(coreFunc, zip(range(angle_fracs.size), angls, n_samples),
+            verbose=1-explicit_prog)
     
     # unpack from multiprocessing
     xx_lst, p_lst, itau_lst, itau_diffs_lst, f_diff_lst, w_lst = zip(*ans)
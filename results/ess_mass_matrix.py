@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*- 
+import numpy as np
+
+from models import Basic_HMC
+from hmc.potentials import Multivariate_Gaussian
+
+# effective samples per gradient evaluation with a unit, adapted diagonal
+# and adapted dense mass matrix. The best step size from a scan is used
+# for each as the adapted masses allow far larger steps
+n_samples  = 3000
+n_burn_in  = 1000
+n_steps    = 10
+step_sizes = np.geomspace(.005, 1.5, 12)
+np.seterr(over='ignore', invalid='ignore') # unstable step sizes diverge
+
+def itau(obs, c=6.):
+    """Integrated autocorrelation time with the self consistent window W >= c tau"""
+    f = obs - obs.mean()
+    n = f.size
+    ft = np.fft.rfft(f, 2*n)
+    acorr = np.fft.irfft(ft*ft.conj())[:n]
+    if acorr[0] == 0: return np.inf # every move rejected
+    taus = .5 + np.cumsum(acorr[1:]/acorr[0])
+    w = next(w for w in xrange(1, n) if w >= c*taus[w-1])
+    return max(taus[w-1], .5)
+
+rho = .99
+scales = np.geomspace(.01, 1., 10)
+targets = [
+    ('2D, correlation {}'.format(rho), Multivariate_Gaussian(cov=[[1., rho], [rho, 1.]]), 2),
+    ('10D, scales .01 to 1', Multivariate_Gaussian(mean=np.zeros((10, 1)), cov=np.diag(scales**2)), 10)
+    ]
+
+print '{:>22} {:>8} {:>10} {:>8} {:>10}'.format('target', 'mass', 'step size', 'p_acc', 'ESS/grad')
+for name, pot, dim in targets:
+    for adapt_mass in [None, 'diag', 'dense']:
+        best = (0., None, None)
+        for step_size in step_sizes:
+            model = Basic_HMC(np.zeros((dim, 1)), pot, step_size=step_size, n_steps=n_steps,
+                rand_steps=True, rng=np.random.RandomState(1234), adapt_mass=adapt_mass)
+            try:
+                model.run(n_samples=n_samples, n_burn_in=n_burn_in)
+            except ValueError: # the trajectories diverged to nan
+                continue
+            
+            # the worst coordinate over the number of gradient evaluations
+            tau = max(itau(model.samples[:, i]) for i in xrange(dim))
+            n_grads = np.sum(model.traj)/step_size
+            ess = n_samples/(2.*tau)/n_grads
+            if ess > best[0]: best = (ess, step_size, model.p_acc)
+        
+        ess, step_size, p_acc = best
+        print '{:>22} {:>8} {:>10.3f} {:>8.2f} {:>10.2e}'.format(name, adapt_mass or 'unit',
+            step_size, p_acc, ess)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+import numpy as np
+
+from models import Basic_HMC, Basic_RMHMC
+from hmc.potentials import Mexican_Hat, Ring_Potential
+
+# effective samples per second of HMC and RMHMC with the SoftAbs metric
+# on the curved two dimensional targets. The best step size from a scan
+# is used for each. RMHMC costs an eigendecomposition per metric and
+# finite differences for its derivatives so it must more than make up
+# for this in the number of effective samples
+n_samples = 2000
+n_burn_in = 200
+n_steps   = 10
+np.seterr(over='ignore', invalid='ignore') # unstable step sizes diverge
+
+def itau(obs, c=6.):
+    """Integrated autocorrelation time with the self consistent window W >= c tau"""
+    f = obs - obs.mean()
+    n = f.size
+    ft = np.fft.rfft(f, 2*n)
+    acorr = np.fft.irfft(ft*ft.conj())[:n]
+    if acorr[0] == 0: return np.inf # every move rejected
+    taus = .5 + np.cumsum(acorr[1:]/acorr[0])
+    w = next(w for w in xrange(1, n) if w >= c*taus[w-1])
+    return max(taus[w-1], .5)
+
+targets = [
+    ('Mexican Hat', Mexican_Hat(), np.asarray([[1.2], [0.]]),
+        np.geomspace(.02, .4, 6), [.05, .1, .2]),
+    ('Ring', Ring_Potential(), np.asarray([[7.], [0.]]),
+        np.geomspace(.1, 2., 6), [.5, 1., 2.])
+    ]
+
+print '{:>12} {:>6} {:>10} {:>8} {:>8} {:>10}'.format('target', 'model', 'step size',
+    'p_acc', 'tau', 'ESS/sec')
+for name, pot, x0, hmc_steps, rmhmc_steps in targets:
+    for label, Model, step_sizes in [('HMC', Basic_HMC, hmc_steps),
+            ('RMHMC', Basic_RMHMC, rmhmc_steps)]:
+        best = (0., None, None, None)
+        for step_size in step_sizes:
+            kwargs = {'rand_steps':True} if Model is Basic_HMC else {}
+            model = Model(x0, pot, step_size=step_size, n_steps=n_steps,
+                rng=np.random.RandomState(1234), **kwargs)
+            start = time.time()
+            try:
+                model.run(n_samples=n_samples, n_burn_in=n_burn_in)
+            except ValueError: # the trajectories diverged to nan
+                continue
+            elapsed = time.time() - start
+            
+            # the worst of the coordinates and the radius
+            obs = [model.samples[:, 0], model.samples[:, 1], (model.samples**2).sum(axis=1)]
+            tau = max(itau(o) for o in obs)
+            ess = n_samples/(2.*tau)/elapsed
+            if ess > best[0]: best = (ess, step_size, model.p_acc, tau)
+        
+        ess, step_size, p_acc, tau = best
+        print '{:>12} {:>6} {:>10.3f} {:>8.2f} {:>8.1f} {:>10.2f}'.format(name, label,
+            step_size, p_acc, tau, ess)
@@ -62,17 +62,15 @@ def getPotential(potFn, n_points=100):
         n_points :: int :: defines the resolution
     
     Expected
-        potFn takes a 1x2 column matrix in and returns a point
+        potFn takes a 2xn array of column vectors and returns n points
     """
     
     n_points = 100    # n**2 is the number of points
     x = np.linspace(-5., 5., n_points, endpoint=True)
     x,y = np.meshgrid(x, x)
     
-    z = np.exp( -np.asarray(
-            [ model.sampler.potential.uE(np.matrix([[i], [j]])) \
-              for i,j in zip(np.ravel(x), np.ravel(y))]
-            ))
+    # evaluate the whole grid as one batch of column vectors
+    z = np.exp(-potFn(np.vstack([np.ravel(x), np.ravel(y)])))
     z = np.asarray(z).reshape(n_points, n_points)
     return x,y,z
 #
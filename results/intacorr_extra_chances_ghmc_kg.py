@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from models import Basic_GHMC
+from hmc.potentials import Klein_Gordon as KG
+
+# the cost per independent sample, 2 tau_int x gradients per move, of
+# GHMC with partial momentum refreshment and up to K extra chances for
+# the rejected trajectories. A rejection reverses the momentum and
+# undoes the persistence of the partial refresh so recovering it with
+# the extra segments can pay for their gradients
+n, mu      = 16, 1.
+n_steps    = 5
+angle      = .3
+n_samples  = 20000
+n_burn_in  = 1000
+step_sizes = [.4, .6, .7]
+chances    = [0, 1, 3]
+
+def itau(obs, c=6.):
+    """Integrated autocorrelation time with the self consistent window W >= c tau"""
+    f = obs - obs.mean()
+    n = f.size
+    ft = np.fft.rfft(f, 2*n)
+    acorr = np.fft.irfft(ft*ft.conj())[:n]
+    if acorr[0] == 0: return np.inf # every move rejected
+    taus = .5 + np.cumsum(acorr[1:]/acorr[0])
+    w = next(w for w in xrange(1, n) if w >= c*taus[w-1])
+    return max(taus[w-1], .5)
+
+print '{:>9} {:>3} {:>8} {:>8} {:>9} {:>9} {:>11} {:>11}'.format('step size', 'K', 'accepted',
+    'extra', 'grad/move', 'tau x^2', 'cost x^2', 'cost M')
+for step_size in step_sizes:
+    for k in chances:
+        model = Basic_GHMC(np.zeros(n), KG(m=mu), step_size=step_size, n_steps=n_steps,
+            rng=np.random.RandomState(1234), extra_chances=k)
+        model.run(n_samples=n_samples, n_burn_in=n_burn_in, mixing_angle=angle)
+        
+        grads = model.traj.sum()/step_size/n_samples
+        accepted = np.mean(np.any(model.samples[1:] != model.samples[:-1], axis=1))
+        extra = np.mean(model.sampler.extra_segments) if k else 0.
+        x2 = (model.samples**2).mean(axis=1)
+        mag = model.samples.mean(axis=1)
+        tau_x2, tau_mag = itau(x2), itau(mag)
+        print '{:>9.2f} {:>3} {:>8.2f} {:>8.2f} {:>9.2f} {:>9.1f} {:>11.1f} {:>11.1f}'.format(
+            step_size, k, accepted, extra, grads, tau_x2, 2*tau_x2*grads, 2*tau_mag*grads)
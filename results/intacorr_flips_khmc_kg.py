@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from models import Basic_KHMC
+from hmc.potentials import Klein_Gordon as KG
+
+# the cost per independent sample, 2 tau_int x gradients per move, of
+# single step GHMC (KHMC) with the standard acceptance and flips, the
+# lifted non-reversible acceptance and the reduced flips over a sweep
+# of mixing angles. The step size is large enough that rejections and
+# so the momentum reversals are frequent
+n, mu      = 16, 1.
+step_size  = .6
+n_samples  = 50000
+n_burn_in  = 1000
+angles     = [.1, .3, .6]
+schemes    = [
+    ('standard', {}),
+    ('lifted .1', {'acceptance':'lifted', 'lift_delta':.1}),
+    ('lifted .02', {'acceptance':'lifted', 'lift_delta':.02}),
+    ('reduced', {'flip':'reduced'})
+    ]
+
+def itau(obs, c=6.):
+    """Integrated autocorrelation time with the self consistent window W >= c tau"""
+    f = obs - obs.mean()
+    n = f.size
+    ft = np.fft.rfft(f, 2*n)
+    acorr = np.fft.irfft(ft*ft.conj())[:n]
+    if acorr[0] == 0: return np.inf # every move rejected
+    taus = .5 + np.cumsum(acorr[1:]/acorr[0])
+    w = next(w for w in xrange(1, n) if w >= c*taus[w-1])
+    return max(taus[w-1], .5)
+
+print '{:>6} {:>11} {:>6} {:>9} {:>9} {:>11} {:>11}'.format('angle', 'scheme', 'p_acc',
+    'grad/move', 'tau x^2', 'cost x^2', 'cost M')
+for angle in angles:
+    for name, scheme in schemes:
+        model = Basic_KHMC(np.zeros(n), KG(m=mu), step_size=step_size,
+            rng=np.random.RandomState(1234), **scheme)
+        model.run(n_samples=n_samples, n_burn_in=n_burn_in, mixing_angle=angle)
+        
+        grads = model.traj.sum()/step_size/n_samples
+        x2 = (model.samples**2).mean(axis=1)
+        mag = model.samples.mean(axis=1)
+        tau_x2, tau_mag = itau(x2), itau(mag)
+        print '{:>6.2f} {:>11} {:>6.2f} {:>9.2f} {:>9.1f} {:>11.1f} {:>11.1f}'.format(angle, name,
+            model.p_acc, grads, tau_x2, 2*tau_x2*grads, 2*tau_mag*grads)
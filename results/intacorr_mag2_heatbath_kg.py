@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*- 
+import numpy as np
+
+from models import Basic_GHMC, Basic_Heatbath
+from hmc.potentials import Klein_Gordon as KG
+from correlations.errors import uWerr
+from theory.operators import magnetisation_sq
+
+# cost per independent sample in gradient evaluations of the free field
+n, dim    = 8, 2
+spacing   = 1.
+m         = .1
+n_samples = 20000
+n_burn_in = 200
+
+pot = KG(m=m)
+x0 = np.zeros((n,)*dim)
+
+print '{:>22} {:>14} {:>14} {:>10}'.format('sampler', 'tau_int(M^2)', 'forces/sample', 'cost')
+runs = [('GHMC', Basic_GHMC(x0, pot, spacing=spacing, step_size=.2, n_steps=10), 10)]
+for n_overrelax in [0, 1, 3]:
+    # two sublattice gradients per sweep
+    runs.append(('heatbath + {} OR'.format(n_overrelax),
+        Basic_Heatbath(x0, pot, spacing=spacing, n_overrelax=n_overrelax), 2*(1 + n_overrelax)))
+
+for name, model, forces in runs:
+    model.run(n_samples=n_samples, n_burn_in=n_burn_in, mixing_angle=.5*np.pi)
+    itau, itau_diff = uWerr(magnetisation_sq(
+        np.asarray(model.samples).reshape(n_samples+1, -1)))[3:5]
+    print '{:>22} {:>14} {:>14} {:>10.1f}'.format(name,
+        '{:.2f} +/- {:.2f}'.format(itau, itau_diff), forces, 2*itau*forces)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*- 
+import numpy as np
+
+from hmc.lattice import Periodic_Lattice
+from hmc.dynamics import Leap_Frog
+from hmc.hmc import Hybrid_Monte_Carlo
+from hmc.multilevel import Multilevel_HMC
+from hmc.potentials import Klein_Gordon as KG
+from correlations.errors import uWerr
+from theory.operators import magnetisation_sq
+
+# small mass free field in 2D: the magnetisation is the slowest mode
+m, dim    = 0.05, 2
+step_size = .1
+n_steps   = 20
+n_samples = 20000
+n_burn_in = 200
+
+print 'cost per independent sample: 2 tau_int(M^2) x force evaluations per move'
+print '{:>4} {:>7} {:>14} {:>12} {:>10}'.format('L', 'levels', 'tau_int', 'forces/move', 'cost')
+for n in [8, 16, 32]:
+    pot = KG(m=m)
+    x0 = Periodic_Lattice(np.zeros((n,)*dim), lattice_spacing=1.)
+    max_levels = int(np.log2(n))
+    
+    for n_levels in [1, max_levels]:
+        rng = np.random.RandomState(1234)
+        lf = Leap_Frog(duE=pot.duE, step_size=step_size, n_steps=n_steps)
+        if n_levels == 1:
+            sampler = Hybrid_Monte_Carlo(x0, lf, pot, rng)
+        else:
+            sampler = Multilevel_HMC(x0, lf, pot, rng, n_levels=n_levels)
+        sampler.sample(n_samples=n_samples, n_burn_in=n_burn_in)
+        
+        mag_sq = magnetisation_sq(np.asarray(sampler.samples).reshape(n_samples+1, -1))
+        itau, itau_diff = uWerr(mag_sq)[3:5]
+        forces = np.mean(sampler.samples_traj[1:])
+        print '{:>4} {:>7} {:>14} {:>12.0f} {:>10.0f}'.format(n, n_levels,
+            '{:.1f} +/- {:.1f}'.format(itau, itau_diff), forces, 2*itau*forces)
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*- 
+import numpy as np
+
+from models import Basic_GHMC
+from hmc.potentials import Phi4_Hopping
+from hmc.cluster import Embedded_Wolff
+
+# 2D phi^4 just inside the broken phase: the sign of the
+# magnetisation tunnels very slowly under the HMC dynamics
+n, dim    = 8, 2
+kappa     = .33
+lam       = 1.
+n_samples = 50000
+n_burn_in = 500
+
+def itau(obs, c=6.):
+    """Integrated autocorrelation time with the self consistent window W >= c tau
+    
+    uWerr is not used as its bias correction fails for tau ~ n/100
+    """
+    f = obs - obs.mean()
+    n = f.size
+    ft = np.fft.rfft(f, 2*n)
+    acorr = np.fft.irfft(ft*ft.conj())[:n]
+    taus = .5 + np.cumsum(acorr[1:]/acorr[0])
+    w = next(w for w in xrange(1, n) if w >= c*taus[w-1])
+    return taus[w-1]
+
+print '{:>18} {:>12} {:>16} {:>12}'.format('sampler', 'tau_int(M)', 'tau_int(|M|^2)', 'cluster/V')
+for cluster_every in [None, 5, 1]:
+    rng = np.random.RandomState(1234)
+    pot = Phi4_Hopping(kappa=kappa, lam=lam)
+    model = Basic_GHMC(np.ones((n,)*dim), pot, step_size=.1, n_steps=10, rng=rng)
+    
+    if cluster_every is None:
+        name, wolff, kwargs = 'GHMC', None, {}
+    else:
+        name = 'GHMC + Wolff/{}'.format(cluster_every)
+        wolff = Embedded_Wolff(pot, rng)
+        kwargs = {'cluster_update':wolff, 'cluster_every':cluster_every}
+    model.run(n_samples=n_samples, n_burn_in=n_burn_in, **kwargs)
+    
+    mag = model.samples.mean(axis=1)
+    size = np.mean(wolff.cluster_sizes)/n**dim if wolff else 0.
+    print '{:>18} {:>12.1f} {:>16.1f} {:>12.2f}'.format(name, itau(mag), itau(mag**2), size)
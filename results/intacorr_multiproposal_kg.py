@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from models import Basic_GHMC
+from hmc.lattice import Periodic_Lattice
+from hmc.potentials import Klein_Gordon as KG
+from hmc.multiproposal import Multiple_Proposal_HMC
+
+# the asymptotic variance per iteration, 2 tau_int var, of one GHMC
+# chain and of the multiple proposal sampler with P arms, from its
+# chain and from the weighted candidates, relative to that of GHMC.
+# With P cores an iteration costs two trajectories of wall clock time:
+# the base then the arms in parallel, so the wall clock cost relative
+# to GHMC is twice the relative variance
+n, mu      = 16, 1.
+step_size  = .6
+n_steps    = 3
+angle      = .5
+n_samples  = 20000
+n_burn_in  = 500
+arms       = [1, 2, 4, 8]
+
+def itau(obs, c=6.):
+    """Integrated autocorrelation time with the self consistent window W >= c tau"""
+    f = obs - obs.mean()
+    n = f.size
+    ft = np.fft.rfft(f, 2*n)
+    acorr = np.fft.irfft(ft*ft.conj())[:n]
+    if acorr[0] == 0: return np.inf # every move rejected
+    taus = .5 + np.cumsum(acorr[1:]/acorr[0])
+    w = next(w for w in xrange(1, n) if w >= c*taus[w-1])
+    return max(taus[w-1], .5)
+
+x2 = lambda c: (c**2).mean(axis=1)
+mag2 = lambda c: c.mean(axis=1)**2
+
+def variance(series):
+    series = np.asarray(series)
+    return 2*itau(series)*series.var()
+
+print '{:>9} {:>6} {:>7} {:>9} {:>9} {:>9} {:>9} {:>9}'.format('sampler', 'moves', 'tau x^2',
+    'var x^2', 'var M^2', 'w var x^2', 'w var M^2', 'wall x^2')
+model = Basic_GHMC(np.zeros(n), KG(m=mu), step_size=step_size, n_steps=n_steps,
+    rng=np.random.RandomState(1234))
+model.run(n_samples=n_samples, n_burn_in=n_burn_in, mixing_angle=angle)
+ref = variance(x2(model.samples)), variance(mag2(model.samples))
+print '{:>9} {:>6.2f} {:>7.1f} {:>9.2f} {:>9.2f}'.format('GHMC', model.p_acc,
+    itau(x2(model.samples)), 1., 1.)
+
+for n_proposals in arms:
+    sampler = Multiple_Proposal_HMC(Periodic_Lattice(np.zeros(n)), KG(m=mu),
+        np.random.RandomState(1234), n_proposals=n_proposals, step_size=step_size,
+        n_steps=n_steps, arm_angle=.5*np.pi)
+    sampler.sample(n_samples=n_samples, n_burn_in=n_burn_in, mixing_angle=angle)
+    sampler.close()
+    
+    samples = np.asarray(sampler.samples).reshape(n_samples + 1, -1)
+    rel = [variance(x2(samples))/ref[0], variance(mag2(samples))/ref[1],
+        variance(sampler.weightedSeries(x2))/ref[0], variance(sampler.weightedSeries(mag2))/ref[1]]
+    print '{:>9} {:>6.2f} {:>7.1f} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.2f}'.format(
+        'MP P={}'.format(n_proposals), np.mean(sampler.accept_rates), itau(x2(samples)),
+        *(rel + [2*rel[2]]))
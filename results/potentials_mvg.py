@@ -59,10 +59,9 @@ if __name__ == '__main__':
     x,y = np.meshgrid(x,x)
     
     # ravel() flattens the arrays into 1D vectors
-    # and then they are passed as (x,y) components to the
-    # potential term to form z = f(x,y)
-    z = np.exp(-np.asarray([bg.uE(np.matrix([[i],[j]])) \
-        for i,j in zip(np.ravel(x), np.ravel(y))]))
+    # and then they are passed as a batch of (x,y) column vectors
+    # to the potential term to form z = f(x,y) in one call
+    z = np.exp(-bg.uE(np.vstack([np.ravel(x), np.ravel(y)])))
     
     # reshape back into an NxN
     z = np.asarray(z).reshape(n, n)
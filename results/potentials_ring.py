@@ -46,13 +46,9 @@ if __name__ == '__main__':
     x = np.linspace(-10., 10., n, endpoint=True)
     x,y = np.meshgrid(x,x)
     
-    # ravel() flattens the arrays into 1D vectors
-    # and then they are passed as (x,y) components to the
-    # potential term to form z = f(x,y)
-    z = [np.exp(-pot.uE(np.asarray([[i],[j]]))) for i,j in zip(np.ravel(x), np.ravel(y))]
-    
-    # reshape back into an NxN
-    z = np.asarray(z).reshape(n, n)
+    # the (x,y) grids are passed as a single batch with the
+    # components in axis 0 to form z = f(x,y) in one call
+    z = np.exp(-pot.uE(np.asarray([x,y])))
     print "Finished Running Model: {}".format(__file__)
     
     f_name = os.path.basename(__file__)
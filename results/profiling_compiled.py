@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*- 
+import numpy as np
+from timeit import default_timer as timer
+
+from hmc import potentials
+from hmc.lattice import Periodic_Lattice
+from hmc.dynamics import Leap_Frog
+from hmc.potentials import Klein_Gordon as KG
+
+# build the kernels first with: cd hmc; python setup.py build_ext --inplace
+if potentials.clibs is None: raise ImportError('hmc/clibs.pyx is not built')
+
+def best(fn, repeats=5):
+    """best wall time of fn() over repeats"""
+    times = []
+    for _ in range(repeats):
+        start = timer()
+        fn()
+        times.append(timer() - start)
+    return min(times)
+
+step_size = .1
+n_steps   = 20
+kwargs    = {'m':1., 'phi_4':.5}
+
+print '{:>14} {:>10} {:>10} {:>10} {:>10} {:>10} {:>10}'.format('lattice',
+    'action np', 'compiled', 'force np', 'compiled', 'traj np', 'compiled')
+for n, dim in [(100, 1), (32, 2), (64, 2), (16, 3), (8, 4), (16, 4)]:
+    x = Periodic_Lattice(np.random.randn(*(n,)*dim))
+    p = np.random.randn(*(n,)*dim)
+    
+    times = []
+    for compiled in [False, True]:
+        pot = KG(compiled=compiled, **kwargs)
+        lf = Leap_Frog(duE=pot.duE, step_size=step_size, n_steps=n_steps,
+            trajectory=pot.trajectory)
+        times.append([best(lambda: pot.uE(x)), best(lambda: pot.duE(x)),
+            best(lambda: lf.integrate(p.copy(), x.copy()))])
+    
+    times = np.asarray(times).T.ravel()
+    speedup = times[::2]/times[1::2]
+    print '{:>14} '.format('{}^{}'.format(n, dim)) \
+        + ' '.join('{:10.2e}'.format(t) for t in times) \
+        + '   speedup: ' + ', '.join('{:.1f}x'.format(s) for s in speedup)
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*- 
+import numpy as np
+from multiprocessing import cpu_count
+from timeit import default_timer as timer
+
+from hmc import potentials
+from hmc.lattice import Periodic_Lattice
+from hmc.potentials import Klein_Gordon as KG
+
+def best(fn, repeats=5):
+    """best wall time of fn() over repeats"""
+    times = []
+    for _ in range(repeats):
+        start = timer()
+        fn()
+        times.append(timer() - start)
+    return min(times)
+
+kwargs = {'m':1., 'phi_4':.5}
+threads = [1] + [n for n in [2, 4, 8, 16, 32] if n <= cpu_count()]
+
+print 'compiled kernels: {}, cores: {}'.format(potentials.clibs is not None, cpu_count())
+for shape in [(64,)*3, (32,)*4, (100,)*3]:
+    x = Periodic_Lattice(np.random.randn(*shape))
+    print '\nlattice: {}, sites: {}'.format(shape, x.size)
+    print '{:>8} {:>10} {:>10} {:>10}'.format('threads', 'action', 'force', 'speedup')
+    for n_threads in threads:
+        pot = KG(n_threads=n_threads, **kwargs)
+        action, force = best(lambda: pot.uE(x)), best(lambda: pot.duE(x))
+        if n_threads == 1: serial = force
+        print '{:>8} {:10.2e} {:10.2e} {:>9.1f}x'.format(n_threads, action, force, serial/force)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+import numpy as np
+
+from models import Basic_GHMC
+from hmc.potentials import Klein_Gordon as KG
+from correlations.reweight import Multi_Ensemble, chainTerms, chainCoefficients
+
+# <x^2> of the 1D phi^4 theory over a scan of the coupling from GHMC
+# chains at three couplings pooled by multi-ensemble reweighting. The
+# points between the chains are checked against direct runs
+n, mu      = 16, 1.
+step_size  = .3
+n_steps    = 5
+n_samples  = 20000
+n_burn_in  = 500
+couplings  = [0., .5, 1.]
+scan       = np.linspace(0., 1., 11)
+checks     = [.3, .7]
+
+def run(phi_4):
+    """The samples and <x^2> series of a GHMC chain"""
+    model = Basic_GHMC(np.zeros(n), KG(m=mu, phi_4=phi_4), step_size=step_size,
+        n_steps=n_steps, rng=np.random.RandomState(1234))
+    model.run(n_samples=n_samples, n_burn_in=n_burn_in, mixing_angle=.5*np.pi)
+    return model.samples, (model.samples**2).mean(axis=1)
+
+start = time.time()
+terms, coefficients, x2 = [], [], []
+for phi_4 in couplings:
+    samples, obs = run(phi_4)
+    terms.append(chainTerms(KG(m=mu, phi_4=phi_4), samples))
+    coefficients.append(chainCoefficients(KG(m=mu, phi_4=phi_4), (n,)))
+    x2.append(obs)
+runs = time.time() - start
+
+start = time.time()
+ensemble = Multi_Ensemble(terms, coefficients)
+c = np.array([chainCoefficients(KG(m=mu, phi_4=phi_4), (n,)) for phi_4 in scan])
+xx, err = ensemble.errors(x2, c)
+post = time.time() - start
+
+print 'runs: {:.1f} s, reweighting {} points: {:.1f} s'.format(runs, scan.size, post)
+print '{:>6} {:>18} {:>18}'.format('phi_4', 'reweighted <x^2>', 'direct <x^2>')
+for phi_4, xx_i, err_i in zip(scan, xx, err):
+    direct = ''
+    if np.any(np.isclose(phi_4, checks)):
+        bins = run(phi_4)[1][1:].reshape(20, -1).mean(axis=1)
+        direct = '{:.4f} +/- {:.4f}'.format(bins.mean(), bins.std()/np.sqrt(bins.size - 1.))
+    print '{:>6.2f} {:>18} {:>18}'.format(phi_4, '{:.4f} +/- {:.4f}'.format(xx_i, err_i), direct)
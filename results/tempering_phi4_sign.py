@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*- 
+import numpy as np
+
+from models import Basic_GHMC
+from hmc.potentials import Phi4_Hopping
+from hmc.tempering import Replica_Exchange
+
+# 2D phi^4 deep in the broken phase: a single GHMC chain never changes
+# the sign of the magnetisation while <M> = 0 by symmetry
+n, dim    = 8, 2
+kappa     = .4
+lam       = 1.
+n_samples = 20000
+n_burn_in = 2000
+
+pot = Phi4_Hopping(kappa=kappa, lam=lam)
+x0 = np.ones((n,)*dim)
+
+def report(name, samples, extra=''):
+    mag = np.asarray(samples).reshape(len(samples), -1).mean(axis=1)
+    flips = np.sum(np.diff(np.sign(mag)) != 0)
+    print '{:>24} {:>8.3f} {:>8.3f} {:>8} {}'.format(name, mag.mean(), np.abs(mag).mean(), flips, extra)
+
+print '{:>24} {:>8} {:>8} {:>8}'.format('sampler', '<M>', '<|M|>', 'flips')
+model = Basic_GHMC(x0, pot, step_size=.1, n_steps=10, rng=np.random.RandomState(1234))
+model.run(n_samples=n_samples, n_burn_in=n_burn_in)
+report('GHMC', model.samples)
+
+for n_replicas, adapt_ladder in [(4, False), (4, True), (8, True)]:
+    sampler = Replica_Exchange(x0, pot, np.random.RandomState(1234), n_replicas=n_replicas,
+        beta_min=.4, step_size=.1, n_steps=10, swap_every=5, adapt_ladder=adapt_ladder)
+    sampler.sample(n_samples=n_samples, n_burn_in=n_burn_in)
+    sampler.close()
+    
+    name = 'PT {} replicas{}'.format(n_replicas, ' adapted' if adapt_ladder else '')
+    trips = np.mean(sampler.round_trips) if sampler.round_trips else np.nan
+    report(name, sampler.samples, 'swap rates: {} round trip: {:.0f} moves'.format(
+        np.around(sampler.swap_rates, 2), trips))
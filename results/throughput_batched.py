@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+import numpy as np
+
+from models import Basic_GHMC, Basic_Batched_GHMC
+from hmc.potentials import Klein_Gordon as KG
+from hmc.potentials import Batched_Klein_Gordon as Batched_KG
+
+# wall clock time of a mixing angle sweep of the KHMC autocorrelation
+# scripts (1D free field n=20, one step of .1) as one model per angle
+# in this process and as one batched run with a chain per angle
+n          = 20
+step_size  = .1
+n_steps    = 1
+n_samples  = 5000
+n_burn_in  = 20
+
+x0 = np.random.RandomState(1234).random_sample(n)
+
+print '{:>7} {:>11} {:>11} {:>9}'.format('angles', 'models (s)', 'batched (s)', 'speed up')
+for points in [16, 32, 64]:
+    angles = np.pi*np.linspace(.005, .1, points)
+    
+    start = time.time()
+    for angle in angles:
+        model = Basic_GHMC(x0, KG(), step_size=step_size, n_steps=n_steps,
+            rng=np.random.RandomState(1234))
+        model.run(n_samples=n_samples, n_burn_in=n_burn_in, mixing_angle=angle)
+    serial = time.time() - start
+    
+    start = time.time()
+    model = Basic_Batched_GHMC(np.tile(x0, (points, 1)), Batched_KG(), step_size=step_size,
+        n_steps=n_steps, rng=np.random.RandomState(1234))
+    model.run(n_samples=n_samples, n_burn_in=n_burn_in, mixing_angle=angles)
+    batched = time.time() - start
+    
+    print '{:>7} {:>11.2f} {:>11.2f} {:>9.1f}'.format(points, serial, batched, serial/batched)
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+import numpy as np
+
+from models import Basic_HMC, Basic_KHMC
+from hmc.potentials import Klein_Gordon as KG
+from hmc.potentials import Simple_Harmonic_Oscillator as SHO
+
+# moves per second of the Python moves and of the compiled blocks on
+# the tiny lattice of profiling.py where the Python overhead dominates
+n_samples  = 20000
+n_burn_in  = 50
+block_size = 1000
+
+x0 = np.random.RandomState(1234).random_sample(10)
+runs = [
+    ('HMC  KG  n=10', Basic_HMC, KG(m=0.), x0, {'step_size':.2, 'n_steps':20}),
+    ('KHMC KG  n=10', Basic_KHMC, KG(m=0.), x0, {'step_size':.2}),
+    ('HMC  SHO', Basic_HMC, SHO(), np.ones((1, 1)), {'step_size':.2, 'n_steps':20})
+    ]
+
+print '{:>14} {:>12} {:>12} {:>8}'.format('model', 'python /s', 'blocks /s', 'speed up')
+for name, Model, pot, x, kwargs in runs:
+    rates = []
+    for size in [None, block_size]:
+        model = Model(x.copy(), pot, rng=np.random.RandomState(1234), block_size=size, **kwargs)
+        start = time.time()
+        model.run(n_samples=n_samples, n_burn_in=n_burn_in, mixing_angle=.5)
+        rates.append((n_samples + n_burn_in)/(time.time() - start))
+    print '{:>14} {:>12.0f} {:>12.0f} {:>8.1f}'.format(name, rates[0], rates[1], rates[1]/rates[0])
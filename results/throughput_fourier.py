@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+import numpy as np
+
+from models import Basic_GHMC, Basic_Fourier
+from hmc.potentials import Klein_Gordon as KG
+import theory.operators
+
+# wall clock time and error of <x^2> for the 1D free field validation
+# runs from the exact Fourier space draws against a GHMC chain of the
+# same number of samples. The error of the chain includes its
+# integrated autocorrelation time
+n, mu, spacing = 64, 1., .1
+step_size      = .1
+n_steps        = 10
+n_samples      = 20000
+n_burn_in      = 500
+
+def itau(obs, c=6.):
+    """Integrated autocorrelation time with the self consistent window W >= c tau"""
+    f = obs - obs.mean()
+    n = f.size
+    ft = np.fft.rfft(f, 2*n)
+    acorr = np.fft.irfft(ft*ft.conj())[:n]
+    taus = .5 + np.cumsum(acorr[1:]/acorr[0])
+    w = next(w for w in xrange(1, n) if w >= c*taus[w-1])
+    return max(taus[w-1], .5)
+
+act_xx = theory.operators.x2_1df(mu, n, spacing, 0)
+models = [
+    ('ghmc', lambda: Basic_GHMC(np.zeros(n), KG(m=mu), step_size=step_size, n_steps=n_steps,
+        spacing=spacing, rng=np.random.RandomState(1234)), {'mixing_angle':.5*np.pi}),
+    ('fourier', lambda: Basic_Fourier(np.zeros(n), KG(m=mu), spacing=spacing,
+        rng=np.random.RandomState(1234)), {})
+    ]
+
+print 'exact <x^2>: {:.5f}'.format(act_xx)
+print '{:>8} {:>9} {:>9} {:>8} {:>9}'.format('sampler', 'time (s)', '<x^2>', 'tau', 'error')
+for name, model, kwargs in models:
+    start = time.time()
+    model = model()
+    model.run(n_samples=n_samples, n_burn_in=n_burn_in, **kwargs)
+    elapsed = time.time() - start
+    
+    x2 = (model.samples**2).mean(axis=1)
+    tau = itau(x2)
+    err = x2.std()*np.sqrt(2*tau/x2.size)
+    print '{:>8} {:>9.3f} {:>9.5f} {:>8.2f} {:>9.5f}'.format(name, elapsed, x2.mean(), tau, err)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+import numpy as np
+
+from models import Basic_HMC
+from hmc.potentials import Klein_Gordon as KG
+
+# moves committed per round of the speculative GHMC over the step sizes
+# of the optimalParams scans. A round with speculate = D integrates D + 1
+# trajectories in parallel and commits one move more than the run of
+# rejections it starts with, so with D + 1 cores the moves per round is
+# the wall clock speed up over the serial chain. The measured rate of
+# D = 3 depends on the cores of the host
+n, dim     = 16, 2
+n_steps    = 20
+n_samples  = 2000
+n_burn_in  = 50
+step_sizes = [.1, .2, .3, .35]
+depths     = [1, 3, 7]
+
+x0 = np.random.RandomState(1234).randn(*(n,)*dim)
+
+print '{:>9} {:>6} {:>10} {:>9}'.format('step size', 'p_acc', 'serial /s', 'D=3 /s') \
+    + ''.join(' {:>6}'.format('D={}'.format(d)) for d in depths)
+for step_size in step_sizes:
+    model = Basic_HMC(x0, KG(m=1.), step_size=step_size, n_steps=n_steps,
+        rng=np.random.RandomState(1234))
+    start = time.time()
+    model.run(n_samples=n_samples, n_burn_in=n_burn_in)
+    rate = (n_samples + n_burn_in)/(time.time() - start)
+    
+    speculative = Basic_HMC(x0, KG(m=1.), step_size=step_size, n_steps=n_steps,
+        rng=np.random.RandomState(1234), speculate=3)
+    start = time.time()
+    speculative.run(n_samples=n_samples, n_burn_in=n_burn_in)
+    rate_spec = (n_samples + n_burn_in)/(time.time() - start)
+    assert np.array_equal(model.samples, speculative.samples)
+    
+    # the rounds of the same chain follow from its rejections: a round
+    # with depth D starting at move t commits the moves up to the first
+    # acceptance in t, ..., t + D
+    accepts = np.any(model.samples[1:] != model.samples[:-1], axis=1)
+    per_round = []
+    for depth in depths:
+        t, rounds = 0, 0
+        while t < accepts.size:
+            window = accepts[t:t + depth + 1]
+            t += np.argmax(window) + 1 if window.any() else window.size
+            rounds += 1
+        per_round.append(accepts.size/float(rounds))
+    print '{:>9.2f} {:>6.2f} {:>10.1f} {:>9.1f}'.format(step_size, model.p_acc, rate, rate_spec) \
+        + ''.join(' {:>6.2f}'.format(r) for r in per_round)
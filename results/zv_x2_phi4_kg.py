@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from models import Basic_GHMC
+from hmc.potentials import Klein_Gordon as KG
+from correlations.controls import Zero_Variance, chainForces
+from correlations.errors import uWerr
+import theory.operators
+
+# the errors of <x^2> and <M^2> for the 1D phi^4 theory from a GHMC
+# chain with and without the zero-variance control variates. The
+# saving is the factor fewer samples needed for the same error
+n, mu, phi_4 = 16, 1., 1.
+step_size    = .2
+n_steps      = 10
+n_samples    = 20000
+n_burn_in    = 500
+
+pot = KG(m=mu, phi_4=phi_4)
+model = Basic_GHMC(np.zeros(n), pot, step_size=step_size, n_steps=n_steps,
+    rand_steps=True, rng=np.random.RandomState(1234))
+model.run(n_samples=n_samples, n_burn_in=n_burn_in, mixing_angle=.5*np.pi)
+forces = chainForces(pot, model.samples)
+
+observables = [
+    ('<x^2>', theory.operators.x_sq(model.samples).mean(axis=1)),
+    ('<M^2>', theory.operators.magnetisation_sq(model.samples))
+    ]
+print '{:>6} {:>12} {:>20} {:>20} {:>8}'.format('obs', 'controls', 'plain', 'reduced', 'saving')
+for name, f in observables:
+    plain, plain_err = uWerr(f)[:2]
+    for family in [None, 'all']:
+        value, err = Zero_Variance(model.samples, forces, separations=family).uWerr(f)[:2]
+        print '{:>6} {:>12} {:>20} {:>20} {:>8.1f}'.format(name, family or 'default',
+            '{:.5f} +/- {:.5f}'.format(plain, plain_err),
+            '{:.5f} +/- {:.5f}'.format(value, err), (plain_err/err)**2)
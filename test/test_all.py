@@ -15,6 +15,20 @@ import test_dynamics
 import test_hmc
 import test_lattice
 import test_momentum
+import test_distributed
+import test_heatbath
+import test_fourier
+import test_reweight
+import test_errors
+import test_controls
+import test_cluster
+import test_tempering
+import test_mass
+import test_riemannian
+import test_blocks
+import test_multiproposal
+import test_speculative
+import test_batched
 import test_expect
 import test_autocorrelations
 
@@ -45,7 +59,17 @@ def testExpectations():
 def testPotentials():
     test = test_potentials.Test()
     utils.newTest(test.id)
+    assert test.fastLaplacian()
+    assert test.gradients()
+    assert test.kgForce()
     assert test.bvg()
+    assert test.mvgCholesky()
+    assert test.batched()
+    assert test.phi4Hopping()
+    assert test.u1Gauge()
+    assert test.oNScalar()
+    assert test.compiledKernels()
+    assert test.slabThreads()
     assert test.qho()
     pass
 
@@ -90,6 +114,7 @@ def testLattice():
     assert test.wrap(print_out = True)
     assert test.laplacian(print_out = True)
     assert test.gradSquared(print_out = True)
+    assert test.geometry(print_out = True)
     pass
 
 def testHMC():
@@ -102,6 +127,120 @@ def testHMC():
     # assert test.hmcSho1d(n_samples = 1000, n_burn_in = n_burn_in, tol = tol)
     # assert test.hmcGaus2d(n_samples = 10000, n_burn_in = n_burn_in, tol = tol)
     assert test.hmcQho(n_samples = 100, n_burn_in = n_burn_in, tol = tol)
+    assert test.singlePrecision(n_samples = 1000, n_burn_in = 20, tol = tol)
+    assert test.hmcPhi4(n_samples = 20000, n_burn_in = 500, tol = tol)
+    assert test.hmcU1(n_samples = 2000, n_burn_in = 200, tol = 1e-2)
+    assert test.hmcMultilevel(n_samples = 2000, n_burn_in = 100, tol = 5e-2)
+    assert test.hmcFlips(n_samples = 30000, n_burn_in = 500, tol = 5e-2)
+    assert test.hmcExtraChances(n_samples = 30000, n_burn_in = 500, tol = 5e-2)
+    pass
+
+def testDistributed():
+    test = test_distributed.Test(rng)
+    utils.newTest(test.id)
+    assert test.decomposition()
+    assert test.cooperativeHMC()
+    assert test.abort()
+    pass
+
+def testHeatbath():
+    test = test_heatbath.Test(rng)
+    utils.newTest(test.id)
+    assert test.precision()
+    assert test.freeField(n_samples = 10000, n_burn_in = 100, tol = 5e-2)
+    pass
+
+def testCluster():
+    test = test_cluster.Test(rng)
+    utils.newTest(test.id)
+    assert test.labels()
+    assert test.couplings()
+    assert test.freeField(n_samples = 10000, n_burn_in = 100, tol = 5e-2)
+    assert test.schedule()
+    pass
+
+def testTempering():
+    test = test_tempering.Test(rng)
+    utils.newTest(test.id)
+    assert test.tempered()
+    assert test.freeField(n_samples = 10000, n_burn_in = 1000, tol = 5e-2)
+    assert test.brokenPhase()
+    assert test.stepSizes()
+    assert test.failures()
+    pass
+
+def testMass():
+    test = test_mass.Test(rng)
+    utils.newTest(test.id)
+    assert test.welford()
+    assert test.massMatrix()
+    assert test.adaptation()
+    pass
+
+def testRiemannian():
+    test = test_riemannian.Test(rng)
+    utils.newTest(test.id)
+    assert test.metric()
+    assert test.reversibility()
+    assert test.exact()
+    pass
+
+def testBlocks():
+    test = test_blocks.Test(rng)
+    utils.newTest(test.id)
+    assert test.serial()
+    assert test.freeField()
+    assert test.options()
+    pass
+
+def testMultiproposal():
+    test = test_multiproposal.Test(rng)
+    utils.newTest(test.id)
+    assert test.workers()
+    assert test.failures()
+    assert test.freeField(n_samples = 10000, n_burn_in = 200, tol = 5e-2)
+    pass
+
+def testSpeculative():
+    test = test_speculative.Test(rng)
+    utils.newTest(test.id)
+    assert test.serial()
+    assert test.failures()
+    pass
+
+def testBatched():
+    test = test_batched.Test(rng)
+    utils.newTest(test.id)
+    assert test.potential()
+    assert test.freeField(n_samples = 20000, n_burn_in = 500, tol = 5e-2)
+    pass
+
+def testFourier():
+    test = test_fourier.Test(rng)
+    utils.newTest(test.id)
+    assert test.spectrum()
+    assert test.freeField()
+    pass
+
+def testReweight():
+    test = test_reweight.Test(rng)
+    utils.newTest(test.id)
+    assert test.decomposition()
+    assert test.freeField()
+    pass
+
+def testControls():
+    test = test_controls.Test(rng)
+    utils.newTest(test.id)
+    assert test.stein()
+    assert test.freeField()
+    pass
+
+def testErrors():
+    test = test_errors.Test(rng)
+    utils.newTest(test.id)
+    assert test.reference()
+    assert test.ar1()
     pass
 
 def testMomentum():
@@ -127,5 +266,19 @@ if __name__ == '__main__':
     testLattice()
     testHMC()
     testMomentum()
+    testDistributed()
+    testHeatbath()
+    testCluster()
+    testTempering()
+    testMass()
+    testRiemannian()
+    testBlocks()
+    testMultiproposal()
+    testSpeculative()
+    testBatched()
+    testFourier()
+    testReweight()
+    testErrors()
+    testControls()
     testAutocorrelations()
     pass
\ No newline at end of file
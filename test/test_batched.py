@@ -0,0 +1,110 @@
+import numpy as np
+
+import utils
+
+# these directories won't work unless
+# the commandline interface for python unittest is used
+from hmc.lattice import Periodic_Lattice
+from hmc.potentials import Klein_Gordon, Batched_Klein_Gordon
+from models import Basic_Batched_GHMC
+import theory.operators
+
+class Test(object):
+    """Tests for the batched parameter axis
+    
+    Required Inputs
+        rng :: np.random.RandomState :: random number generator
+    """
+    def __init__(self, rng):
+        self.id = 'batched chains'
+        self.rng = rng
+        pass
+    
+    def potential(self, tol = 1e-10, print_out = True):
+        """Checks the action and force of each chain against those of
+        Klein_Gordon with the couplings of the chain
+        
+        Optional Inputs
+            tol     ::  float   :: relative tolerance level allowed
+            print_out   :: bool     :: print results to screen
+        """
+        passed = True
+        m = np.asarray([.5, 1., 2., 1.])
+        phi_4 = np.asarray([0., 0., .5, 1.])
+        
+        details = {}
+        for shape, spacing in [((16,), 1.), ((6, 8), .5)]:
+            pot = Batched_Klein_Gordon(m = m, phi_4 = phi_4, spacing = spacing)
+            x = self.rng.randn(m.size, *shape)
+            p = self.rng.randn(m.size, *shape)
+            action, force = pot.uE(x), pot.duE(x)
+            
+            res = []
+            for b in xrange(m.size):
+                kg = Klein_Gordon(m = m[b], phi_4 = phi_4[b], compiled = False)
+                y = Periodic_Lattice(x[b].copy(), lattice_spacing = spacing)
+                res.append(np.abs(action[b]/kg.uE(y) - 1) <= tol
+                    and np.allclose(force[b], kg.duE(y), rtol = tol, atol = tol)
+                    and np.abs(pot.kE(p)[b] - kg.kE(p[b])) <= tol*kg.kE(p[b]))
+            passed *= all(res)
+            details['lattice {} spacing {}'.format(shape, spacing)] = [
+                'each chain matches: {}'.format(res)]
+        
+        if print_out:
+            utils.display("Batched Klein Gordon Potential", passed,
+                details = details)
+        
+        return passed
+    
+    def freeField(self, n_samples = 20000, n_burn_in = 500, tol = 5e-2, print_out = True):
+        """Samples the 1D free field at several masses, step sizes and
+        mixing angles in one run and compares <x^2> of each chain with
+        the exact result
+        
+        Optional Inputs
+            n_samples :: int    :: number of samples
+            n_burn_in :: int    :: number of burn in steps
+            tol     ::  float   :: relative tolerance level allowed
+            print_out   :: bool     :: print results to screen
+        """
+        n, spacing = 16, 1.
+        m = np.asarray([.5, 1., 1., 2.])
+        step_size = np.asarray([.4, .3, .3, .2])
+        mixing_angle = np.asarray([.5*np.pi, .5*np.pi, .3, .5])
+        act_xx = np.asarray([theory.operators.x2_1df(mu, n, spacing, 0) for mu in m])
+        
+        model = Basic_Batched_GHMC(np.zeros((m.size, n)), Batched_Klein_Gordon(m = m),
+            step_size = step_size, n_steps = 5, rng = self.rng)
+        model.run(n_samples = n_samples, n_burn_in = n_burn_in, mixing_angle = mixing_angle)
+        
+        xx = np.mean(model.samples**2, axis = (0, 2))
+        passed = np.all(np.abs(xx/act_xx - 1) <= tol) \
+            and model.samples.shape == (n_samples + 1, m.size, n) \
+            and model.traj.shape == (n_samples + 1, m.size) \
+            and model.p_acc.shape == (m.size,)
+        
+        # a single step size is shared by every chain
+        scalar = Basic_Batched_GHMC(np.zeros((m.size, n)), Batched_Klein_Gordon(m = m),
+            step_size = .3, n_steps = 5, rng = self.rng)
+        scalar.run(n_samples = 10, n_burn_in = 0)
+        passed = passed and scalar.traj.shape == (11, m.size) and np.all(scalar.traj[1:] == 1.5)
+        
+        if print_out:
+            utils.display("Batched GHMC Free Field", passed,
+                details = {
+                    'chain {}'.format(b):[
+                        'm: {}, step size: {}, angle: {:.2f}'.format(m[b], step_size[b],
+                            mixing_angle[b]),
+                        '<x^2>: {:.4f}, theory: {:.4f}'.format(xx[b], act_xx[b]),
+                        'acceptance: {:.3f}'.format(model.p_acc[b])
+                        ] for b in xrange(m.size)
+                    })
+        
+        return passed
+#
+if __name__ == '__main__':
+    rng = np.random.RandomState(1234)
+    test = Test(rng)
+    utils.newTest(test.id)
+    test.potential()
+    test.freeField()
@@ -0,0 +1,170 @@
+import numpy as np
+
+import utils
+
+# these directories won't work unless
+# the commandline interface for python unittest is used
+from hmc.potentials import Klein_Gordon, Simple_Harmonic_Oscillator
+from models import Basic_GHMC
+import theory.operators
+
+class Replay(object):
+    """Returns pre-drawn random numbers in the order they are asked for
+    
+    Required Inputs
+        normals  :: np.ndarray :: one row per call of normal()
+        uniforms :: np.ndarray :: one entry per call of uniform()
+    """
+    def __init__(self, normals, uniforms):
+        self.normals = iter(normals)
+        self.uniforms = iter(uniforms)
+        pass
+    
+    def normal(self, size=None, scale=1., loc=0.):
+        return loc + scale*next(self.normals).reshape(size)
+    
+    def uniform(self, size=None):
+        return next(self.uniforms)
+#
+class Test(object):
+    """Tests for the compiled blocks of GHMC moves
+    
+    Required Inputs
+        rng :: np.random.RandomState :: random number generator
+    """
+    def __init__(self, rng):
+        self.id = 'compiled blocks'
+        self.rng = rng
+        pass
+    
+    def serial(self, n_moves = 200, print_out = True):
+        """Checks that a block reproduces the Python moves exactly when
+        they are given the same random numbers
+        
+        Optional Inputs
+            n_moves :: int :: number of moves
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        tests = [(Klein_Gordon(m = .5), self.rng.randn(4, 4)),
+            (Simple_Harmonic_Oscillator(k = 2.), np.ones((1, 1)))]
+        
+        details = {}
+        for pot, x0 in tests:
+            if pot.moves is None: # clibs is not built
+                continue
+            for mixing_angle in [.5*np.pi, .3]:
+                model = Basic_GHMC(x0, pot, step_size = .3, n_steps = 7, rng = self.rng)
+                sampler = model.sampler
+                normals = self.rng.normal(size = (n_moves,) + x0.shape)
+                uniforms = self.rng.uniform(size = n_moves)
+                
+                p, x = sampler.p0.copy(), sampler.x0.copy()
+                _, _, block, block_p, _ = pot.moves(p.copy(), x.copy(), .3,
+                    np.full(n_moves, 7), mixing_angle, normals, uniforms)
+                
+                sampler.momentum.rng = sampler.accept.rng = Replay(normals, uniforms)
+                serial, serial_p = [], []
+                for move in xrange(n_moves):
+                    p, x = sampler.move(p, x, mixing_angle = mixing_angle)
+                    serial.append(np.asarray(x).copy())
+                    serial_p.append(np.asarray(p).copy())
+                
+                same = np.array_equal(block, serial) and np.array_equal(block_p, serial_p)
+                passed *= same
+                details['{} angle {:.2f}'.format(pot.name, mixing_angle)] = [
+                    'acceptance: {:.3f}'.format(np.hstack(sampler.accept.accept_rates).mean()),
+                    'identical chains: {}'.format(same)
+                    ]
+        
+        if print_out:
+            utils.display("Compiled Block against Python Moves", passed,
+                details = details)
+        
+        return passed
+    
+    def freeField(self, n_samples = 20000, n_burn_in = 100, tol = 5e-2, print_out = True):
+        """Checks <x^2> of the free field from blocks of KHMC moves
+        
+        Optional Inputs
+            n_samples   :: int  :: number of samples
+            n_burn_in   :: int  :: number of burnin steps
+            tol     ::  float   :: relative tolerance level allowed
+            print_out   :: bool     :: print results to screen
+        """
+        n, spacing, mu = 16, 1., 1.
+        act_xx = theory.operators.x2_1df(mu, n, spacing, 0)
+        
+        model = Basic_GHMC(np.zeros(n), Klein_Gordon(m = mu), step_size = .2, n_steps = 1,
+            spacing = spacing, rng = self.rng, block_size = 1000)
+        model.run(n_samples = n_samples, n_burn_in = n_burn_in, mixing_angle = .5)
+        
+        xx = np.mean(model.samples**2)
+        compiled = model.sampler._blocks(None)
+        passed = compiled and np.abs(xx/act_xx - 1) <= tol
+        
+        if print_out:
+            utils.display("Compiled Block Free Field", passed,
+                details = {
+                    'compiled: {}'.format(compiled):[
+                        '<x^2>: {:.4f}, theory: {:.4f}'.format(xx, act_xx),
+                        'acceptance: {:.3f}'.format(model.p_acc)
+                        ]
+                    })
+        
+        return passed
+    
+    def options(self, print_out = True):
+        """Checks that block_size raises for the options the compiled
+        moves cannot make and that seeded blocks with random trajectory
+        lengths are reproducible
+        
+        Optional Inputs
+            print_out   :: bool     :: print results to screen
+        """
+        passed = True
+        x0 = self.rng.randn(4, 4)
+        
+        details = {}
+        for pot, kwargs in [(Klein_Gordon(m = .5, compiled = False), {}),
+                (Klein_Gordon(m = .5), {'adapt_mass':'diag'}),
+                (Klein_Gordon(m = .5), {'acceptance':'lifted'}),
+                (Klein_Gordon(m = .5), {'extra_chances':2})]:
+            model = Basic_GHMC(x0, pot, step_size = .3, n_steps = 7, rng = self.rng,
+                block_size = 10, **kwargs)
+            try:
+                model.run(n_samples = 10, n_burn_in = 0)
+                raised = False
+            except ValueError:
+                raised = True
+            passed *= raised
+            details['compiled: {}, {}'.format(pot.compiled, kwargs)] = [
+                'ValueError: {}'.format(raised)]
+        
+        if Klein_Gordon().moves is not None: # clibs is built
+            seed = self.rng.randint(2**31)
+            runs = []
+            for global_seed in [1, 2]:
+                np.random.seed(global_seed)
+                model = Basic_GHMC(x0, Klein_Gordon(m = .5), step_size = .3, n_steps = 7,
+                    rand_steps = True, rng = np.random.RandomState(seed), block_size = 10)
+                model.run(n_samples = 50, n_burn_in = 0)
+                runs.append(model)
+            same = np.array_equal(runs[0].samples, runs[1].samples) \
+                and np.array_equal(runs[0].traj, runs[1].traj)
+            passed *= same
+            details['random lengths'] = ['reproducible from rng: {}'.format(same)]
+        
+        if print_out:
+            utils.display("Compiled Block Options", passed,
+                details = details)
+        
+        return passed
+#
+if __name__ == '__main__':
+    rng = np.random.RandomState(1234)
+    test = Test(rng)
+    utils.newTest(test.id)
+    test.serial()
+    test.freeField()
+    test.options()
@@ -0,0 +1,192 @@
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+import utils
+
+# these directories won't work unless 
+# the commandline interface for python unittest is used
+from hmc.lattice import Periodic_Lattice, Lattice_Geometry
+from hmc.potentials import Klein_Gordon, Quantum_Harmonic_Oscillator, Phi4_Hopping
+from hmc.cluster import clusterLabels, Embedded_Wolff
+from hmc.heatbath import Checkerboard_Heatbath
+from models import Basic_GHMC
+import theory.operators
+
+class Test(object):
+    """Tests for the embedded cluster updates
+    
+    Required Inputs
+        rng :: np.random.RandomState :: random number generator
+    """
+    def __init__(self, rng):
+        self.id = 'cluster'
+        self.rng = rng
+        pass
+    
+    def labels(self, sizes = [10, 1000, 20000], print_out = True):
+        """Checks the union-find labels against scipy's connected components
+        
+        Optional Inputs
+            sizes :: list :: number of sites of each random graph
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        details = {}
+        for n in sizes:
+            src, dst = self.rng.randint(n, size=(2, n))
+            labels = clusterLabels(n, src, dst)
+            adj = coo_matrix((np.ones(n), (src, dst)), shape=(n, n))
+            n_clusters, expected = connected_components(adj, directed=False)
+            
+            # the partitions agree if the label pairs are one to one
+            same = len(set(labels)) == n_clusters == len(set(zip(labels, expected)))
+            passed *= same
+            details['{} sites'.format(n)] = ['clusters: {} vs. {}: {}'.format(
+                len(set(labels)), n_clusters, same)]
+        
+        if print_out:
+            utils.display("Cluster Labels", passed,
+                details = details)
+        
+        return passed
+    
+    def couplings(self, h = 1e-3, tol = 1e-6, print_out = True):
+        """Checks K_xy against the cross derivatives of the action
+        
+        The hopping term -K_xy x_i x_j is the only term of the action
+        with a non-zero d^2S/dx_i dx_j
+        
+        Optional Inputs
+            h   :: float :: finite difference step
+            tol :: float :: tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        geometry = Lattice_Geometry((6, 4), boundaries=['open', 'antiperiodic'], spacing=[1., .5])
+        tests = [
+            (Klein_Gordon(m = .5), (6, 4), .5),
+            (Klein_Gordon(m = .5, phi_4 = 1., compiled = False), (6, 4), .5),
+            (Klein_Gordon(m = .5, geometry = geometry), (6, 4), 1.),
+            (Quantum_Harmonic_Oscillator(m0 = 1.5), (8,), .25),
+            (Phi4_Hopping(kappa = .2, lam = 1.), (6, 4), 1.),
+            (Phi4_Hopping(kappa = .2, lam = 1., geometry = geometry), (6, 4), 1.)
+            ]
+        details = {}
+        for i, (pot, shape, spacing) in enumerate(tests):
+            x = Periodic_Lattice(self.rng.randn(*shape), lattice_spacing=spacing)
+            fwd, couplings = pot.bondCouplings(x)
+            
+            def action(site, nbr, d_site, d_nbr):
+                y = x.copy()
+                flat = np.asarray(y).reshape(-1)
+                flat[site] += d_site
+                flat[nbr] += d_nbr
+                return pot.uE(y)
+            
+            diffs = []
+            for axis in range(len(shape)):
+                for site in [0, 5, x.size - 1]:
+                    nbr = fwd[axis, site]
+                    cross = action(site, nbr, h, h) - action(site, nbr, h, 0) \
+                        - action(site, nbr, 0, h) + action(site, nbr, 0, 0)
+                    diffs.append(np.abs(cross/h**2 + couplings[axis, site]))
+            
+            res = max(diffs) <= tol
+            passed *= res
+            details['{} {}'.format(i, pot.name)] = ['max error: {}: {}'.format(max(diffs), res)]
+        
+        try:
+            Klein_Gordon(phi_3 = 1.).bondCouplings(Periodic_Lattice(np.zeros(4)))
+            refused = False
+        except ValueError:
+            refused = True
+        passed *= refused
+        details['phi^3 refused'] = ['{}'.format(refused)]
+        
+        if print_out:
+            utils.display("Cluster Couplings", passed,
+                details = details)
+        
+        return passed
+    
+    def freeField(self, n_samples = 10000, n_burn_in = 100, tol = 5e-2, print_out = True):
+        """Alternates heatbath sweeps and cluster flips of the 1D free field
+        and compares <x^2> and the magnetisation^2 with the exact results
+        
+        The heatbath alone is exact so any bias is from the cluster update
+        
+        Optional Inputs
+            tol     ::  float   :: relative tolerance level allowed
+            print_out   :: bool     :: print results to screen
+        """
+        passed = True
+        n, spacing, mu = 64, .1, 1.
+        
+        act_xx = theory.operators.x2_1df(mu, n, spacing, 0)
+        act_mm = np.mean([theory.operators.x2_1df(mu, n, spacing, sep) for sep in range(n)])
+        
+        details = {}
+        for single_cluster in [True, False]:
+            pot = Klein_Gordon(m = mu)
+            x = Periodic_Lattice(np.zeros(n), lattice_spacing=spacing)
+            heatbath = Checkerboard_Heatbath(x, pot, self.rng, n_overrelax = 3)
+            wolff = Embedded_Wolff(pot, self.rng, single_cluster = single_cluster)
+            
+            samples = []
+            for step in xrange(n_burn_in + n_samples):
+                x = wolff.move(heatbath.move(x))
+                if step >= n_burn_in: samples.append(x.copy())
+            samples = np.asarray(samples)
+            
+            xx = np.mean(samples**2)
+            mm = np.mean(theory.operators.magnetisation_sq(samples))
+            res = [np.abs(xx/act_xx - 1) <= tol, np.abs(mm/act_mm - 1) <= 2*tol]
+            passed *= all(res)
+            details['single cluster: {}'.format(single_cluster)] = [
+                '<x(0)x(0)> target: {}, empirical {}'.format(act_xx, xx),
+                '<M^2> target: {}, empirical {}'.format(act_mm, mm),
+                'mean cluster size: {}'.format(np.mean(wolff.cluster_sizes)),
+                'x^2, M^2: {}'.format(res)
+                ]
+        
+        if print_out:
+            utils.display("Cluster: Free Field", passed,
+                details = details)
+        
+        return passed
+    
+    def schedule(self, n_samples = 30, n_burn_in = 10, cluster_every = 3, print_out = True):
+        """Checks the cluster updates are made every cluster_every GHMC moves
+        
+        Optional Inputs
+            cluster_every :: int :: GHMC moves between cluster updates
+            print_out   :: bool     :: print results to screen
+        """
+        pot = Phi4_Hopping(kappa = .3, lam = 1.)
+        model = Basic_GHMC(np.ones((8, 8)), pot, rng = self.rng)
+        wolff = Embedded_Wolff(pot, self.rng)
+        model.run(n_samples = n_samples, n_burn_in = n_burn_in,
+            cluster_update = wolff, cluster_every = cluster_every)
+        
+        expected = n_burn_in//cluster_every + n_samples//cluster_every
+        passed = len(wolff.cluster_sizes) == expected
+        
+        if print_out:
+            utils.display("Cluster Schedule", passed,
+                details = {
+                    'every {}'.format(cluster_every):[
+                        'updates: {} vs. {}'.format(len(wolff.cluster_sizes), expected)
+                        ]
+                    })
+        
+        return passed
+#
+if __name__ == '__main__':
+    rng = np.random.RandomState(1234)
+    test = Test(rng)
+    utils.newTest(test.id)
+    test.labels()
+    test.couplings()
+    test.freeField()
+    test.schedule()
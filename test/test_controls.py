@@ -0,0 +1,108 @@
+import numpy as np
+
+import utils
+
+# these directories won't work unless
+# the commandline interface for python unittest is used
+from hmc.potentials import Klein_Gordon, Quantum_Harmonic_Oscillator
+from models import Basic_Fourier
+from correlations.controls import Zero_Variance, polynomialControls, chainForces
+from correlations.errors import uWerr
+import theory.operators
+
+class Test(object):
+    """Tests for the zero-variance control variates
+    
+    Required Inputs
+        rng :: np.random.RandomState :: random number generator
+    """
+    def __init__(self, rng):
+        self.id = 'control variates'
+        self.rng = rng
+        pass
+    
+    def _exact(self, shape, pot, spacing, n_samples):
+        """Exact samples and their forces"""
+        model = Basic_Fourier(np.zeros(shape), pot, spacing = spacing, rng = self.rng)
+        model.run(n_samples = n_samples, n_burn_in = 0)
+        samples = np.asarray(model.samples).reshape((-1,) + shape)
+        return samples, chainForces(pot, samples, spacing)
+    
+    def stein(self, n_samples = 10000, n_sigma = 4., print_out = True):
+        """Checks every control has a zero mean over exact samples
+        
+        Optional Inputs
+            n_samples :: int :: number of samples
+            n_sigma   :: float :: standard errors allowed
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        details = {}
+        for shape, pot in [((16,), Quantum_Harmonic_Oscillator(mu = 1.)), ((8,6), Klein_Gordon(m = .7))]:
+            samples, forces = self._exact(shape, pot, .5, n_samples)
+            h = polynomialControls(samples, forces, separations = 'all')
+            z = h.mean(axis=0)/(h.std(axis=0)/np.sqrt(n_samples))
+            passed *= np.abs(z).max() <= n_sigma and h.shape == (n_samples+1, np.prod(shape)+2)
+            details['shape {}'.format(shape)] = [
+                'controls: {}, largest |mean|/error: {:.2f}'.format(h.shape[1], np.abs(z).max())]
+        
+        if print_out:
+            utils.display("Control Variates: Zero Means", passed,
+                details = details)
+        
+        return passed
+    
+    def freeField(self, n_samples = 10000, tol = 1e-8, print_out = True):
+        """Checks the full quadratic family gives the exact <x^2> and
+        magnetisation^2 of the 1D free field with no variance and that
+        the default family reduces the variance and error in 2D
+        
+        Optional Inputs
+            n_samples :: int    :: number of samples
+            tol     ::  float   :: relative tolerance level allowed
+            print_out   :: bool     :: print results to screen
+        """
+        passed = True
+        n, spacing, mu = 16, .5, 1.
+        act_xx = theory.operators.x2_1df(mu, n, spacing, 0)
+        act_mm = np.mean([theory.operators.x2_1df(mu, n, spacing, sep) for sep in range(n)])
+        
+        samples, forces = self._exact((n,), Klein_Gordon(m = mu), spacing, n_samples)
+        zv = Zero_Variance(samples, forces, separations = 'all')
+        details = {}
+        for name, f, act in [('x^2', theory.operators.x_sq(samples), act_xx),
+                             ('M^2', theory.operators.magnetisation_sq(samples), act_mm)]:
+            value, error = zv.uWerr(f)[:2]
+            passed *= np.abs(value/act - 1) <= tol and error == 0.
+            details['1D <{}>'.format(name)] = [
+                'zero variance: {:.6f} +/- {:.1e}, theory: {:.6f}'.format(value, error, act)]
+        
+        shape, mu = (8, 6), .7
+        k = np.meshgrid(*[2*np.pi*np.arange(l)/l for l in shape], indexing='ij')
+        act_xx = np.mean(1./(sum(2 - 2*np.cos(ki) for ki in k) + spacing*mu**2))
+        
+        samples, forces = self._exact(shape, Klein_Gordon(m = mu), spacing, n_samples)
+        zv = Zero_Variance(samples, forces)
+        f = theory.operators.x_sq(samples).reshape(n_samples+1, -1).mean(axis=1)
+        value, error = zv.uWerr(f)[:2]
+        plain, plain_error = uWerr(f)[:2]
+        reduction = zv.reduction(f)
+        passed *= reduction > 5 and error < plain_error
+        passed *= np.abs(value - act_xx) <= 4*error and np.abs(plain - act_xx) <= 4*plain_error
+        details['2D <x^2>'] = [
+            'plain: {:.5f} +/- {:.5f}'.format(plain, plain_error),
+            'controls: {:.5f} +/- {:.5f}, theory: {:.5f}'.format(value, error, act_xx),
+            'variance reduction: {:.1f}'.format(reduction)]
+        
+        if print_out:
+            utils.display("Control Variates: Free Field", passed,
+                details = details)
+        
+        return passed
+#
+if __name__ == '__main__':
+    rng = np.random.RandomState(1234)
+    test = Test(rng)
+    utils.newTest(test.id)
+    test.stein()
+    test.freeField()
@@ -0,0 +1,156 @@
+import numpy as np
+
+import utils
+
+# these directories won't work unless 
+# the commandline interface for python unittest is used
+from hmc.lattice import Periodic_Lattice
+from hmc.potentials import Klein_Gordon
+from hmc.dynamics import Leap_Frog
+from hmc.hmc import Hybrid_Monte_Carlo
+from hmc.distributed import Domain_Decomposition
+
+class _Failing_Klein_Gordon(Klein_Gordon):
+    """Raises in the force of any slab holding a non-finite site"""
+    def slabForce(self, *args, **kwargs):
+        force = super(_Failing_Klein_Gordon, self).slabForce(*args, **kwargs)
+        if not np.isfinite(force).all(): raise ValueError('non-finite force')
+        return force
+
+class Test(object):
+    """Tests for the domain decomposed lattice
+    
+    Required Inputs
+        rng :: np.random.RandomState :: random number generator
+    """
+    def __init__(self, rng):
+        self.id = 'distributed'
+        self.rng = rng
+        self.pot = Klein_Gordon(m = .8, phi_3 = .3, phi_4 = .5)
+        pass
+    
+    def decomposition(self, shapes = [(8,), (6,5), (5,4,3)], procs = [1, 2, 3], tol = 1e-10, print_out = True):
+        """Checks the action, force, hamiltonian and a trajectory over
+        subdomains against the serial Klein-Gordon potential
+        
+        Optional Inputs
+            shapes  :: list :: lattice shapes
+            procs   :: list :: numbers of worker processes
+            tol     :: float :: tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        details = {}
+        for shape in shapes:
+            x = Periodic_Lattice(self.rng.randn(*shape), lattice_spacing = .5)
+            p = self.rng.randn(*shape)
+            
+            lf = Leap_Frog(duE = self.pot.duE, step_size = .1, n_steps = 7)
+            s_p, s_x = lf.integrate(p.copy(), x.copy())
+            
+            for n_procs in procs:
+                domain = Domain_Decomposition(self.pot, x, n_procs = n_procs)
+                d_p, d_x = domain.trajectory(p.copy(), x.copy(), .1, 7)
+                res = [np.allclose(domain.uE(x), self.pot.uE(x), rtol=tol),
+                       np.allclose(domain.duE(x), self.pot.duE(x), atol=tol),
+                       np.allclose(domain.hamiltonian(p, x), self.pot.hamiltonian(p, x), rtol=tol),
+                       np.allclose(d_p, s_p, atol=tol) and np.allclose(d_x, s_x, atol=tol)]
+                domain.close()
+                passed *= all(res)
+                details['shape {}, {} procs'.format(shape, n_procs)] = [
+                    'action, force, hamiltonian, trajectory: {}'.format(res)]
+        
+        if print_out:
+            utils.display("Domain Decomposition vs. Serial", passed,
+                details = details)
+        
+        return passed
+    
+    def cooperativeHMC(self, n_samples = 100, n_procs = 3, tol = 1e-10, print_out = True):
+        """Checks a HMC chain with distributed trajectories and hamiltonians
+        matches the serial chain for the same random numbers
+        
+        Optional Inputs
+            n_samples :: int :: number of HMC samples
+            n_procs   :: int :: number of worker processes
+            tol     :: float :: tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        x0 = Periodic_Lattice(self.rng.randn(8, 8), lattice_spacing = 1.)
+        seed = self.rng.randint(2**31)
+        
+        lf = Leap_Frog(duE = self.pot.duE, step_size = .2, n_steps = 10)
+        serial = Hybrid_Monte_Carlo(x0.copy(), lf, self.pot, np.random.RandomState(seed))
+        serial.sample(n_samples = n_samples, n_burn_in = 0)
+        
+        domain = Domain_Decomposition(self.pot, x0, n_procs = n_procs)
+        lf = Leap_Frog(duE = domain.duE, trajectory = domain.trajectory, step_size = .2, n_steps = 10)
+        distributed = Hybrid_Monte_Carlo(x0.copy(), lf, domain, np.random.RandomState(seed))
+        distributed.sample(n_samples = n_samples, n_burn_in = 0)
+        domain.close()
+        
+        diff = np.abs(np.asarray(serial.samples) - np.asarray(distributed.samples)).max()
+        passed *= diff <= tol
+        
+        if print_out:
+            utils.display("Cooperative HMC: {} procs".format(n_procs), passed,
+                details = {
+                    'samples':[
+                        'max difference:    {}'.format(diff),
+                        'tolerance          {}'.format(tol)
+                        ]
+                    })
+        
+        return passed
+    
+    def abort(self, n_procs = 3, tol = 1e-10, print_out = True):
+        """Checks an exception in one rank reaches the caller instead of
+        leaving the other ranks blocked and that the workers still give the
+        serial trajectory afterwards
+        
+        Optional Inputs
+            n_procs :: int :: number of worker processes
+            tol     :: float :: tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        pot = _Failing_Klein_Gordon(m = .8, phi_4 = .5)
+        x = Periodic_Lattice(self.rng.randn(9, 4), lattice_spacing = .5)
+        p = self.rng.randn(9, 4)
+        bad = x.copy()
+        bad[-1, 0] = np.nan # only in the slab of the last rank
+        
+        domain = Domain_Decomposition(pot, x, n_procs = n_procs)
+        raised = None
+        try:
+            domain.trajectory(p.copy(), bad, .1, 5)
+        except ValueError as e:
+            raised = e
+        passed *= raised is not None
+        
+        lf = Leap_Frog(duE = pot.duE, step_size = .1, n_steps = 5)
+        s_p, s_x = lf.integrate(p.copy(), x.copy())
+        d_p, d_x = domain.trajectory(p.copy(), x.copy(), .1, 5)
+        recovered = np.allclose(d_p, s_p, atol=tol) and np.allclose(d_x, s_x, atol=tol)
+        passed *= recovered
+        domain.close()
+        
+        if print_out:
+            utils.display("Domain Decomposition: Failing Rank", passed,
+                details = {
+                    'failure':[
+                        'raised in caller:  {}'.format(repr(raised)),
+                        'next trajectory matches serial: {}'.format(recovered)
+                        ]
+                    })
+        
+        return passed
+#
+if __name__ == '__main__':
+    rng = np.random.RandomState(1234)
+    test = Test(rng)
+    utils.newTest(test.id)
+    test.decomposition()
+    test.cooperativeHMC()
+    test.abort()
@@ -0,0 +1,93 @@
+import os
+import json
+import numpy as np
+
+import utils
+
+# these directories won't work unless
+# the commandline interface for python unittest is used
+from correlations.errors import uWerr
+
+REF_LOC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'correlations', 'ref_code')
+
+class Test(object):
+    """Tests for the errors from uWerr
+    
+    Required Inputs
+        rng :: np.random.RandomState :: random number generator
+    """
+    def __init__(self, rng):
+        self.id = 'errors'
+        self.rng = rng
+        pass
+    
+    def reference(self, tol = 1e-6, print_out = True):
+        """Checks uWerr on the fast and slow paths against the output of
+        the Matlab UWerr.m for the series in ref_code
+        
+        Optional Inputs
+            tol     :: float :: relative tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        with open(os.path.join(REF_LOC, 'uWerr_out.dat')) as f: act = json.load(f)
+        a = np.loadtxt(os.path.join(REF_LOC, 'actime_tint20_samples.dat'))
+        
+        details = {}
+        for name, threshold in [('fast', 5000), ('slow', a.size + 1)]:
+            value, dvalue, ddvalue, tauint, dtauint = uWerr(a, fast_threshold = threshold)[:5]
+            res = {'value':value, 'dvalue':dvalue, 'ddvalue':ddvalue,
+                'tauint':tauint, 'dtauint':dtauint}
+            match = all(np.abs(res[k]/act[k] - 1) <= tol for k in res)
+            passed *= match
+            details['{} path: {}'.format(name, match)] = [
+                '{}: {:.6e}, matlab: {:.6e}'.format(k, res[k], act[k]) for k in sorted(res)]
+        
+        if print_out:
+            utils.display("uWerr: Matlab Reference", passed,
+                details = details)
+        
+        return passed
+    
+    def ar1(self, rho = .8, sigma = 2., tol = .1, print_out = True):
+        """Checks the error and integrated autocorrelation time of AR(1)
+        series on the fast and slow paths against the exact
+        sigma*sqrt(2 tau/N) with tau = (1 + rho)/(1 - rho)/2
+        
+        Optional Inputs
+            rho     :: float :: autocorrelation at a separation of one
+            sigma   :: float :: standard deviation of the series
+            tol     :: float :: relative tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        act_tau = .5*(1 + rho)/(1 - rho)
+        
+        details = {}
+        for name, n in [('slow', 4000), ('fast', 40000)]:
+            noise = self.rng.normal(size=n)*np.sqrt(1 - rho**2)
+            x = np.empty(n)
+            x[0] = self.rng.normal()
+            for i in xrange(1, n): x[i] = rho*x[i-1] + noise[i]
+            x = 1. + sigma*x
+            
+            value, dvalue, ddvalue, tauint = uWerr(x)[:4]
+            act_dvalue = sigma*np.sqrt(2*act_tau/n)
+            passed *= np.abs(dvalue/act_dvalue - 1) <= tol + 2*ddvalue/act_dvalue
+            passed *= np.abs(tauint/act_tau - 1) <= 2*tol
+            details['{} path, N = {}'.format(name, n)] = [
+                'error: {:.5f}, exact: {:.5f}'.format(dvalue, act_dvalue),
+                'tau_int: {:.3f}, exact: {:.3f}'.format(tauint, act_tau)]
+        
+        if print_out:
+            utils.display("uWerr: AR(1) Series", passed,
+                details = details)
+        
+        return passed
+#
+if __name__ == '__main__':
+    rng = np.random.RandomState(1234)
+    test = Test(rng)
+    utils.newTest(test.id)
+    test.reference()
+    test.ar1()
@@ -0,0 +1,114 @@
+import numpy as np
+
+import utils
+
+# these directories won't work unless
+# the commandline interface for python unittest is used
+from hmc.lattice import Periodic_Lattice
+from hmc.potentials import Klein_Gordon, Quantum_Harmonic_Oscillator
+from models import Basic_Fourier
+import theory.operators
+
+class Test(object):
+    """Tests for the exact Fourier space sampler
+    
+    Required Inputs
+        rng :: np.random.RandomState :: random number generator
+    """
+    def __init__(self, rng):
+        self.id = 'fourier'
+        self.rng = rng
+        pass
+    
+    def spectrum(self, shape = (8,6), spacing = .5, mu = .3, tol = 1e-10, print_out = True):
+        """Checks the probed eigenvalues against the lattice Klein-Gordon
+        dispersion and that interacting and massless actions are refused
+        
+        Optional Inputs
+            shape   :: tuple :: lattice shape
+            spacing :: float :: lattice spacing
+            mu      :: float :: mass
+            tol     :: float :: tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        model = Basic_Fourier(np.zeros(shape), Klein_Gordon(m = mu), spacing = spacing, rng = self.rng)
+        
+        d = len(shape)
+        k = np.meshgrid(*[2*np.pi*np.fft.fftfreq(n) for n in shape[:-1]]
+            + [2*np.pi*np.fft.rfftfreq(shape[-1])], indexing='ij')
+        act_l = spacing**(d-2)*sum(2 - 2*np.cos(ki) for ki in k) + spacing*mu**2
+        match = np.allclose(model.sampler.eigenvalues, act_l, rtol=tol)
+        
+        refused = []
+        for pot in [Klein_Gordon(phi_4 = .5), Klein_Gordon(m = 0.)]:
+            try:
+                Basic_Fourier(np.zeros(shape), pot, spacing = spacing)
+                refused.append(False)
+            except ValueError:
+                refused.append(True)
+        
+        passed *= match and all(refused)
+        
+        if print_out:
+            utils.display("Fourier Spectrum", passed,
+                details = {
+                    'shape {}'.format(shape):[
+                        'lattice dispersion: {}'.format(match),
+                        'phi^4 refused: {}, massless refused: {}'.format(*refused)
+                        ]
+                    })
+        
+        return passed
+    
+    def freeField(self, n_samples = 100000, tol = 2e-2, print_out = True):
+        """Samples the 1D free field and QHO and compares <x^2> and
+        the magnetisation^2 with the exact results and checks the mean
+        action of a 2D lattice is half the number of sites
+        
+        Optional Inputs
+            n_samples :: int    :: number of samples
+            tol     ::  float   :: relative tolerance level allowed
+            print_out   :: bool     :: print results to screen
+        """
+        passed = True
+        n, spacing, mu = 64, .1, 1.
+        
+        act_xx = theory.operators.x2_1df(mu, n, spacing, 0)
+        act_mm = np.mean([theory.operators.x2_1df(mu, n, spacing, sep) for sep in range(n)])
+        
+        details = {}
+        for name, pot in [('free field', Klein_Gordon(m = mu)),
+                          ('qho', Quantum_Harmonic_Oscillator(mu = mu))]:
+            model = Basic_Fourier(np.zeros(n), pot, spacing = spacing, rng = self.rng)
+            model.run(n_samples = n_samples, n_burn_in = 0)
+            xx = np.mean(model.samples**2)
+            mm = np.mean(theory.operators.magnetisation_sq(model.samples))
+            passed *= np.abs(xx/act_xx - 1) <= tol and np.abs(mm/act_mm - 1) <= 2*tol
+            passed *= model.p_acc == 1. and model.samples.shape == (n_samples+1, n)
+            details[name] = [
+                '<x^2>: {:.4f}, theory: {:.4f}'.format(xx, act_xx),
+                '<M^2>: {:.4f}, theory: {:.4f}'.format(mm, act_mm)
+                ]
+        
+        shape = (8, 6)
+        pot = Klein_Gordon(m = .7)
+        model = Basic_Fourier(np.zeros(shape), pot, spacing = .5, rng = self.rng)
+        x = model.sampler.draw(n_samples//10)
+        s = np.mean([pot.uE(Periodic_Lattice(xi, lattice_spacing = .5)) for xi in x])
+        act_s = .5*np.prod(shape)
+        passed *= np.abs(s/act_s - 1) <= tol
+        details['shape {}'.format(shape)] = ['<S>: {:.3f}, theory: {:.1f}'.format(s, act_s)]
+        
+        if print_out:
+            utils.display("Fourier Free Field", passed,
+                details = details)
+        
+        return passed
+#
+if __name__ == '__main__':
+    rng = np.random.RandomState(1234)
+    test = Test(rng)
+    utils.newTest(test.id)
+    test.spectrum()
+    test.freeField()
@@ -0,0 +1,109 @@
+import numpy as np
+
+import utils
+
+# these directories won't work unless 
+# the commandline interface for python unittest is used
+from hmc.lattice import Periodic_Lattice
+from hmc.potentials import Klein_Gordon, Quantum_Harmonic_Oscillator
+from models import Basic_Heatbath
+import theory.operators
+
+class Test(object):
+    """Tests for the checkerboard heatbath
+    
+    Required Inputs
+        rng :: np.random.RandomState :: random number generator
+    """
+    def __init__(self, rng):
+        self.id = 'heatbath'
+        self.rng = rng
+        pass
+    
+    def precision(self, shape = (8,6), spacing = .5, mu = .3, tol = 1e-10, print_out = True):
+        """Checks the probed diagonal against the Klein-Gordon action,
+        that overrelaxation conserves the action and that interacting
+        actions are refused
+        
+        Optional Inputs
+            shape   :: tuple :: lattice shape
+            spacing :: float :: lattice spacing
+            mu      :: float :: mass
+            tol     :: float :: tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        pot = Klein_Gordon(m = mu)
+        model = Basic_Heatbath(self.rng.randn(*shape), pot, spacing = spacing, rng = self.rng)
+        
+        d = len(shape)
+        act_a = 2*d*spacing**(d-2) + spacing*mu**2
+        diag = np.allclose(model.sampler.precision, act_a, rtol=tol)
+        
+        x = model.x0.copy()
+        conserved = np.abs(pot.uE(model.sampler.overrelax(x)) - pot.uE(x)) <= tol*np.abs(pot.uE(x))
+        
+        try:
+            Basic_Heatbath(np.zeros(shape), Klein_Gordon(phi_4 = .5), spacing = spacing)
+            refused = False
+        except ValueError:
+            refused = True
+        
+        passed *= diag and conserved and refused
+        
+        if print_out:
+            utils.display("Heatbath Precision & Overrelaxation", passed,
+                details = {
+                    'shape {}'.format(shape):[
+                        'diagonal {} vs. {}: {}'.format(model.sampler.precision.ravel()[0], act_a, diag),
+                        'overrelaxation conserves action: {}'.format(conserved),
+                        'phi^4 refused: {}'.format(refused)
+                        ]
+                    })
+        
+        return passed
+    
+    def freeField(self, n_samples = 10000, n_burn_in = 100, n_overrelax = 3, tol = 5e-2, print_out = True):
+        """Samples the 1D free field and QHO and compares <x^2> and
+        the magnetisation^2 with the exact results
+        
+        Optional Inputs
+            n_overrelax :: int  :: overrelaxation sweeps per heatbath sweep
+            tol     ::  float   :: relative tolerance level allowed
+            print_out   :: bool     :: print results to screen
+        """
+        passed = True
+        n, spacing, mu = 64, .1, 1.
+        
+        act_xx = theory.operators.x2_1df(mu, n, spacing, 0)
+        act_mm = np.mean([theory.operators.x2_1df(mu, n, spacing, sep) for sep in range(n)])
+        
+        details = {}
+        for pot in [Klein_Gordon(m = mu), Quantum_Harmonic_Oscillator(mu = mu)]:
+            model = Basic_Heatbath(np.zeros(n), pot, spacing = spacing, rng = self.rng,
+                n_overrelax = n_overrelax)
+            model.run(n_samples = n_samples, n_burn_in = n_burn_in)
+            
+            xx = np.mean(model.samples**2)
+            mm = np.mean(theory.operators.magnetisation_sq(model.samples))
+            res = [np.abs(xx/act_xx - 1) <= tol, np.abs(mm/act_mm - 1) <= 2*tol,
+                model.p_acc == 1., (model.traj[1:] == 1 + n_overrelax).all()]
+            passed *= all(res)
+            details[pot.name] = [
+                '<x(0)x(0)> target: {}, empirical {}'.format(act_xx, xx),
+                '<M^2> target: {}, empirical {}'.format(act_mm, mm),
+                'x^2, M^2, acceptance, sweeps: {}'.format(res)
+                ]
+        
+        if print_out:
+            utils.display("Heatbath: Free Field", passed,
+                details = details)
+        
+        return passed
+#
+if __name__ == '__main__':
+    rng = np.random.RandomState(1234)
+    test = Test(rng)
+    utils.newTest(test.id)
+    test.precision()
+    test.freeField()
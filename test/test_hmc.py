@@ -1,12 +1,17 @@
 import numpy as np
 from scipy.stats import norm
+from scipy.special import iv
 
 import utils
 
 from hmc.lattice import Periodic_Lattice
 from hmc.potentials import Simple_Harmonic_Oscillator, Multivariate_Gaussian
-from hmc.potentials import Quantum_Harmonic_Oscillator, Klein_Gordon
+from hmc.potentials import Quantum_Harmonic_Oscillator, Klein_Gordon, Phi4_Hopping
+from hmc.potentials import U1_Gauge
+from hmc.multilevel import Multilevel_HMC
 from hmc.hmc import *
+from models import Basic_HMC
+import theory.operators
 
 class Test(object):
     """Tests for the HMC class
@@ -196,6 +201,290 @@ class Test(object):
         
         return passed
     
+    def singlePrecision(self, n_samples = 1000, n_burn_in = 20, tol = 5e-2, print_out = True):
+        """Samples the free field in float32 and checks that the samples
+        stay in single precision while the Hamiltonians are float64
+        
+        Optional Inputs
+            tol     ::  float   :: tolerance level allowed
+            print_out   :: bool     :: print results to screen
+        """
+        passed = True
+        n, spacing = 100, .1
+        
+        x0 = self.rng.random_sample(n)
+        model = Basic_HMC(x0, Klein_Gordon(), spacing = spacing, rng = self.rng,
+            dtype = 'float32', accept_kwargs = {'get_delta_hs':True})
+        model.run(n_samples = n_samples, n_burn_in = n_burn_in)
+        
+        delta_hs = np.asarray(model.sampler.accept.delta_hs)
+        xx = np.mean(model.samples**2, dtype='float64')
+        act_xx = theory.operators.x2_1df(1., n, spacing, 0)
+        
+        passed *= model.samples.dtype == np.float32
+        passed *= model.sampler.momentum.noise.dtype == np.float32
+        passed *= delta_hs.dtype == np.float64
+        passed *= np.abs(xx - act_xx) <= tol
+        
+        if print_out:
+            utils.display("HMC: Single Precision Klein Gordon", passed,
+                details = {
+                    'dtypes':[
+                        'samples:   {}'.format(     model.samples.dtype),
+                        'momentum:  {}'.format(     model.sampler.momentum.noise.dtype),
+                        'delta H:   {}'.format(     delta_hs.dtype)
+                        ],
+                    '<x(0)x(0)>':[
+                        'target:    {}'.format(     act_xx),
+                        'empirical  {}'.format(     xx),
+                        'tolerance  {}'.format(     tol)
+                        ]
+                    })
+        
+        return passed
+    
+    def hmcPhi4(self, n_samples = 20000, n_burn_in = 500, tol = 1e-1, print_out = True):
+        """Samples phi^4 in the hopping form and compares observables with
+        ref_code/phi4_sol run with its infile (L=4, D=3, 10^6 trajectories)
+        
+        Optional Inputs
+            tol     ::  float   :: relative tolerance level allowed
+            print_out   :: bool     :: print results to screen
+        """
+        passed = True
+        shape = (4,)*3
+        
+        # <m^2/V> and <W> of ref_code/phi4_sol/measure.c
+        act_m2, act_w = 14.5, 112.8
+        
+        pot = Phi4_Hopping(kappa = 0.18169, lam = 1.3282)
+        x0 = self.rng.random_sample(shape)
+        lf = Leap_Frog(duE = pot.duE, step_size = 0.2, n_steps = 5)
+        hmc = Hybrid_Monte_Carlo(x0, lf, pot, self.rng)
+        hmc.sample(n_samples = n_samples, n_burn_in = n_burn_in)
+        
+        samples = np.asarray(hmc.samples)
+        m2 = (samples.reshape(n_samples+1, -1).sum(axis=1)**2).mean()/samples[0].size
+        fwd = sum(np.roll(samples, -1, axis=ax) for ax in range(1, samples.ndim))
+        w = 2.*(fwd*samples).reshape(n_samples+1, -1).sum(axis=1).mean()
+        
+        passed *= np.abs(m2/act_m2 - 1) <= tol
+        passed *= np.abs(w/act_w - 1) <= tol
+        
+        if print_out:
+            utils.display("HMC: phi^4 Hopping Parameter Form", passed,
+                details = {
+                    '<m^2/V>':[
+                        'target:    {}'.format(     act_m2),
+                        'empirical  {}'.format(     m2),
+                        'tolerance  {}'.format(     tol)
+                        ],
+                    '<W>':[
+                        'target:    {}'.format(     act_w),
+                        'empirical  {}'.format(     w),
+                        'tolerance  {}'.format(     tol)
+                        ]
+                    })
+        
+        return passed
+    
+    def hmcU1(self, n_samples = 2000, n_burn_in = 200, beta = 1., tol = 1e-2, print_out = True):
+        """Samples 2D compact U(1) and compares the average plaquette with
+        the exact infinite volume result <cos theta_P> = I_1(beta)/I_0(beta)
+        
+        Optional Inputs
+            beta    ::  float   :: inverse coupling
+            tol     ::  float   :: absolute tolerance level allowed
+            print_out   :: bool     :: print results to screen
+        """
+        passed = True
+        shape = (2, 16, 16)
+        
+        act_plaq = iv(1, beta)/iv(0, beta)
+        
+        pot = U1_Gauge(beta = beta)
+        x0 = np.zeros(shape)
+        lf = Leap_Frog(duE = pot.duE, step_size = 0.1, n_steps = 10)
+        hmc = Hybrid_Monte_Carlo(x0, lf, pot, self.rng)
+        hmc.sample(n_samples = n_samples, n_burn_in = n_burn_in)
+        
+        plaq = np.mean([pot.averagePlaquette(x) for x in hmc.samples])
+        passed *= np.abs(plaq - act_plaq) <= tol
+        
+        if print_out:
+            utils.display("HMC: 2D U(1) Gauge", passed,
+                details = {
+                    '<cos theta_P>':[
+                        'target:    {}'.format(     act_plaq),
+                        'empirical  {}'.format(     plaq),
+                        'tolerance  {}'.format(     tol)
+                        ]
+                    })
+        
+        return passed
+    
+    def hmcMultilevel(self, n_samples = 2000, n_burn_in = 100, tol = 5e-2, print_out = True):
+        """Samples the 1D free field with block-spin coarse levels and
+        compares <x^2> and the magnetisation^2 with the exact results
+        
+        Optional Inputs
+            tol     ::  float   :: relative tolerance level allowed
+            print_out   :: bool     :: print results to screen
+        """
+        passed = True
+        n, spacing, mu = 64, .1, 1.
+        
+        act_xx = theory.operators.x2_1df(mu, n, spacing, 0)
+        act_mm = np.mean([theory.operators.x2_1df(mu, n, spacing, sep) for sep in range(n)])
+        
+        pot = Klein_Gordon(m = mu)
+        x0 = Periodic_Lattice(np.zeros(n), lattice_spacing = spacing)
+        lf = Leap_Frog(duE = pot.duE, step_size = .1, n_steps = 20)
+        hmc = Multilevel_HMC(x0, lf, pot, self.rng, n_levels = 4)
+        hmc.sample(n_samples = n_samples, n_burn_in = n_burn_in)
+        
+        samples = np.asarray(hmc.samples)
+        xx = np.mean(samples**2)
+        mm = np.mean(theory.operators.magnetisation_sq(samples))
+        coarse_accept = [np.mean(rates) for rates in hmc.coarse_accept_rates]
+        
+        passed *= np.abs(xx/act_xx - 1) <= tol
+        passed *= np.abs(mm/act_mm - 1) <= 2*tol
+        passed *= all(rate > .5 for rate in coarse_accept)
+        
+        if print_out:
+            utils.display("Multilevel HMC: Klein Gordon", passed,
+                details = {
+                    '<x(0)x(0)>':[
+                        'target:    {}'.format(     act_xx),
+                        'empirical  {}'.format(     xx),
+                        'tolerance  {}'.format(     tol)
+                        ],
+                    '<M^2>':[
+                        'target:    {}'.format(     act_mm),
+                        'empirical  {}'.format(     mm),
+                        'tolerance  {}'.format(     2*tol)
+                        ],
+                    'coarse acceptance':[
+                        'levels:    {}'.format(     coarse_accept)
+                        ]
+                    })
+        
+        return passed
+    
+    def hmcFlips(self, n_samples = 30000, n_burn_in = 500, tol = 5e-2, print_out = True):
+        """Samples the 1D free field with small mixing angles using the
+        lifted acceptance and the reduced momentum flips and compares
+        <x^2> and the magnetisation^2 with the exact results
+        
+        Optional Inputs
+            tol     ::  float   :: relative tolerance level allowed
+            print_out   :: bool     :: print results to screen
+        """
+        passed = True
+        n, spacing, mu = 16, 1., 1.
+        
+        act_xx = theory.operators.x2_1df(mu, n, spacing, 0)
+        act_mm = np.mean([theory.operators.x2_1df(mu, n, spacing, sep) for sep in range(n)])
+        
+        details = {}
+        for scheme in [{}, {'acceptance':'lifted'}, {'flip':'reduced'}]:
+            model = Basic_HMC(np.zeros(n), Klein_Gordon(m = mu), step_size = .5, n_steps = 1,
+                rng = self.rng, **scheme)
+            model.run(n_samples = n_samples, n_burn_in = n_burn_in, mixing_angle = .3)
+            
+            xx = np.mean(model.samples**2)
+            mm = np.mean(theory.operators.magnetisation_sq(model.samples))
+            grads = model.traj.sum()/model.step_size/n_samples
+            
+            passed *= np.abs(xx/act_xx - 1) <= tol
+            passed *= np.abs(mm/act_mm - 1) <= 2*tol
+            # only the reduced flips integrate a second trajectory
+            passed *= (grads > 1.) == (scheme.get('flip') == 'reduced')
+            lift = model.sampler.accept.lift
+            passed *= lift is None or -1. <= lift <= 1.
+            
+            details[str(scheme or 'standard')] = [
+                '<x^2>: {}, target: {}'.format(xx, act_xx),
+                '<M^2>: {}, target: {}'.format(mm, act_mm),
+                'gradients per move: {}'.format(grads)
+                ]
+        
+        if print_out:
+            utils.display("GHMC Flips: Klein Gordon", passed,
+                details = details)
+        
+        return passed
+    
+    def hmcExtraChances(self, n_samples = 30000, n_burn_in = 500, tol = 5e-2, print_out = True):
+        """Samples the 1D free field with a large step size and extra
+        chances and compares <x^2> and the magnetisation^2 with the exact
+        results. The extra chances must raise the acceptance and with
+        random trajectory lengths every segment of a move must have the
+        length of the first
+        
+        Optional Inputs
+            n_samples :: int    :: number of samples
+            n_burn_in :: int    :: number of burn in steps
+            tol     ::  float   :: relative tolerance level allowed
+            print_out   :: bool     :: print results to screen
+        """
+        passed = True
+        n, spacing, mu = 16, 1., 1.
+        
+        act_xx = theory.operators.x2_1df(mu, n, spacing, 0)
+        act_mm = np.mean([theory.operators.x2_1df(mu, n, spacing, sep) for sep in range(n)])
+        
+        details = {}
+        p_accs = []
+        for extra_chances in [0, 3]:
+            model = Basic_HMC(np.zeros(n), Klein_Gordon(m = mu), step_size = .7, n_steps = 1,
+                rng = self.rng, extra_chances = extra_chances)
+            model.run(n_samples = n_samples, n_burn_in = n_burn_in, mixing_angle = .3)
+            
+            xx = np.mean(model.samples**2)
+            mm = np.mean(theory.operators.magnetisation_sq(model.samples))
+            segments = np.asarray(model.sampler.extra_segments)
+            accepted = np.mean(np.any(model.samples[1:] != model.samples[:-1], axis = 1))
+            p_accs.append(accepted)
+            
+            passed *= np.abs(xx/act_xx - 1) <= tol
+            passed *= np.abs(mm/act_mm - 1) <= 2*tol
+            passed *= segments.size == (n_samples + n_burn_in)*(extra_chances > 0)
+            passed *= np.all((segments >= 0) & (segments <= extra_chances))
+            
+            details['extra chances: {}'.format(extra_chances)] = [
+                '<x^2>: {}, target: {}'.format(xx, act_xx),
+                '<M^2>: {}, target: {}'.format(mm, act_mm),
+                'accepted: {}'.format(accepted),
+                'mean extra segments: {}'.format(segments.mean() if segments.size else 0.)
+                ]
+        passed *= p_accs[1] > p_accs[0]
+        
+        model = Basic_HMC(np.zeros(n), Klein_Gordon(m = mu), step_size = .7, n_steps = 4,
+            rand_steps = True, rng = self.rng, extra_chances = 3)
+        dynamics = model.sampler.dynamics
+        lengths, integrate = [], dynamics.integrate
+        def recordLength(*args, **kwargs):
+            out = integrate(*args, **kwargs)
+            lengths.append(dynamics.n)
+            return out
+        dynamics.integrate = recordLength
+        model.run(n_samples = 1000, n_burn_in = 0, mixing_angle = .3)
+        segments = np.asarray(model.sampler.extra_segments)
+        moves = np.split(np.asarray(lengths), np.cumsum(segments + 1)[:-1])
+        equal = all(np.all(m == m[0]) for m in moves) and len(lengths) == (segments + 1).sum()
+        passed *= equal
+        details['random lengths'] = [
+            'segments equal to the first: {}'.format(equal),
+            'mean extra segments: {}'.format(segments.mean())
+            ]
+        
+        if print_out:
+            utils.display("GHMC Extra Chances: Klein Gordon", passed,
+                details = details)
+        
+        return passed
 #
 if __name__ == '__main__':
     rng = np.random.RandomState()
@@ -205,3 +494,9 @@ if __name__ == '__main__':
     test.hmcSho1d(n_samples = 10000, n_burn_in = 15, tol = 1e-2)
     # test.hmcGaus2d(n_samples = 100000, n_burn_in = 15, tol = 1e-1)
     test.hmcQho(n_samples = 1000, n_burn_in = 15, tol = 1e-1)
+    test.singlePrecision(n_samples = 1000, n_burn_in = 20, tol = 5e-2)
+    test.hmcPhi4()
+    test.hmcU1()
+    test.hmcMultilevel()
+    test.hmcFlips()
+    test.hmcExtraChances()
@@ -4,7 +4,8 @@ import utils
 
 # these directories won't work unless 
 # the commandline interface for python unittest is used
-from hmc.lattice import Periodic_Lattice, laplacian, gradSquared
+from hmc.lattice import Periodic_Lattice, laplacian, gradSquared, Lattice_Geometry
+from hmc.potentials import fastLaplaceNd
 from scipy.ndimage.filters import laplace
 class Test(object):
     def __init__(self):
@@ -111,6 +112,56 @@ class Test(object):
                 ]})
         
         return passed
+    
+    def geometry(self, print_out = True):
+        """tests the precomputed stencils against the scipy laplacian
+        and known values for the non-periodic boundaries"""
+        passed = True
+        rng = np.random.RandomState(1234)
+        store = []
+        
+        # periodic: should match scipy for all dimensions
+        for shape in [(10,), (6,5), (4,3,5), (2,4,3,4)]:
+            a = rng.random_sample(shape)
+            g = Lattice_Geometry(shape)
+            expected = laplace(a, mode='wrap')
+            res = [np.allclose(g.laplace(a), expected),
+                   np.allclose(g.laplaceGather(a), expected),
+                   np.allclose(fastLaplaceNd(a), expected)]
+            passed *= all(res)
+            store.append('periodic {}: sparse, gather, fastLaplaceNd: {}'.format(shape, res))
+        
+        # batched over trailing axis
+        a = rng.random_sample((6,5,3))
+        expected = np.dstack([laplace(a[...,i], mode='wrap') for i in range(3)])
+        res = np.allclose(Lattice_Geometry((6,5)).laplace(a), expected)
+        passed *= res
+        store.append('batched (6,5) x 3: {}'.format(res))
+        
+        a = np.arange(1., 5.)
+        for bc, act in [('antiperiodic', [-4., 0., 0., -6.]),
+                        ('open', [0., 0., 0., -5.])]:
+            g = Lattice_Geometry(a.shape, boundaries=bc)
+            res = (g.laplace(a) == act).all() and (g.laplaceGather(a) == act).all()
+            res *= (abs(g.laplacian - g.laplacian.T) > 0).nnz == 0 # symmetric
+            passed *= res
+            store.append('{}: {} expected: {}'.format(bc, g.laplace(a), act))
+        
+        # anisotropic and non-uniform spacing
+        g = Lattice_Geometry((4,4), spacing=[[1.,1.,2.,1.], .5])
+        b = self.a1
+        act = laplace(b, mode='wrap') + 3*(np.roll(b, -1, 1) - 2*b + np.roll(b, 1, 1))
+        act[2] += .75*(b[2] - b[3])
+        act[3] += .75*(b[3] - b[2])
+        res = np.allclose(g.laplace(b), act) and (abs(g.laplacian - g.laplacian.T) > 0).nnz == 0
+        passed *= res
+        store.append('anisotropic + non-uniform: {}'.format(res))
+        
+        if print_out:
+            utils.display('Precomputed Geometry Stencils', outcome=passed,
+                details = {'checked vs. scipy and known values':store})
+        
+        return passed
 #
 if __name__ == '__main__':
     test = Test()
@@ -118,4 +169,5 @@ if __name__ == '__main__':
     test.sciPyLaplacian()
     test.wrap()
     test.laplacian()
-    test.gradSquared()
\ No newline at end of file
+    test.gradSquared()
+    test.geometry()
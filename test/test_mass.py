@@ -0,0 +1,147 @@
+import numpy as np
+
+import utils
+
+# these directories won't work unless 
+# the commandline interface for python unittest is used
+from hmc.mass import Welford, Mass_Matrix, adaptationWindows, regularise
+from hmc.potentials import Multivariate_Gaussian
+from models import Basic_HMC
+
+class Test(object):
+    """Tests for the mass matrix and its adaptation
+    
+    Required Inputs
+        rng :: np.random.RandomState :: random number generator
+    """
+    def __init__(self, rng):
+        self.id = 'mass'
+        self.rng = rng
+        pass
+    
+    def welford(self, n = 500, dim = 4, tol = 1e-10, print_out = True):
+        """Checks the running (co)variance against numpy and the windows
+        
+        Optional Inputs
+            n   :: int :: number of samples
+            dim :: int :: degrees of freedom
+            tol :: float :: tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        samples = self.rng.randn(n, dim, 1)*np.arange(1, dim + 1)[:, None]
+        diag, dense = Welford(dim), Welford(dim, dense=True)
+        for x in samples:
+            diag.update(x)
+            dense.update(x)
+        flat = samples.reshape(n, dim)
+        
+        windows = adaptationWindows(1000)
+        short = adaptationWindows(100)
+        contiguous = all(a[1] == b[0] for a, b in zip(windows[:-1], windows[1:]))
+        
+        res = [np.allclose(diag.variance(), flat.var(axis=0, ddof=1), rtol=tol),
+            np.allclose(dense.variance(), np.cov(flat.T), rtol=tol),
+            windows[0][0] == 75 and windows[-1][1] == 950 and contiguous,
+            short[0][0] == 15 and short[-1][1] == 90,
+            np.allclose(regularise(np.ones(3), 5), .5 + .5e-3)]
+        passed = all(res)
+        
+        if print_out:
+            utils.display("Welford Estimates", passed,
+                details = {
+                    'windows for 1000: {}'.format(windows):[
+                        'diag, dense, windows, short windows, regularise: {}'.format(res)
+                        ]
+                    })
+        
+        return passed
+    
+    def massMatrix(self, n = 20000, tol = 5e-2, print_out = True):
+        """Checks the noise has covariance M and the kinetic energy
+        and drift use M^-1
+        
+        Optional Inputs
+            n   :: int :: number of noise samples
+            tol :: float :: tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        a = self.rng.randn(3, 3)
+        inv = a.dot(a.T) + np.identity(3)
+        mass = np.linalg.inv(inv)
+        
+        dense = Mass_Matrix((3, 1), dense=True)
+        dense.update(inv)
+        diag = Mass_Matrix((3, 1))
+        diag.update(np.diag(inv))
+        
+        noise = np.asarray([dense.noise(self.rng, (3, 1)).ravel() for i in xrange(n)])
+        noise_diag = np.asarray([diag.noise(self.rng, (3, 1)).ravel() for i in xrange(n)])
+        
+        p = self.rng.randn(3, 1)
+        res = [np.allclose(np.cov(noise.T), mass, atol=tol*np.abs(mass).max()),
+            np.allclose(noise_diag.var(axis=0), 1./np.diag(inv), rtol=tol),
+            np.isclose(dense.kineticEnergy(p), .5*p.ravel().dot(inv).dot(p.ravel())),
+            np.allclose(dense.velocity(p), inv.dot(p)),
+            np.allclose(diag.velocity(p), np.diag(inv)[:, None]*p)]
+        passed = all(res)
+        
+        if print_out:
+            utils.display("Mass Matrix", passed,
+                details = {
+                    'dense M^-1 = {}'.format(np.around(inv, 2).tolist()):[
+                        'noise cov, diag noise var, KE, drift, diag drift: {}'.format(res)
+                        ]
+                    })
+        
+        return passed
+    
+    def adaptation(self, n_samples = 5000, n_burn_in = 1000, tol = .15, print_out = True):
+        """Checks that the adapted mass matrix approaches the covariance of
+        a scaled and a correlated gaussian and that the samples are still exact
+        
+        Optional Inputs
+            tol     ::  float   :: relative tolerance level allowed
+            print_out   :: bool     :: print results to screen
+        """
+        passed = True
+        tests = [('diag', np.diag([1., .01]), .05), ('dense', np.asarray([[1., .95], [.95, 1.]]), .5)]
+        
+        details = {}
+        for adapt_mass, cov, step_size in tests:
+            pot = Multivariate_Gaussian(cov = cov)
+            model = Basic_HMC(np.zeros((2, 1)), pot, step_size = step_size, n_steps = 10,
+                rand_steps = True, rng = self.rng, adapt_mass = adapt_mass)
+            model.run(n_samples = n_samples, n_burn_in = n_burn_in)
+            
+            inv = model.sampler.mass.inv
+            scale = np.sqrt(np.outer(np.diag(cov), np.diag(cov)))
+            # a short burn in only needs to get the scales within a factor of 2
+            if adapt_mass == 'diag':
+                ratio = inv.ravel()/np.diag(cov)
+                learned = ((ratio > .5) & (ratio < 2.)).all()
+            else:
+                ratio = np.diag(inv)/np.diag(cov)
+                corr = inv[0, 1]/np.sqrt(inv[0, 0]*inv[1, 1])
+                learned = ((ratio > .5) & (ratio < 2.)).all() and corr > .8
+            exact = np.allclose(np.cov(model.samples.T)/scale, cov/scale, atol=tol)
+            
+            passed *= learned and exact
+            details[adapt_mass] = [
+                'M^-1: {}'.format(np.around(inv, 3).tolist()),
+                'sample cov: {}'.format(np.around(np.cov(model.samples.T), 3).tolist()),
+                'learned, exact: {}'.format([learned, exact])
+                ]
+        
+        if print_out:
+            utils.display("Mass Matrix Adaptation", passed,
+                details = details)
+        
+        return passed
+#
+if __name__ == '__main__':
+    rng = np.random.RandomState(1234)
+    test = Test(rng)
+    utils.newTest(test.id)
+    test.welford()
+    test.massMatrix()
+    test.adaptation()
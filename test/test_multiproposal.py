@@ -0,0 +1,150 @@
+import os
+import numpy as np
+import multiprocessing as mp
+
+import utils
+
+# these directories won't work unless
+# the commandline interface for python unittest is used
+from hmc.lattice import Periodic_Lattice
+from hmc.potentials import Klein_Gordon
+from hmc.multiproposal import Multiple_Proposal_HMC
+import theory.operators
+
+class _Failing_Klein_Gordon(Klein_Gordon):
+    """Raises, or exits when exit is True, in the force of a worker process"""
+    def __init__(self, exit=False, **kwargs):
+        super(_Failing_Klein_Gordon, self).__init__(**kwargs)
+        self.exit = exit
+        self.uE, self.duE = self.potentialEnergy, self.failingForce
+        self.trajectory = None
+        pass
+    
+    def failingForce(self, positions):
+        if mp.current_process().name != 'MainProcess':
+            if self.exit: os._exit(1)
+            raise ValueError('failing force')
+        return self.gradPotentialEnergy(positions)
+
+class Test(object):
+    """Tests for the multiple proposal HMC
+    
+    Required Inputs
+        rng :: np.random.RandomState :: random number generator
+    """
+    def __init__(self, rng):
+        self.id = 'multiple proposals'
+        self.rng = rng
+        pass
+    
+    def workers(self, n_samples = 200, print_out = True):
+        """Checks the chain is the same with the arms integrated in
+        worker processes and in this process
+        
+        Optional Inputs
+            n_samples :: int :: number of samples
+            print_out :: bool :: print results to screen
+        """
+        x0 = Periodic_Lattice(self.rng.randn(8, 8))
+        seed = self.rng.randint(2**31)
+        
+        chains = []
+        for n_workers in [0, 3]:
+            sampler = Multiple_Proposal_HMC(x0, Klein_Gordon(m = .5), np.random.RandomState(seed),
+                n_proposals = 5, step_size = .3, n_steps = 5, arm_angle = .5, n_workers = n_workers)
+            sampler.sample(n_samples = n_samples, n_burn_in = 0)
+            sampler.close()
+            chains.append((np.asarray(sampler.samples), sampler.weights))
+        
+        same = np.array_equal(chains[0][0], chains[1][0]) \
+            and np.array_equal(chains[0][1], chains[1][1])
+        passed = same
+        
+        if print_out:
+            utils.display("Multiple Proposals: Worker Processes", passed,
+                details = {
+                    'identical chains: {}'.format(same):[
+                        'samples: {}'.format(n_samples)
+                        ]
+                    })
+        
+        return passed
+    
+    def failures(self, print_out = True):
+        """Checks that an error in an arm reaches the caller and that
+        a worker that exits stops the sampler instead of hanging it
+        
+        Optional Inputs
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        details = {}
+        for exit, error in [(False, ValueError), (True, RuntimeError)]:
+            sampler = Multiple_Proposal_HMC(Periodic_Lattice(np.zeros((4, 4))),
+                _Failing_Klein_Gordon(exit = exit, m = .5), self.rng,
+                n_proposals = 3, step_size = .3, n_steps = 5, n_workers = 2)
+            try:
+                sampler.sample(n_samples = 10, n_burn_in = 0)
+                raised = None
+            except Exception as e:
+                raised = e
+            sampler.terminate()
+            passed *= isinstance(raised, error)
+            details['exit: {}'.format(exit)] = ['raised: {}'.format(repr(raised))]
+        
+        if print_out:
+            utils.display("Multiple Proposals: Failing Workers", passed,
+                details = details)
+        
+        return passed
+    
+    def freeField(self, n_samples = 10000, n_burn_in = 200, tol = 5e-2, print_out = True):
+        """Checks the samples and the weighted candidates of the 1D free
+        field against the exact <x^2> and magnetisation^2
+        
+        Optional Inputs
+            tol     ::  float   :: relative tolerance level allowed
+            print_out   :: bool     :: print results to screen
+        """
+        passed = True
+        n, spacing, mu = 16, 1., 1.
+        act_xx = theory.operators.x2_1df(mu, n, spacing, 0)
+        act_mm = np.mean([theory.operators.x2_1df(mu, n, spacing, sep) for sep in range(n)])
+        
+        x0 = Periodic_Lattice(np.zeros(n), lattice_spacing=spacing)
+        details = {}
+        for arm_angle in [.5*np.pi, .3]:
+            sampler = Multiple_Proposal_HMC(x0, Klein_Gordon(m = mu), self.rng,
+                n_proposals = 4, step_size = .6, n_steps = 3, arm_angle = arm_angle)
+            sampler.sample(n_samples = n_samples, n_burn_in = n_burn_in, mixing_angle = .5)
+            sampler.close()
+            
+            samples = np.asarray(sampler.samples)
+            xx = np.mean(samples**2)
+            mm = np.mean(theory.operators.magnetisation_sq(samples))
+            w_xx = sampler.weightedSeries(lambda c: np.mean(c**2, axis=1)).mean()
+            w_mm = sampler.weightedSeries(theory.operators.magnetisation_sq).mean()
+            
+            passed *= np.abs(xx/act_xx - 1) <= tol and np.abs(w_xx/act_xx - 1) <= tol
+            passed *= np.abs(mm/act_mm - 1) <= 2*tol and np.abs(w_mm/act_mm - 1) <= 2*tol
+            passed *= sampler.weights.shape == (n_samples, 5)
+            
+            details['arm angle {:.2f}'.format(arm_angle)] = [
+                '<x^2>: {:.4f}, weighted: {:.4f}, theory: {:.4f}'.format(xx, w_xx, act_xx),
+                '<M^2>: {:.4f}, weighted: {:.4f}, theory: {:.4f}'.format(mm, w_mm, act_mm),
+                'moves: {:.3f}'.format(np.mean(sampler.accept_rates))
+                ]
+        
+        if print_out:
+            utils.display("Multiple Proposals: Free Field", passed,
+                details = details)
+        
+        return passed
+#
+if __name__ == '__main__':
+    rng = np.random.RandomState(1234)
+    test = Test(rng)
+    utils.newTest(test.id)
+    test.workers()
+    test.failures()
+    test.freeField()
@@ -5,9 +5,16 @@ import subprocess
 import utils
 
 from hmc import checks
-from hmc.lattice import Periodic_Lattice
+from hmc.lattice import Periodic_Lattice, getGeometry
+from hmc.potentials import fastLaplaceNd
 from hmc.potentials import Multivariate_Gaussian as MVG
 from hmc.potentials import Quantum_Harmonic_Oscillator as QHO
+from hmc.potentials import Ring_Potential, Mexican_Hat
+from hmc.potentials import Simple_Harmonic_Oscillator as SHO
+from hmc.potentials import Phi4_Hopping, U1_Gauge, O_N_Scalar, Klein_Gordon
+from hmc.hmc import Hybrid_Monte_Carlo
+from hmc.dynamics import Leap_Frog
+from hmc import potentials
 
 class Test(object):
     def __init__(self, print_out=True):
@@ -18,6 +25,100 @@ class Test(object):
                 'kineticEnergy':'kE'}
         pass
     
+    def fastLaplacian(self, shapes = [(7,), (6,5), (5,4,3)], tol = 1e-10, print_out = True):
+        """Checks fastLaplaceNd against the explicit sum over the two
+        periodic neighbours along every axis
+        
+        Optional Inputs
+            shapes  :: list  :: lattice shapes
+            tol     :: float :: tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        rng = np.random.RandomState(1234)
+        
+        details = {}
+        for shape in shapes:
+            x = rng.randn(*shape)
+            act = sum(np.roll(x, 1, axis=ax) + np.roll(x, -1, axis=ax) - 2*x
+                for ax in xrange(x.ndim))
+            diff = np.abs(fastLaplaceNd(x) - act).max()
+            passed *= diff <= tol
+            details['shape {}'.format(shape)] = ['max difference: {}'.format(diff)]
+        
+        if print_out:
+            utils.display("Fast Laplacian vs. Neighbour Sum", passed,
+                details = details)
+        
+        return passed
+    
+    def gradients(self, dim = 2, n_points = 20, tol = 1e-6, print_out = True):
+        """Checks the gradients of the non-lattice potentials against
+        central differences of their energies at random points
+        
+        Optional Inputs
+            dim     :: int   :: dimension of each point
+            n_points :: int  :: number of points
+            tol     :: float :: relative tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        rng = np.random.RandomState(1234)
+        h = 1e-6
+        
+        details = {}
+        for pot in [Ring_Potential(), Mexican_Hat(), SHO(k=2.)]:
+            diffs = []
+            for i in xrange(n_points):
+                x = 3.*rng.randn(dim, 1)
+                du = np.asarray(pot.duE(x), dtype=np.float64).ravel()
+                du_fd = np.asarray([np.ravel(pot.uE(x + h*e[:, None]) - pot.uE(x - h*e[:, None]))[0]/(2*h)
+                    for e in np.identity(dim)])
+                diffs.append(np.abs(du - du_fd).max()/max(np.abs(du_fd).max(), 1.))
+            passed *= max(diffs) <= tol
+            details[pot.__class__.__name__] = ['max relative difference: {}'.format(max(diffs))]
+        
+        if print_out:
+            utils.display("Gradients vs. Finite Differences", passed,
+                details = details)
+        
+        return passed
+    
+    def kgForce(self, shapes = [(8,), (5,4)], tol = 1e-6, print_out = True):
+        """Checks the interacting Klein-Gordon force against central
+        differences of the interacting action at every site
+        
+        Optional Inputs
+            shapes  :: list  :: lattice shapes
+            tol     :: float :: relative tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        rng = np.random.RandomState(1234)
+        pot = Klein_Gordon(m = .8, phi_3 = .3, phi_4 = .7)
+        h = 1e-5
+        
+        details = {}
+        for shape in shapes:
+            x = rng.randn(*shape)
+            lattice = lambda arr: Periodic_Lattice(arr, lattice_spacing = .5)
+            du = pot.gradPotentialEnergyInt(lattice(x))
+            du_fd = np.empty(shape)
+            for idx in np.ndindex(shape):
+                fwd, bwd = x.copy(), x.copy()
+                fwd[idx] += h
+                bwd[idx] -= h
+                du_fd[idx] = (pot.potentialEnergyInt(lattice(fwd)) - pot.potentialEnergyInt(lattice(bwd)))/(2*h)
+            diff = np.abs(du - du_fd).max()/np.abs(du_fd).max()
+            passed *= diff <= tol
+            details['shape {}'.format(shape)] = ['max relative difference: {}'.format(diff)]
+        
+        if print_out:
+            utils.display("Klein-Gordon Force vs. Finite Differences", passed,
+                details = details)
+        
+        return passed
+    
     def bvg(self):
         """Plots a test image of the Bivariate Gaussian"""
         passed = True
@@ -33,6 +134,333 @@ class Test(object):
         passed = self._TestFns("BVG Potential", passed, self.x, self.p)
         return passed
     
+    def mvgCholesky(self, dim = 500, n_batch = 20, tol = 1e-8, print_out = True):
+        """Checks the Cholesky backed MVG against the explicit inverse for
+        a batch of points using both the covariance and the precision
+        
+        Optional Inputs
+            dim     :: int   :: dimension of the gaussian
+            n_batch :: int   :: number of column vectors in the batch
+            tol     :: float :: tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        rng = np.random.RandomState(1234)
+        a = rng.randn(dim, dim)
+        cov = a.dot(a.T)/dim + np.identity(dim)
+        mean = rng.randn(dim, 1)
+        cov_inv = np.linalg.inv(cov)
+        
+        x = rng.randn(dim, n_batch)
+        x_copy = x.copy()
+        d = x - mean
+        act_u = .5*(d*cov_inv.dot(d)).sum(axis=0)
+        act_du = cov_inv.dot(d)
+        
+        details = {}
+        for name, pot in [('covariance', MVG(mean = mean, cov = cov)),
+                          ('precision', MVG(mean = mean, precision = cov_inv))]:
+            res = [np.allclose(pot.uE(x), act_u, rtol=tol),
+                   np.allclose(pot.duE(x), act_du, rtol=tol, atol=tol),
+                   np.allclose(pot.colour(pot.whiten(x)), x, atol=tol),
+                   (x == x_copy).all()]
+            passed *= all(res)
+            details[name] = ['energy, gradient, whitening, unmodified: {}'.format(res)]
+        
+        if print_out:
+            utils.display("Cholesky MVG: dim {}, batch {}".format(dim, n_batch), passed,
+                details = details)
+        
+        return passed
+    
+    def batched(self, dim = 2, n_batch = 1000, tol = 1e-6, print_out = True):
+        """Checks the non-lattice potentials evaluate a trailing batch axis
+        identically to one column at a time and that the gradients agree
+        with finite differences of the energies
+        
+        Optional Inputs
+            dim     :: int   :: dimension of each point
+            n_batch :: int   :: number of points in the batch
+            tol     :: float :: tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        rng = np.random.RandomState(1234)
+        x = 3.*rng.randn(dim, n_batch)
+        h = 1e-6
+        
+        details = {}
+        for pot in [Ring_Potential(), Mexican_Hat(), SHO(k=2.)]:
+            u = pot.uE(x)
+            du = pot.duE(x)
+            u_loop = np.asarray([pot.uE(x[:, i:i+1]) for i in range(n_batch)]).ravel()
+            du_loop = np.hstack([pot.duE(x[:, i:i+1]) for i in range(n_batch)])
+            
+            # central differences along each dimension
+            du_fd = np.asarray([(pot.uE(x + h*e[:, None]) - pot.uE(x - h*e[:, None]))/(2*h)
+                for e in np.identity(dim)])
+            
+            res = [u.shape == (n_batch,), du.shape == x.shape,
+                   np.allclose(u, u_loop), np.allclose(du, du_loop),
+                   np.allclose(du, du_fd, rtol=tol, atol=tol*np.abs(du).max())]
+            passed *= all(res)
+            details[pot.__class__.__name__] = [
+                'shapes, loop energy, loop gradient, finite diff.: {}'.format(res)]
+        
+        if print_out:
+            utils.display("Batched non-lattice potentials: {} points".format(n_batch),
+                passed, details = details)
+        
+        return passed
+    
+    def phi4Hopping(self, shapes = [(6,5), (4,3,5), (3,4,3,4)], tol = 1e-10, print_out = True):
+        """Checks the vectorised phi^4 action and force against a site by
+        site transcription of action() and move_m() in ref_code/phi4_sol
+        and that the cached neighbour sum follows in place updates
+        
+        Optional Inputs
+            shapes  :: list  :: 2, 3 and 4 dimensional lattice shapes
+            tol     :: float :: tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        rng = np.random.RandomState(1234)
+        kappa, lam = .18169, 1.3282
+        pot = Phi4_Hopping(kappa=kappa, lam=lam)
+        
+        details = {}
+        for shape in shapes:
+            phi = rng.randn(*shape)
+            d = len(shape)
+            act_s = 0.
+            act_ds = np.empty(shape)
+            for x in np.ndindex(shape):
+                fwd = [phi[tuple((np.add(x, e) % shape))] for e in np.identity(d, dtype=int)]
+                bwd = [phi[tuple((np.subtract(x, e) % shape))] for e in np.identity(d, dtype=int)]
+                phi2 = phi[x]**2
+                act_s += -2*kappa*sum(fwd)*phi[x] + phi2 + lam*(phi2 - 1.)**2
+                act_ds[x] = -(2*kappa*(sum(fwd) + sum(bwd)) - 2*phi[x] \
+                    - lam*4*(phi2 - 1.)*phi[x])
+            
+            s, ds = pot.energyAndGradient(phi)
+            res = [np.allclose(pot.uE(phi), act_s, rtol=tol), np.allclose(s, act_s, rtol=tol),
+                   np.allclose(pot.duE(phi), act_ds, rtol=tol), np.allclose(ds, act_ds, rtol=tol)]
+            
+            # the leapfrog updates the positions in place
+            step = rng.randn(*shape)
+            phi += step
+            fresh = Phi4_Hopping(kappa=kappa, lam=lam)
+            res.append(np.allclose(pot.duE(phi), fresh.duE(phi.copy()), rtol=tol)
+                and pot.uE(phi) == fresh.uE(phi.copy()))
+            passed *= all(res)
+            details['shape {}'.format(shape)] = [
+                'action, fused action, force, fused force, in place update: {}'.format(res)]
+        
+        if print_out:
+            utils.display("phi^4 Hopping Parameter Form vs. ref_code", passed,
+                details = details)
+        
+        return passed
+    
+    def u1Gauge(self, shapes = [(4,5), (3,4,5), (3,3,4,3)], beta = 1.3, h = 1e-6, tol = 1e-6, print_out = True):
+        """Checks the vectorised U(1) plaquette action against a site by site
+        sum and the force against central finite differences
+        
+        Optional Inputs
+            shapes  :: list  :: 2, 3 and 4 dimensional lattice shapes
+            beta    :: float :: inverse coupling
+            h       :: float :: finite difference step
+            tol     :: float :: tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        rng = np.random.RandomState(1234)
+        pot = U1_Gauge(beta = beta)
+        
+        details = {}
+        for shape in shapes:
+            d = len(shape)
+            links = rng.uniform(-np.pi, np.pi, size=(d,) + shape)
+            e = np.identity(d, dtype=int)
+            act_s = 0.
+            for x in np.ndindex(shape):
+                for mu in range(d):
+                    for nu in range(mu+1, d):
+                        x_mu = tuple((np.add(x, e[mu]) % shape))
+                        x_nu = tuple((np.add(x, e[nu]) % shape))
+                        theta = links[(mu,)+x] + links[(nu,)+x_mu] \
+                            - links[(mu,)+x_nu] - links[(nu,)+x]
+                        act_s += beta*(1. - np.cos(theta))
+            
+            fd = np.empty(links.shape)
+            for i in np.ndindex(links.shape):
+                dx = np.zeros(links.shape)
+                dx[i] = h
+                fd[i] = (pot.uE(links + dx) - pot.uE(links - dx))/(2*h)
+            
+            res = [np.allclose(pot.uE(links), act_s, rtol=tol),
+                   np.allclose(pot.duE(links), fd, atol=tol)]
+            passed *= all(res)
+            details['shape {}'.format(shape)] = ['action, force: {}'.format(res)]
+        
+        if print_out:
+            utils.display("U(1) Gauge Plaquette Action", passed,
+                details = details)
+        
+        return passed
+    
+    def oNScalar(self, n = 3, shape = (4,5,3), h = 1e-6, tol = 1e-6, print_out = True):
+        """Checks the O(N) action and force
+        
+        The force is compared to central finite differences, the action
+        must be invariant under a global O(N) rotation and N = 1 must
+        reproduce Klein_Gordon with phi_4 = lam. A short HMC run checks
+        the momentum refresh works with the component axis
+        
+        Optional Inputs
+            n       :: int   :: number of components
+            shape   :: tuple :: lattice shape
+            h       :: float :: finite difference step
+            tol     :: float :: tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        rng = np.random.RandomState(1234)
+        m, lam, spacing = .7, .9, .5
+        pot = O_N_Scalar(m = m, lam = lam, spacing = spacing)
+        x = rng.randn(n, *shape)
+        
+        fd = np.empty(x.shape)
+        for i in np.ndindex(x.shape):
+            dx = np.zeros(x.shape)
+            dx[i] = h
+            fd[i] = (pot.uE(x + dx) - pot.uE(x - dx))/(2*h)
+        force = np.allclose(pot.duE(x), fd, atol=tol)
+        
+        rot = np.linalg.qr(rng.randn(n, n))[0]
+        invariant = np.allclose(pot.uE(np.tensordot(rot, x, axes=1)), pot.uE(x), rtol=tol)
+        
+        y = Periodic_Lattice(rng.randn(*shape), lattice_spacing = 1.)
+        kg = Klein_Gordon(m = m, phi_4 = lam)
+        single = np.allclose(O_N_Scalar(m = m, lam = lam).uE(y[None]), kg.uE(y), rtol=tol)
+        
+        lf = Leap_Frog(duE = pot.duE, step_size = .1, n_steps = 5)
+        hmc = Hybrid_Monte_Carlo(x, lf, pot, rng)
+        hmc.sample(n_samples = 10, n_burn_in = 0)
+        sampled = np.asarray(hmc.samples).shape[1:] == x.shape
+        
+        passed *= force and invariant and single and sampled
+        
+        if print_out:
+            utils.display("O(N) Scalar Field", passed,
+                details = {
+                    'N = {}, lattice {}'.format(n, shape):[
+                        'force vs. finite differences: {}'.format(force),
+                        'O(N) invariant action: {}'.format(invariant),
+                        'N = 1 equals Klein-Gordon: {}'.format(single),
+                        'HMC samples keep shape: {}'.format(sampled)
+                        ]
+                    })
+        
+        return passed
+    
+    def compiledKernels(self, shapes = [(7,), (6,5), (4,3,2,5)], tol = 1e-10, print_out = True):
+        """Checks the clibs kernels against the NumPy implementations
+        
+        Compares the Klein-Gordon action and force with and without
+        interactions, the 1D QHO and a complete leapfrog trajectory.
+        Passes trivially when the extension is not built
+        
+        Optional Inputs
+            shapes  :: list  :: lattice shapes
+            tol     :: float :: tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        rng = np.random.RandomState(1234)
+        
+        details = {}
+        if potentials.clibs is None:
+            details['clibs'] = ['not built: see hmc/setup.py']
+        else:
+            for shape in shapes:
+                x = Periodic_Lattice(rng.randn(*shape), lattice_spacing = .5)
+                p = rng.randn(*shape)
+                res = []
+                for kwargs in [{'m':.8}, {'m':.8, 'phi_3':.3, 'phi_4':.7}]:
+                    c_pot = Klein_Gordon(**kwargs)
+                    n_pot = Klein_Gordon(compiled = False, **kwargs)
+                    res.append(np.allclose(c_pot.uE(x), n_pot.uE(x), rtol=tol))
+                    res.append(np.allclose(c_pot.duE(x), n_pot.duE(x), atol=tol))
+                    
+                    c_lf = Leap_Frog(duE = c_pot.duE, step_size = .1, n_steps = 7,
+                        trajectory = c_pot.trajectory)
+                    n_lf = Leap_Frog(duE = n_pot.duE, step_size = .1, n_steps = 7)
+                    c_p, c_x = c_lf.integrate(p.copy(), x.copy())
+                    n_p, n_x = n_lf.integrate(p.copy(), x.copy())
+                    res.append(np.allclose(c_p, n_p, atol=tol) and np.allclose(c_x, n_x, atol=tol))
+                
+                if len(shape) == 1:
+                    c_pot = QHO(phi_4 = .5)
+                    n_pot = QHO(phi_4 = .5, compiled = False)
+                    res.append(np.allclose(c_pot.uE(x), n_pot.uE(x), rtol=tol))
+                    res.append(np.allclose(c_pot.duE(x), n_pot.duE(x), atol=tol))
+                passed *= all(res)
+                details['shape {}'.format(shape)] = [
+                    'KG free, KG interacting (action, force, trajectory), QHO: {}'.format(res)]
+        
+        if print_out:
+            utils.display("Compiled Kernels vs. NumPy", passed,
+                details = details)
+        
+        return passed
+    
+    def slabThreads(self, shapes = [(7,), (3,5), (16,6,5), (5,4,3,6)], n_threads = 4, tol = 1e-10, print_out = True):
+        """Checks the slab decomposed Klein-Gordon action and force
+        against the serial NumPy implementation, that repeated
+        evaluations are bitwise identical, that potentials share one
+        thread pool and that a geometry or debugging with threads is refused
+        
+        Optional Inputs
+            shapes  :: list  :: lattice shapes including fewer rows than threads
+            n_threads :: int :: number of threads
+            tol     :: float :: tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        rng = np.random.RandomState(1234)
+        
+        details = {}
+        for shape in shapes:
+            x = Periodic_Lattice(rng.randn(*shape), lattice_spacing = .5)
+            res = []
+            for kwargs in [{'m':.8}, {'m':.8, 'phi_3':.3, 'phi_4':.7}]:
+                s_pot = Klein_Gordon(n_threads = n_threads, **kwargs)
+                n_pot = Klein_Gordon(compiled = False, **kwargs)
+                res.append(np.allclose(s_pot.uE(x), n_pot.uE(x), rtol=tol))
+                res.append(np.allclose(s_pot.duE(x), n_pot.duE(x), atol=tol))
+                res.append(s_pot.uE(x) == s_pot.uE(x))
+            passed *= all(res)
+            details['shape {}'.format(shape)] = [
+                'KG free, KG interacting (action, force, deterministic): {}'.format(res)]
+        
+        shared = Klein_Gordon(n_threads = n_threads).slabs.pool is Klein_Gordon(n_threads = n_threads).slabs.pool
+        refused = []
+        for kwargs in [{'geometry':getGeometry((4, 4))}, {'debug':True}]:
+            try:
+                Klein_Gordon(n_threads = n_threads, **kwargs)
+                refused.append(False)
+            except ValueError:
+                refused.append(True)
+        passed *= shared and all(refused)
+        details['pool'] = ['shared: {}, geometry, debug refused: {}'.format(shared, refused)]
+        
+        if print_out:
+            utils.display("Slab Decomposed Threads: {}".format(n_threads), passed,
+                details = details)
+        
+        return passed
+    
     def qho(self, dim = 4, sites = 10, spacing = 1.):
         """checks that QHO can be initialised and all functions run"""
         
@@ -94,5 +522,15 @@ class Test(object):
 if __name__ == '__main__':
     test = Test()
     utils.newTest(test.id)
+    test.fastLaplacian()
+    test.gradients()
+    test.kgForce()
     test.bvg()
+    test.mvgCholesky()
+    test.batched()
+    test.phi4Hopping()
+    test.u1Gauge()
+    test.oNScalar()
+    test.compiledKernels()
+    test.slabThreads()
     test.qho()
\ No newline at end of file
@@ -0,0 +1,104 @@
+import numpy as np
+
+import utils
+
+# these directories won't work unless
+# the commandline interface for python unittest is used
+from hmc.lattice import Periodic_Lattice
+from hmc.potentials import Klein_Gordon
+from models import Basic_Fourier
+from correlations.reweight import Multi_Ensemble, chainTerms, chainCoefficients
+import theory.operators
+
+class Test(object):
+    """Tests for the multi-ensemble reweighting
+    
+    Required Inputs
+        rng :: np.random.RandomState :: random number generator
+    """
+    def __init__(self, rng):
+        self.id = 'reweighting'
+        self.rng = rng
+        pass
+    
+    def decomposition(self, tol = 1e-10, print_out = True):
+        """Checks the decomposed Klein-Gordon action against the action
+        for free and interacting theories in 1D and 2D
+        
+        Optional Inputs
+            tol     :: float :: relative tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        details = {}
+        for shape, spacing in [((16,), .3), ((8,6), .5)]:
+            x = Periodic_Lattice(self.rng.randn(*shape), lattice_spacing = spacing)
+            diffs = []
+            for couplings in [{'m':1.}, {'m':.4, 'phi_4':.7}, {'m':.4, 'phi_3':.2, 'phi_4':.7}]:
+                for compiled in [True, False]:
+                    pot = Klein_Gordon(compiled = compiled, **couplings)
+                    s = np.dot(pot.actionCoefficients(x), pot.actionTerms(x))
+                    diffs.append(np.abs(s/pot.uE(x) - 1))
+            passed *= max(diffs) <= tol
+            details['shape {}, spacing {}'.format(shape, spacing)] = [
+                'max relative difference: {:.1e}'.format(max(diffs))]
+        
+        if print_out:
+            utils.display("Decomposed Action", passed,
+                details = details)
+        
+        return passed
+    
+    def freeField(self, n_samples = 10000, tol = 1e-2, print_out = True):
+        """Pools exact samples of the 1D free field at three masses and
+        compares the free energies with the log determinants and the
+        reweighted <x^2> between the masses with the exact results
+        
+        Optional Inputs
+            n_samples :: int    :: samples per mass
+            tol     ::  float   :: relative tolerance level allowed
+            print_out   :: bool     :: print results to screen
+        """
+        passed = True
+        n, spacing = 16, .5
+        masses = [.8, 1., 1.25]
+        targets = [.9, 1.1]
+        
+        terms, coefficients, x2 = [], [], []
+        for mu in masses:
+            model = Basic_Fourier(np.zeros(n), Klein_Gordon(m = mu), spacing = spacing, rng = self.rng)
+            model.run(n_samples = n_samples, n_burn_in = 0)
+            terms.append(chainTerms(Klein_Gordon(m = mu), model.samples, spacing))
+            coefficients.append(chainCoefficients(Klein_Gordon(m = mu), (n,), spacing))
+            x2.append((model.samples**2).mean(axis=1))
+        ensemble = Multi_Ensemble(terms, coefficients)
+        
+        # Z = det(M)^{-1/2} up to a constant for the free field
+        k = 2*np.pi*np.arange(n)/n
+        log_det = lambda mu: np.log((2 - 2*np.cos(k))/spacing + spacing*mu**2).sum()
+        act_f = [.5*(log_det(mu) - log_det(masses[0])) for mu in masses]
+        f_ok = np.allclose(ensemble.f, act_f, atol = 5*tol*max(act_f))
+        passed *= f_ok
+        details = {'free energies: {}'.format(f_ok):[
+            '{:.3f} vs. {:.3f}'.format(f, act) for f, act in zip(ensemble.f, act_f)]}
+        
+        c = np.array([chainCoefficients(Klein_Gordon(m = mu), (n,), spacing) for mu in targets])
+        xx, err = ensemble.errors(x2, c)
+        for mu, xx_i, err_i in zip(targets, xx, err):
+            act_xx = theory.operators.x2_1df(mu, n, spacing, 0)
+            passed *= np.abs(xx_i/act_xx - 1) <= tol and np.abs(xx_i - act_xx) <= 4*err_i
+            details['m = {}'.format(mu)] = [
+                '<x^2>: {:.4f} +/- {:.4f}, theory: {:.4f}'.format(xx_i, err_i, act_xx)]
+        
+        if print_out:
+            utils.display("Reweighting: Free Field Masses", passed,
+                details = details)
+        
+        return passed
+#
+if __name__ == '__main__':
+    rng = np.random.RandomState(1234)
+    test = Test(rng)
+    utils.newTest(test.id)
+    test.decomposition()
+    test.freeField()
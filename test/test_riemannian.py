@@ -0,0 +1,159 @@
+import numpy as np
+
+import utils
+
+# these directories won't work unless
+# the commandline interface for python unittest is used
+from hmc.riemannian import SoftAbs_Metric, Riemannian_Leap_Frog, getMetric
+from hmc.potentials import Multivariate_Gaussian, Mexican_Hat, Ring_Potential
+from models import Basic_RMHMC
+
+class Test(object):
+    """Tests for Riemannian manifold HMC
+    
+    Required Inputs
+        rng :: np.random.RandomState :: random number generator
+    """
+    def __init__(self, rng):
+        self.id = 'riemannian'
+        self.rng = rng
+        pass
+    
+    def metric(self, tol = 1e-5, print_out = True):
+        """Checks the SoftAbs metric, the analytic Hessians and the
+        forces of the generalised leapfrog against finite differences
+        
+        Optional Inputs
+            tol :: float :: relative tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        x = np.asarray([[.9], [-.6]])
+        h = 1e-5
+        res = []
+        
+        # SoftAbs is |l| coth(alpha l) on the eigenvalues
+        cov = np.asarray([[1., .95], [.95, 1.]])
+        mvg = SoftAbs_Metric(Multivariate_Gaussian(cov = cov), alpha = 2.)
+        l = np.linalg.eigvalsh(np.linalg.inv(cov))
+        res.append(np.allclose(np.linalg.eigvalsh(mvg.metric(x)), l/np.tanh(2.*l), rtol=tol))
+        
+        # the analytic Hessians are the derivatives of the gradients
+        for pot in [Mexican_Hat(), Ring_Potential()]:
+            numeric = np.zeros((2, 2))
+            for i in xrange(2):
+                e = np.zeros((2, 1))
+                e[i] = h
+                numeric[i] = ((pot.duE(x + e) - pot.duE(x - e))/(2.*h)).ravel()
+            res.append(np.allclose(pot.hessian(x), numeric, rtol=tol, atol=tol))
+        
+        # dH/dx of the kinetic term against the hamiltonian
+        pot = Mexican_Hat()
+        dynamics = Riemannian_Leap_Frog(pot, getMetric(pot))
+        p = np.asarray([[1.3], [.4]])
+        forces = dynamics.local(x).forces(p) + pot.duE(x).ravel()
+        numeric = np.zeros(2)
+        for i in xrange(2):
+            e = np.zeros((2, 1))
+            e[i] = h
+            numeric[i] = (dynamics.hamiltonian(p, x + e) - dynamics.hamiltonian(p, x - e))/(2.*h)
+        res.append(np.allclose(forces, numeric, rtol=1e-4))
+        passed = all(res)
+        
+        if print_out:
+            utils.display("SoftAbs Metric", passed,
+                details = {
+                    'dH/dx: {}, finite differences: {}'.format(forces, numeric):[
+                        'softabs, hat hessian, ring hessian, forces: {}'.format(res)
+                        ]
+                    })
+        
+        return passed
+    
+    def reversibility(self, tol = 1e-8, print_out = True):
+        """Checks that a generalised leapfrog trajectory retraces itself
+        when the momentum is flipped and that the energy error is of the
+        order of the step size squared
+        
+        The momentum has its own seed so the result does not depend on
+        the tests that ran before
+        
+        Optional Inputs
+            tol :: float :: tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        pot = Mexican_Hat()
+        step_size = .05
+        dynamics = Riemannian_Leap_Frog(pot, getMetric(pot), step_size = step_size, n_steps = 20,
+            tol = 1e-12)
+        x = np.asarray([[1.1], [.3]])
+        p = dynamics.local(x).noise(np.random.RandomState(1234), x.shape)
+        
+        p1, x1 = dynamics.integrate(p, x)
+        forward = dynamics.converged
+        p2, x2 = dynamics.integrate(-p1, x1)
+        backward = dynamics.converged
+        
+        delta_h = np.abs(dynamics.hamiltonian(p1, x1) - dynamics.hamiltonian(p, x))[0]
+        res = [forward, backward,
+            np.allclose(x2, x, atol=tol), np.allclose(-p2, p, atol=tol), delta_h < step_size**2]
+        passed = all(res)
+        
+        if print_out:
+            utils.display("Generalised Leapfrog Reversibility", passed,
+                details = {
+                    'delta H: {}'.format(delta_h):[
+                        'converged, converged back, x, p, energy: {}'.format(res)
+                        ]
+                    })
+        
+        return passed
+    
+    def exact(self, n_samples = 3000, n_burn_in = 200, tol = .1, print_out = True):
+        """Checks the moments of a correlated gaussian and the Mexican Hat
+        
+        Optional Inputs
+            n_samples   :: int  :: number of samples
+            n_burn_in   :: int  :: number of burnin steps
+            tol     ::  float   :: relative tolerance level allowed
+            print_out   :: bool     :: print results to screen
+        """
+        cov = np.asarray([[1., .95], [.95, 1.]])
+        mvg = Basic_RMHMC(np.zeros((2, 1)), Multivariate_Gaussian(cov = cov),
+            step_size = .5, n_steps = 3, rng = self.rng)
+        mvg.run(n_samples = n_samples, n_burn_in = n_burn_in)
+        sample_cov = np.cov(mvg.samples.T)
+        
+        # <x^2> of the Mexican Hat on a grid
+        pot = Mexican_Hat()
+        grid = np.linspace(-3., 3., 601)
+        gx, gy = np.meshgrid(grid, grid)
+        weights = np.exp(-pot.uE(np.asarray([gx.ravel(), gy.ravel()])))
+        x2 = (weights*gx.ravel()**2).sum()/weights.sum()
+        
+        hat = Basic_RMHMC(np.asarray([[1.2], [0.]]), pot, step_size = .1, n_steps = 10,
+            rng = self.rng)
+        hat.run(n_samples = n_samples, n_burn_in = n_burn_in)
+        sample_x2 = (hat.samples**2).mean()
+        
+        res = [np.allclose(sample_cov, cov, atol=tol), np.isclose(sample_x2, x2, rtol=tol)]
+        passed = all(res)
+        
+        if print_out:
+            utils.display("RMHMC Samples", passed,
+                details = {
+                    'gaussian cov: {}'.format(np.around(sample_cov, 3).tolist()):[
+                        'mexican hat <x^2>: {:.3f} exact: {:.3f}'.format(sample_x2, x2),
+                        'acceptance: {:.2f}, {:.2f}'.format(mvg.p_acc, hat.p_acc),
+                        'gaussian, mexican hat: {}'.format(res)
+                        ]
+                    })
+        
+        return passed
+#
+if __name__ == '__main__':
+    rng = np.random.RandomState(1234)
+    test = Test(rng)
+    utils.newTest(test.id)
+    test.metric()
+    test.reversibility()
+    test.exact()
@@ -0,0 +1,117 @@
+import os
+import numpy as np
+import multiprocessing as mp
+
+import utils
+
+# these directories won't work unless
+# the commandline interface for python unittest is used
+from hmc.potentials import Klein_Gordon
+from models import Basic_GHMC
+
+class Test(object):
+    """Tests for the speculative execution of GHMC moves
+    
+    Required Inputs
+        rng :: np.random.RandomState :: random number generator
+    """
+    def __init__(self, rng):
+        self.id = 'speculative moves'
+        self.rng = rng
+        pass
+    
+    def serial(self, n_samples = 300, n_burn_in = 20, print_out = True):
+        """Checks that speculating on the moves after a rejection gives
+        exactly the chain of the serial moves with the same seeds
+        
+        Optional Inputs
+            n_samples   :: int  :: number of samples
+            n_burn_in   :: int  :: number of burnin steps
+            print_out   :: bool     :: print results to screen
+        """
+        passed = True
+        x0 = self.rng.randn(8, 8)
+        
+        details = {}
+        for mixing_angle, rand_steps in [(.5*np.pi, False), (.3, True)]:
+            seed = self.rng.randint(2**31)
+            runs = []
+            for speculate in [0, 3]:
+                np.random.seed(seed) # the random trajectory lengths
+                model = Basic_GHMC(x0, Klein_Gordon(m = .5), step_size = .5, n_steps = 4,
+                    rand_steps = rand_steps, rng = np.random.RandomState(seed),
+                    speculate = speculate)
+                model.run(n_samples = n_samples, n_burn_in = n_burn_in, mixing_angle = mixing_angle)
+                runs.append((model, model.sampler.rng.uniform()))
+            (serial, u), (speculative, u_spec) = runs
+            
+            same = [np.array_equal(serial.burn_in, speculative.burn_in),
+                np.array_equal(serial.samples, speculative.samples),
+                np.array_equal(serial.sampler.samples_p, speculative.sampler.samples_p),
+                np.array_equal(serial.traj, speculative.traj),
+                serial.sampler.accept.accept_rates == speculative.sampler.accept.accept_rates,
+                u == u_spec] # the random numbers are used up in the same way
+            passed *= all(same)
+            
+            details['angle {:.2f} random steps {}'.format(mixing_angle, rand_steps)] = [
+                'acceptance: {:.3f}'.format(serial.p_acc),
+                'burn in, samples, momenta, steps, rates, rng: {}'.format(same)
+                ]
+        
+        if print_out:
+            utils.display("Speculative against Serial Moves", passed,
+                details = details)
+        
+        return passed
+    
+    def failures(self, print_out = True):
+        """Checks that speculate raises for the options it cannot be
+        combined with and that a worker that dies stops the sampler
+        instead of hanging it
+        
+        Optional Inputs
+            print_out   :: bool     :: print results to screen
+        """
+        passed = True
+        x0 = self.rng.randn(4, 4)
+        
+        details = {}
+        for kwargs in [{'adapt_mass':'diag'}, {'acceptance':'lifted'}, {'flip':'reduced'},
+                {'extra_chances':2}]:
+            model = Basic_GHMC(x0, Klein_Gordon(m = .5), step_size = .5, n_steps = 4,
+                rng = self.rng, speculate = 2, **kwargs)
+            try:
+                model.run(n_samples = 10, n_burn_in = 0)
+                raised = False
+            except ValueError:
+                raised = True
+            passed *= raised
+            details['{}'.format(kwargs)] = ['ValueError: {}'.format(raised)]
+        
+        model = Basic_GHMC(x0, Klein_Gordon(m = .5), step_size = .5, n_steps = 4,
+            rng = self.rng, speculate = 2)
+        integrate = model.sampler.dynamics.integrate
+        def dieInWorker(*args, **kwargs):
+            if mp.current_process().name != 'MainProcess': os._exit(1)
+            return integrate(*args, **kwargs)
+        model.sampler.dynamics.integrate = dieInWorker
+        try:
+            model.run(n_samples = 10, n_burn_in = 0)
+            died = False
+        except RuntimeError:
+            died = True
+        passed *= died
+        details['dead worker'] = ['RuntimeError: {}'.format(died)]
+        
+        if print_out:
+            utils.display("Speculative Moves: Failures", passed,
+                details = details)
+        
+        return passed
+#
+if __name__ == '__main__':
+    rng = np.random.RandomState(1234)
+    test = Test(rng)
+    utils.newTest(test.id)
+    test.serial()
+    test.failures()
@@ -0,0 +1,215 @@
+import os
+import numpy as np
+import multiprocessing as mp
+
+import utils
+
+# these directories won't work unless 
+# the commandline interface for python unittest is used
+from hmc.lattice import Periodic_Lattice
+from hmc.potentials import Klein_Gordon, Phi4_Hopping
+from hmc.tempering import Tempered_Potential, Replica_Exchange
+import theory.operators
+
+class _Failing_Klein_Gordon(Klein_Gordon):
+    """Raises, or exits when exit is True, in the force of a worker process"""
+    def __init__(self, exit=False, **kwargs):
+        super(_Failing_Klein_Gordon, self).__init__(**kwargs)
+        self.exit = exit
+        self.uE, self.duE = self.potentialEnergy, self.failingForce
+        pass
+    
+    def failingForce(self, positions):
+        if mp.current_process().name != 'MainProcess':
+            if self.exit: os._exit(1)
+            raise ValueError('failing force')
+        return self.gradPotentialEnergy(positions)
+
+class Test(object):
+    """Tests for parallel tempering
+    
+    Required Inputs
+        rng :: np.random.RandomState :: random number generator
+    """
+    def __init__(self, rng):
+        self.id = 'tempering'
+        self.rng = rng
+        pass
+    
+    def tempered(self, beta = .3, tol = 1e-10, print_out = True):
+        """Checks the action and force are scaled by beta and the
+        kinetic energy is not
+        
+        Optional Inputs
+            beta :: float :: inverse temperature
+            tol  :: float :: tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        pot = Klein_Gordon(m = .5)
+        hot = Tempered_Potential(pot, beta)
+        x = Periodic_Lattice(self.rng.randn(8, 8))
+        p = self.rng.randn(8, 8)
+        
+        res = [np.abs(hot.uE(x) - beta*pot.uE(x)) <= tol*np.abs(pot.uE(x)),
+            np.allclose(hot.duE(x), beta*pot.duE(x), rtol=tol),
+            hot.kE(p) == pot.kE(p)]
+        passed = all(res)
+        
+        if print_out:
+            utils.display("Tempered Potential", passed,
+                details = {
+                    'beta = {}'.format(beta):[
+                        'action, force, kinetic: {}'.format(res)
+                        ]
+                    })
+        
+        return passed
+    
+    def freeField(self, n_samples = 10000, n_burn_in = 1000, tol = 5e-2, print_out = True):
+        """Checks the target replica samples the 1D free field exactly
+        
+        Hot configurations are exchanged into the target so any error in
+        the swaps shows up as an excess in <x^2>
+        
+        Optional Inputs
+            tol     ::  float   :: relative tolerance level allowed
+            print_out   :: bool     :: print results to screen
+        """
+        n, spacing, mu = 16, 1., 1.
+        act_xx = theory.operators.x2_1df(mu, n, spacing, 0)
+        act_mm = np.mean([theory.operators.x2_1df(mu, n, spacing, sep) for sep in range(n)])
+        
+        x0 = Periodic_Lattice(np.zeros(n), lattice_spacing=spacing)
+        sampler = Replica_Exchange(x0, Klein_Gordon(m = mu), self.rng, n_replicas = 4,
+            beta_min = .2, step_size = .3, n_steps = 5, swap_every = 2)
+        sampler.sample(n_samples = n_samples, n_burn_in = n_burn_in)
+        sampler.close()
+        
+        samples = np.asarray(sampler.samples)
+        xx = np.mean(samples**2)
+        mm = np.mean(theory.operators.magnetisation_sq(samples))
+        res = [np.abs(xx/act_xx - 1) <= tol, np.abs(mm/act_mm - 1) <= 2*tol,
+            len(sampler.samples) == n_samples + 1, len(sampler.burn_in) == n_burn_in + 1]
+        passed = all(res)
+        
+        if print_out:
+            utils.display("Replica Exchange: Free Field", passed,
+                details = {
+                    'ladder: {}'.format(np.around(sampler.betas, 3)):[
+                        '<x(0)x(0)> target: {}, empirical {}'.format(act_xx, xx),
+                        '<M^2> target: {}, empirical {}'.format(act_mm, mm),
+                        'swap rates: {}'.format(sampler.swap_rates),
+                        'x^2, M^2, n_samples, n_burn_in: {}'.format(res)
+                        ]
+                    })
+        
+        return passed
+    
+    def brokenPhase(self, n_samples = 5000, n_burn_in = 1000, tol = .4, print_out = True):
+        """Checks that tempering restores the Z2 symmetry of phi^4 in the
+        broken phase where a single GHMC chain keeps the sign of M
+        
+        The adapted ladder must keep its ends and stay ordered
+        
+        Optional Inputs
+            tol     ::  float   :: tolerance of <M> about zero
+            print_out   :: bool     :: print results to screen
+        """
+        pot = Phi4_Hopping(kappa = .4, lam = 1.)
+        sampler = Replica_Exchange(np.ones((8, 8)), pot, self.rng, n_replicas = 6,
+            beta_min = .4, step_size = .1, n_steps = 10, swap_every = 2)
+        sampler.sample(n_samples = n_samples, n_burn_in = n_burn_in)
+        sampler.close()
+        
+        mag = np.asarray(sampler.samples).reshape(n_samples + 1, -1).mean(axis=1)
+        betas = sampler.betas
+        res = [np.abs(mag.mean()) <= tol, len(sampler.round_trips) > 0,
+            np.isclose(betas[0], 1.) and np.isclose(betas[-1], .4) and (np.diff(betas) < 0).all()]
+        passed = all(res)
+        
+        if print_out:
+            utils.display("Replica Exchange: Broken Phase", passed,
+                details = {
+                    'ladder: {}'.format(np.around(betas, 3)):[
+                        '<M>: {}, <|M|>: {}'.format(mag.mean(), np.abs(mag).mean()),
+                        'swap rates: {}'.format(sampler.swap_rates),
+                        'round trips: {}'.format(len(sampler.round_trips)),
+                        'symmetric, round trips, ladder: {}'.format(res)
+                        ]
+                    })
+        
+        return passed
+    
+    def stepSizes(self, n_burn_in = 200, tol = 1e-10, print_out = True):
+        """Checks each replica uses step_size/sqrt(beta) for the adapted
+        ladder after the burn in
+        
+        Optional Inputs
+            n_burn_in :: int :: moves while the ladder is adapted
+            tol     :: float :: relative tolerance level allowed
+            print_out :: bool :: print results to screen
+        """
+        step_size = .2
+        sampler = Replica_Exchange(Periodic_Lattice(np.zeros(16)), Klein_Gordon(m = 1.), self.rng, n_replicas = 4,
+            beta_min = .1, step_size = step_size, n_steps = 5, swap_every = 2, adapt_ladder = True)
+        initial = sampler.betas.copy()
+        sampler.sample(n_samples = 10, n_burn_in = n_burn_in)
+        step_sizes = sampler.step_sizes
+        sampler.close()
+        
+        act_step_sizes = step_size/np.sqrt(sampler.betas)
+        adapted = not np.allclose(sampler.betas, initial)
+        match = np.allclose(step_sizes, act_step_sizes, rtol=tol)
+        passed = adapted and match
+        
+        if print_out:
+            utils.display("Replica Exchange: Adapted Step Sizes", passed,
+                details = {
+                    'ladder adapted: {}'.format(adapted):[
+                        'initial: {}'.format(np.around(initial, 3)),
+                        'adapted: {}'.format(np.around(sampler.betas, 3))
+                        ],
+                    'step sizes match: {}'.format(match):[
+                        'replicas: {}'.format(np.around(step_sizes, 4)),
+                        'step_size/sqrt(beta): {}'.format(np.around(act_step_sizes, 4))
+                        ]
+                    })
+        
+        return passed
+    
+    def failures(self, print_out = True):
+        """Checks that an error in a replica reaches the caller and that
+        a replica that exits stops the sampler instead of hanging it
+        
+        Optional Inputs
+            print_out :: bool :: print results to screen
+        """
+        passed = True
+        details = {}
+        for exit, error in [(False, ValueError), (True, RuntimeError)]:
+            sampler = Replica_Exchange(Periodic_Lattice(np.zeros(8)), _Failing_Klein_Gordon(exit = exit, m = 1.),
+                self.rng, n_replicas = 3, step_size = .2, n_steps = 5, swap_every = 2)
+            try:
+                sampler.sample(n_samples = 10, n_burn_in = 0)
+                raised = None
+            except Exception as e:
+                raised = e
+            sampler.terminate()
+            passed *= isinstance(raised, error)
+            details['exit: {}'.format(exit)] = ['raised: {}'.format(repr(raised))]
+        
+        if print_out:
+            utils.display("Replica Exchange: Failing Replicas", passed,
+                details = details)
+        
+        return passed
+#
+if __name__ == '__main__':
+    rng = np.random.RandomState(1234)
+    test = Test(rng)
+    utils.newTest(test.id)
+    test.tempered()
+    test.freeField()
+    test.brokenPhase()
+    test.stepSizes()
+    test.failures()